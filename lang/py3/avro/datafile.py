@@ -20,20 +20,46 @@
 
 """Read/Write Avro File Object Containers."""
 
+import binascii
+import bisect
+import collections
+import concurrent.futures
+import functools
 import io
 import logging
+import multiprocessing
 import os
+import queue
+import threading
 import zlib
 
 from avro import schema
 from avro import io as avro_io
 
+try:
+  import bz2
+  has_bz2 = True
+except ImportError:
+  has_bz2 = False
+
+try:
+  import lzma
+  has_lzma = True
+except ImportError:
+  has_lzma = False
+
 try:
   import snappy
   has_snappy = True
 except ImportError:
   has_snappy = False
 
+try:
+  import zstandard
+  has_zstandard = True
+except ImportError:
+  has_zstandard = False
+
 
 # ------------------------------------------------------------------------------
 # Constants
@@ -50,10 +76,16 @@ MAGIC_SIZE = len(MAGIC)
 # Size of the synchronization marker, in number of bytes:
 SYNC_SIZE = 16
 
-# Interval between synchronization markers, in number of bytes:
-# TODO: make configurable
+# Default interval between synchronization markers, in number of bytes of
+# uncompressed block data (see DataFileWriter block_size):
 SYNC_INTERVAL = 1000 * SYNC_SIZE
 
+# Number of bytes read at a time when scanning for a synchronization marker:
+SYNC_SCAN_SIZE = 64 * 1024
+
+# Number of bytes read at a time from a non-seekable input stream:
+STREAM_BUFFER_SIZE = 64 * 1024
+
 # Schema of the container header:
 META_SCHEMA = schema.Parse("""
 {
@@ -74,11 +106,6 @@ META_SCHEMA = schema.Parse("""
     'sync_size': SYNC_SIZE,
 })
 
-# Codecs supported by container files:
-VALID_CODECS = frozenset(['null', 'deflate'])
-if has_snappy:
-  VALID_CODECS = frozenset.union(VALID_CODECS, ['snappy'])
-
 # Not used yet
 VALID_ENCODINGS = frozenset(['binary'])
 
@@ -88,6 +115,58 @@ CODEC_KEY = "avro.codec"
 # Metadata key associated to the schema:
 SCHEMA_KEY = "avro.schema"
 
+# Schema of the entries of a sidecar block index:
+INDEX_SCHEMA = schema.Parse("""
+{
+  "type": "record",
+  "name": "BlockIndexEntry",
+  "namespace": "org.apache.avro.file",
+  "fields": [
+    {"name": "offset", "type": "long"},
+    {"name": "count", "type": "long"},
+    {"name": "first_record", "type": "long"},
+    {"name": "compressed_size", "type": "long"},
+    {"name": "uncompressed_size", "type": ["null", "long"]}
+  ]
+}
+""")
+
+# Default size of the byte ranges a data file is split into for ParallelScan():
+PARALLEL_SPLIT_SIZE = 64 * 1024 * 1024
+
+# Default number of block results ParallelScan() buffers between the worker
+# processes and the consumer, before the workers block:
+PARALLEL_QUEUE_SIZE = 64
+
+# Metadata key of a sidecar block index, holding the sync marker of the
+# data file it describes:
+INDEX_SYNC_KEY = "avro.index.sync"
+
+# Suffix appended to the path of a data file to name its sidecar block index:
+INDEX_FILE_SUFFIX = ".idx"
+
+
+# Entry of a block index, describing one block of a data file:
+#  - offset: position of the block in the file, as accepted by seek();
+#  - count: number of records in the block;
+#  - first_record: number of the first record of the block in the file;
+#  - compressed_size: size of the block data as stored, in bytes;
+#  - uncompressed_size: size of the decompressed block data, in bytes,
+#    or None when it cannot be known without decompressing the block.
+BlockIndexEntry = collections.namedtuple(
+    'BlockIndexEntry',
+    [field.name for field in INDEX_SCHEMA.fields])
+
+
+# Block of a data file, as stored, without its sync marker:
+#  - count: number of records in the block;
+#  - codec: name of the codec the block data is compressed with;
+#  - data: compressed block data, as bytes;
+#  - offset: position of the block in the file it was read from;
+#  - schema: schema the records of the block are encoded with.
+RawBlock = collections.namedtuple(
+    'RawBlock', ['count', 'codec', 'data', 'offset', 'schema'])
+
 
 # ------------------------------------------------------------------------------
 # Exceptions
@@ -100,6 +179,133 @@ class DataFileException(schema.AvroException):
     super(DataFileException, self).__init__(msg)
 
 
+# ------------------------------------------------------------------------------
+# Codecs
+
+
+# Block compression codec:
+#  - name: name of the codec, as recorded in the 'avro.codec' metadata;
+#  - compress: function (data, **options) -> compressed data, where data is
+#    a bytes-like object and options are codec specific, eg. level;
+#    codecs that take no options accept and ignore any;
+#  - decompress: function (compressed data) -> data.
+# Both functions must be safe to call from several threads at once.
+Codec = collections.namedtuple('Codec', ['name', 'compress', 'decompress'])
+
+# Registered codecs, by name:
+_CODECS = {}
+
+# Names of the codecs supported by container files, as a read-only live view
+# of the registered codecs:
+VALID_CODECS = _CODECS.keys()
+
+
+def RegisterCodec(name, compress, decompress):
+  """Registers a block compression codec, replacing any codec of that name.
+
+  Args:
+    name: Name of the codec, as recorded in the 'avro.codec' metadata.
+    compress: Function (data, **options) -> compressed data.
+    decompress: Function (compressed data) -> data.
+  Returns:
+    The registered codec.
+  """
+  codec = Codec(name=name, compress=compress, decompress=decompress)
+  _CODECS[name] = codec
+  return codec
+
+
+def UnregisterCodec(name):
+  """Unregisters the codec registered with a given name.
+
+  Args:
+    name: Name of the codec.
+  Raises:
+    DataFileException: if no codec is registered with that name.
+  """
+  if _CODECS.pop(name, None) is None:
+    raise DataFileException('Unknown codec: %r.' % name)
+
+
+def GetCodec(name):
+  """Reports the codec registered with a given name.
+
+  Args:
+    name: Name of the codec.
+  Returns:
+    The registered codec.
+  Raises:
+    DataFileException: if no codec is registered with that name.
+  """
+  codec = _CODECS.get(name)
+  if codec is None:
+    raise DataFileException('Unknown codec: %r.' % name)
+  return codec
+
+
+def _NullCompress(data, **options):
+  return data
+
+
+def _NullDecompress(data):
+  return data
+
+
+def _DeflateCompress(data, level=zlib.Z_DEFAULT_COMPRESSION):
+  # -15 is the log of the window size; negative indicates
+  # "raw" (no zlib headers) compression.  See zlib.h.
+  compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+  return compressor.compress(data) + compressor.flush()
+
+
+def _DeflateDecompress(data):
+  return zlib.decompress(data, -15)
+
+
+def _SnappyCompress(data, **options):
+  # Compressed data is followed by the CRC32 of the uncompressed data:
+  crc32 = binascii.crc32(data) & 0xffffffff
+  return snappy.compress(data) + avro_io.STRUCT_CRC32.pack(crc32)
+
+
+def _SnappyDecompress(data):
+  # Compressed data includes a 4-byte CRC32 checksum
+  uncompressed = snappy.decompress(data[:-4])
+  checksum = avro_io.STRUCT_CRC32.unpack(data[-4:])[0]
+  if binascii.crc32(uncompressed) & 0xffffffff != checksum:
+    raise schema.AvroException('Checksum failure')
+  return uncompressed
+
+
+def _Bzip2Compress(data, level=9):
+  return bz2.compress(data, compresslevel=level)
+
+
+def _XzCompress(data, level=None):
+  return lzma.compress(data, preset=level)
+
+
+def _ZstandardCompress(data, level=3):
+  return zstandard.ZstdCompressor(level=level).compress(data)
+
+
+def _ZstandardDecompress(data):
+  # Frames may not record the size of their content:
+  return zstandard.ZstdDecompressor().decompressobj().decompress(data)
+
+
+RegisterCodec('null', _NullCompress, _NullDecompress)
+RegisterCodec('deflate', _DeflateCompress, _DeflateDecompress)
+if has_snappy:
+  RegisterCodec('snappy', _SnappyCompress, _SnappyDecompress)
+if has_bz2:
+  RegisterCodec('bzip2', _Bzip2Compress, bz2.decompress)
+if has_lzma:
+  RegisterCodec('xz', _XzCompress, lzma.decompress)
+if has_zstandard:
+  RegisterCodec('zstandard', _ZstandardCompress, _ZstandardDecompress)
+
+
 # ------------------------------------------------------------------------------
 
 
@@ -118,6 +324,11 @@ class DataFileWriter(object):
       datum_writer,
       writer_schema=None,
       codec='null',
+      compression_threads=0,
+      codec_options=None,
+      block_size=SYNC_INTERVAL,
+      block_records=None,
+      compressed_block_size=None,
   ):
     """Constructs a new DataFileWriter instance.
 
@@ -127,16 +338,58 @@ class DataFileWriter(object):
       writer: File-like object to write into.
       datum_writer:
       writer_schema: Schema
-      codec:
+      codec: Name of a registered codec to compress blocks with.
+      compression_threads: Number of background threads compressing blocks.
+          When positive, finished blocks are compressed by a thread pool while
+          the next blocks are encoded, and written to the file in order.
+          At most twice as many blocks as threads are pending at any time:
+          beyond that, appending waits for the oldest block to be written.
+          By default, blocks are compressed inline.
+      codec_options: Optional dictionary of codec specific options,
+          eg. {'level': 9}, passed to the compress function of the codec.
+      block_size: Size of the uncompressed block data, in bytes, beyond which
+          a block is written.
+      block_records: Optional maximum number of records per block.
+      compressed_block_size: Optional target size of the compressed blocks,
+          in bytes. When set, blocks are written once their uncompressed size
+          reaches this target divided by the compression ratio achieved so
+          far, and block_size is ignored.
     """
+    if block_size <= 0:
+      raise DataFileException('Invalid block size: %r' % block_size)
+    if block_records is not None and block_records <= 0:
+      raise DataFileException(
+          'Invalid maximum number of records per block: %r' % block_records)
+    if compressed_block_size is not None and compressed_block_size <= 0:
+      raise DataFileException(
+          'Invalid compressed block size: %r' % compressed_block_size)
     self._writer = writer
     self._encoder = avro_io.BinaryEncoder(writer)
     self._datum_writer = datum_writer
-    self._buffer_writer = io.BytesIO()
-    self._buffer_encoder = avro_io.BinaryEncoder(self._buffer_writer)
+    self._buffer_encoder = avro_io.BufferEncoder()
     self._block_count = 0
     self._meta = {}
 
+    # Block sizing, and the total sizes of the blocks written so far,
+    # before and after compression:
+    self._block_size = block_size
+    self._block_records = block_records
+    self._compressed_block_size = compressed_block_size
+    self._total_uncompressed_size = 0
+    self._total_compressed_size = 0
+    if compressed_block_size is not None:
+      self._block_size = compressed_block_size
+
+    # Background block compression, and the queue of the blocks being
+    # compressed, as (block count, future compressed block data):
+    if compression_threads > 0:
+      self._compression_pool = concurrent.futures.ThreadPoolExecutor(
+          max_workers=compression_threads)
+    else:
+      self._compression_pool = None
+    self._pending_blocks = collections.deque()
+    self._max_pending_blocks = 2 * compression_threads
+
     # Ensure we have a writer that accepts bytes:
     self._writer.write(b'')
 
@@ -144,8 +397,7 @@ class DataFileWriter(object):
     self._header_written = False
 
     if writer_schema is not None:
-      if codec not in VALID_CODECS:
-        raise DataFileException('Unknown codec: %r' % codec)
+      GetCodec(codec)
       self._sync_marker = DataFileWriter.GenerateSyncMarker()
       self.SetMeta('avro.codec', codec)
       self.SetMeta('avro.schema', str(writer_schema).encode('utf-8'))
@@ -168,6 +420,15 @@ class DataFileWriter(object):
       writer.seek(0, 2)
       self._header_written = True
 
+    self._codec = GetCodec(self.GetMeta(CODEC_KEY).decode('utf-8'))
+    self._codec_options = dict(codec_options or {})
+
+    # Last schema of a raw block found to match the writer's schema:
+    self._block_schema = None
+
+    # Encoders for append_columns(), by use_numpy, created on first use:
+    self._column_writers = {}
+
   # read-only properties
 
   @property
@@ -253,58 +514,168 @@ class DataFileWriter(object):
       logging.info('Current block is empty, nothing to write.')
       return
 
-    # write number of items in block
-    self.encoder.write_long(self.block_count)
-
-    # write block contents
-    uncompressed_data = self._buffer_writer.getvalue()
-    codec = self.GetMeta(CODEC_KEY).decode('utf-8')
-    if codec == 'null':
-      compressed_data = uncompressed_data
-      compressed_data_length = len(compressed_data)
-    elif codec == 'deflate':
-      # The first two characters and last character are zlib
-      # wrappers around deflate data.
-      compressed_data = zlib.compress(uncompressed_data)[2:-1]
-      compressed_data_length = len(compressed_data)
-    elif codec == 'snappy':
-      compressed_data = snappy.compress(uncompressed_data)
-      compressed_data_length = len(compressed_data) + 4 # crc32
+    compress = self._codec.compress
+    if self._compression_pool is None:
+      # compress block contents, handing the encoded buffer off without copy
+      with self._buffer_encoder.getbuffer() as uncompressed_data:
+        self._WriteBlockData(
+            self.block_count,
+            len(uncompressed_data),
+            compress(uncompressed_data, **self._codec_options))
     else:
-      fail_msg = '"%s" codec is not supported.' % codec
-      raise DataFileException(fail_msg)
+      # hand a copy of the block contents off to the compression threads,
+      # and write compressed blocks in order, as the queue fills up
+      future = self._compression_pool.submit(
+          compress, self._buffer_encoder.getvalue(), **self._codec_options)
+      self._pending_blocks.append(
+          (self.block_count, len(self._buffer_encoder), future))
+      while len(self._pending_blocks) > self._max_pending_blocks:
+        self._WritePendingBlock()
+
+    # reset buffer
+    self._buffer_encoder.truncate()
+    self._block_count = 0
+
+  def _WritePendingBlock(self):
+    """Waits for the oldest block being compressed, and writes it."""
+    block_count, uncompressed_size, future = self._pending_blocks.popleft()
+    self._WriteBlockData(block_count, uncompressed_size, future.result())
+
+  def _WritePendingBlocks(self):
+    """Waits for all blocks being compressed, and writes them in order."""
+    while self._pending_blocks:
+      self._WritePendingBlock()
 
-    # Write length of block
-    self.encoder.write_long(compressed_data_length)
+  def _WriteBlockData(self, block_count, uncompressed_size, block_data):
+    """Writes a block, followed by a sync marker.
 
-    # Write block
-    self.writer.write(compressed_data)
+    Args:
+      block_count: Number of datums in the block.
+      uncompressed_size: Size of the block contents before compression,
+          or None if unknown.
+      block_data: Compressed block contents, as returned by the codec.
+    """
+    # write number of items in block
+    self.encoder.write_long(block_count)
 
-    # Write CRC32 checksum for Snappy
-    if self.GetMeta(CODEC_KEY) == 'snappy':
-      self.encoder.write_crc32(uncompressed_data)
+    # Write length of block, and block
+    self.encoder.write_long(len(block_data))
+    self.writer.write(block_data)
 
     # write sync marker
     self.writer.write(self.sync_marker)
 
     logging.debug(
         'Writing block with count=%d nbytes=%d sync=%r',
-        self.block_count, compressed_data_length, self.sync_marker)
+        block_count, len(block_data), self.sync_marker)
 
-    # reset buffer
-    self._buffer_writer.seek(0)
-    self._buffer_writer.truncate()
-    self._block_count = 0
+    if uncompressed_size is None:
+      return
+
+    # adapt the size of the next blocks to the compression ratio
+    self._total_uncompressed_size += uncompressed_size
+    self._total_compressed_size += len(block_data)
+    if (self._compressed_block_size is not None
+        and self._total_compressed_size > 0):
+      self._block_size = max(1, int(
+          self._compressed_block_size * self._total_uncompressed_size
+          / self._total_compressed_size))
+
+  def _IsBlockFull(self):
+    """Returns: whether the current block reached its target size."""
+    return (len(self._buffer_encoder) >= self._block_size
+            or (self._block_records is not None
+                and self._block_count >= self._block_records))
 
   def append(self, datum):
     """Append a datum to the file."""
     self.datum_writer.write(datum, self.buffer_encoder)
     self._block_count += 1
 
-    # if the data to write is larger than the sync interval, write the block
-    if self._buffer_writer.tell() >= SYNC_INTERVAL:
+    # if the block is full, write it
+    if self._IsBlockFull():
       self._WriteBlock()
 
+  def append_columns(self, columns, use_numpy=None):
+    """Appends records given as per-field columns.
+
+    Whole columns are encoded at once, without building a dictionary per
+    record, and split into blocks as per the block sizing of the writer.
+    See avro.io.ColumnWriter.
+
+    Args:
+      columns: Dictionary of the columns of every field of the schema,
+          by field name, eg. {'ts': numpy.array(...), 'value': [...]}.
+      use_numpy: Whether to encode with NumPy. Defaults to whether NumPy
+          is available.
+    """
+    column_writer = self._column_writers.get(use_numpy)
+    if column_writer is None:
+      column_writer = avro_io.ColumnWriter(
+          self.datum_writer.writer_schema, use_numpy=use_numpy)
+      self._column_writers[use_numpy] = column_writer
+    data, row_ends = column_writer.encode(columns)
+
+    start_row = 0
+    start = 0
+    count = len(row_ends)
+    while start_row < count:
+      # Fill the current block up to its target size:
+      room = max(1, self._block_size - len(self._buffer_encoder))
+      end_row = bisect.bisect_left(row_ends, start + room, lo=start_row) + 1
+      if self._block_records is not None:
+        end_row = min(
+            end_row, start_row + self._block_records - self._block_count)
+      end_row = min(end_row, count)
+      end = int(row_ends[end_row - 1])
+      self.append_encoded(end_row - start_row, bytes(data[start:end]))
+      start_row = end_row
+      start = end
+
+  def append_encoded(self, count, data):
+    """Appends datums already encoded with the writer's schema.
+
+    Allows to re-block or re-compress the contents of blocks, as decompressed
+    from DataFileReader.blocks(), without decoding their datums.
+
+    Args:
+      count: Number of datums encoded in data.
+      data: Binary encoding of the datums, as bytes.
+    """
+    self.buffer_encoder.write(data)
+    self._block_count += count
+
+    # if the block is full, write it
+    if self._IsBlockFull():
+      self._WriteBlock()
+
+  def append_block(self, block):
+    """Appends a block of encoded records, as read by DataFileReader.blocks().
+
+    The block is copied as is, without being decompressed or decoded.
+    Records appended since the last block are written first, in their
+    own block.
+
+    Args:
+      block: RawBlock to append.
+    Raises:
+      DataFileException: if the block has a different codec or schema.
+    """
+    if block.codec != self._codec.name:
+      raise DataFileException(
+          'Cannot append a block with codec %r to a file with codec %r.'
+          % (block.codec, self._codec.name))
+    if block.schema is not self._block_schema:
+      if block.schema != self.datum_writer.writer_schema:
+        raise DataFileException(
+            'Cannot append a block with a different schema:\n%s'
+            % block.schema)
+      self._block_schema = block.schema
+    self._WriteBlock()
+    if self._compression_pool is not None:
+      self._WritePendingBlocks()
+    self._WriteBlockData(block.count, None, block.data)
+
   def sync(self):
     """
     Return the current position as a value that may be passed to
@@ -312,16 +683,22 @@ class DataFileWriter(object):
     emitting a synchronization marker.
     """
     self._WriteBlock()
+    if self._compression_pool is not None:
+      self._WritePendingBlocks()
     return self.writer.tell()
 
   def flush(self):
     """Flush the current state of the file, including metadata."""
     self._WriteBlock()
+    if self._compression_pool is not None:
+      self._WritePendingBlocks()
     self.writer.flush()
 
   def close(self):
     """Close the file."""
     self.flush()
+    if self._compression_pool is not None:
+      self._compression_pool.shutdown()
     self.writer.close()
 
 
@@ -331,15 +708,53 @@ class DataFileWriter(object):
 class DataFileReader(object):
   """Read files written by DataFileWriter."""
 
-  # TODO: allow user to specify expected schema?
   # TODO: allow user to specify the encoder
-  def __init__(self, reader, datum_reader):
+  def __init__(
+      self,
+      reader,
+      datum_reader,
+      projection=None,
+      index=None,
+      prefetch_blocks=0,
+      streaming=None,
+      reader_schema=None,
+  ):
     """Initializes a new data file reader.
 
     Args:
       reader: Open file to read from.
       datum_reader: Avro datum reader.
+      projection: Optional list of the paths of the fields to read,
+          eg. ['user.id', 'ts']. Other fields are skipped without being
+          decoded. See DatumReader. Exclusive with reader_schema.
+      index: Optional open sidecar index file, as written by WriteIndex(),
+          used to address records by number. When not specified, the index
+          is built by scanning the block headers of the file on first use.
+      prefetch_blocks: Number of blocks to read ahead. When positive,
+          a background thread reads and decompresses the next blocks while
+          the current one is decoded; memory use is bounded by about that
+          many decompressed blocks. By default, blocks are read on demand.
+      streaming: Whether to read the input as a non-seekable stream, such as
+          a pipe or a socket: the input is then read through an internal
+          buffer, and the end of the file is detected when reading from the
+          input returns no data. Positions are reported as the number of
+          bytes consumed, and seeking is only supported forward: the block
+          index and the operations relying on it are not available.
+          By default, streaming is enabled for inputs whose seekable() method
+          reports that they are not seekable.
+      reader_schema: Optional schema to resolve the datums of the file to.
+          Defaults to the reader's schema of the datum reader, if any, or
+          to the schema of the file. Replaces the projection of the datum
+          reader, if any.
     """
+    if streaming is None:
+      streaming = hasattr(reader, 'seekable') and not reader.seekable()
+    if streaming:
+      reader = _StreamReader(reader)
+    self._streaming = streaming
+    if reader_schema is not None and projection is not None:
+      raise DataFileException(
+          'Cannot specify both a reader schema and a projection.')
     self._reader = reader
     self._raw_decoder = avro_io.BinaryDecoder(reader)
     self._datum_decoder = None # Maybe reset at every block.
@@ -349,18 +764,46 @@ class DataFileReader(object):
     self._read_header()
 
     # ensure codec is valid
-    self.codec = self.GetMeta('avro.codec').decode('utf-8')
-    if self.codec is None:
+    codec = self.GetMeta(CODEC_KEY)
+    if codec is None:
       self.codec = "null"
-    if self.codec not in VALID_CODECS:
-      raise DataFileException('Unknown codec: %s.' % self.codec)
+    else:
+      self.codec = codec.decode('utf-8')
+    self._codec = GetCodec(self.codec)
 
-    self._file_length = self._GetInputFileLength()
+    if self._streaming:
+      self._file_length = None
+    else:
+      self._file_length = self._GetInputFileLength()
 
     # get ready to read
     self._block_count = 0
+    self._block_start = self._data_start = self.reader.tell()
+    if reader_schema is not None:
+      # Otherwise, the projection of the datum reader overrides the schema:
+      self.datum_reader.projection = None
+      self.datum_reader.reader_schema = reader_schema
+    if projection is not None:
+      self.datum_reader.projection = projection
     self.datum_reader.writer_schema = (
-        schema.Parse(self.GetMeta(SCHEMA_KEY).decode('utf-8')))
+        _ParseSchema(self.GetMeta(SCHEMA_KEY).decode('utf-8')))
+
+    # Resolve the schemas now; plans are shared across files, see DatumReader:
+    self.datum_reader.resolve()
+
+    # Background thread reading blocks ahead, while running, the position
+    # of the block following the last block handed off by the thread, and
+    # whether that block ends the file:
+    self._prefetch_blocks = prefetch_blocks
+    self._prefetcher = None
+    self._prefetch_position = None
+    self._prefetch_at_end = False
+
+    # Block index, and the number of the first record of each block:
+    self._index = None
+    self._first_records = None
+    if index is not None:
+      self._SetIndex(ReadIndex(index, sync_marker=self.sync_marker))
 
   def __enter__(self):
     return self
@@ -404,9 +847,19 @@ class DataFileReader(object):
 
   @property
   def file_length(self):
-    """Length of the input file, in bytes."""
+    """Length of the input file, in bytes, or None for a streaming input."""
     return self._file_length
 
+  @property
+  def index(self):
+    """Block index of the file, as a list of BlockIndexEntry.
+
+    Built by scanning the block headers of the file if no index was loaded.
+    """
+    if self._index is None:
+      self._SetIndex(self.BuildIndex())
+    return self._index
+
   # read/write properties
   @property
   def block_count(self):
@@ -448,7 +901,15 @@ class DataFileReader(object):
     return file_length
 
   def is_EOF(self):
-    return self.reader.tell() == self.file_length
+    if self._prefetcher is None:
+      return self._AtEndOfInput()
+    return self._prefetch_at_end
+
+  def _AtEndOfInput(self):
+    """Returns: whether the input has been read entirely."""
+    if self._streaming:
+      return self.reader.at_eof()
+    return self.reader.tell() >= self.file_length
 
   def _read_header(self):
     # seek to the beginning of the file to get magic block
@@ -470,63 +931,792 @@ class DataFileReader(object):
     # set sync marker
     self._sync_marker = header['sync']
 
-  def _read_block_header(self):
-    self._block_count = self.raw_decoder.read_long()
-    if self.codec == "null":
-      # Skip a long; we don't need to use the length.
-      self.raw_decoder.skip_long()
-      self._datum_decoder = self._raw_decoder
-    elif self.codec == 'deflate':
-      # Compressed data is stored as (length, data), which
-      # corresponds to how the "bytes" type is encoded.
-      data = self.raw_decoder.read_bytes()
-      # -15 is the log of the window size; negative indicates
-      # "raw" (no zlib headers) decompression.  See zlib.h.
-      uncompressed = zlib.decompress(data, -15)
-      self._datum_decoder = avro_io.BinaryDecoder(io.BytesIO(uncompressed))
-    elif self.codec == 'snappy':
-      # Compressed data includes a 4-byte CRC32 checksum
-      length = self.raw_decoder.read_long()
-      data = self.raw_decoder.read(length - 4)
-      uncompressed = snappy.decompress(data)
-      self._datum_decoder = avro_io.BinaryDecoder(io.BytesIO(uncompressed))
-      self.raw_decoder.check_crc32(uncompressed);
-    else:
-      raise DataFileException("Unknown codec: %r" % self.codec)
+  def _ReadBlockData(self):
+    """Reads and decompresses the block at the current position.
+
+    Also reads the sync marker that ends the block.
 
-  def _skip_sync(self):
+    Returns:
+      The number of datums in the block, and the decompressed block data.
     """
-    Read the length of the sync marker; if it matches the sync marker,
-    return True. Otherwise, seek back to where we started and return False.
+    block_count, data = self._ReadRawBlock()
+    return block_count, self._codec.decompress(data)
+
+  def _ReadRawBlock(self):
+    """Reads the block at the current position, without decompressing it.
+
+    Also reads the sync marker that ends the block.
+
+    Returns:
+      The number of datums in the block, and the compressed block data.
+    """
+    block_count = self.raw_decoder.read_long()
+    # Block data is stored as (length, data), which
+    # corresponds to how the "bytes" type is encoded.
+    data = self.raw_decoder.read_bytes()
+    self._read_sync()
+    return block_count, data
+
+  def blocks(self):
+    """Iterates over the blocks of the file, without decompressing them.
+
+    Iteration starts with the next block to read: the datums left in the
+    current block, if any, are discarded. The iteration moves the reader.
+
+    Yields:
+      The blocks of the file, as RawBlock.
+    """
+    self.seek(self._Tell())
+    while not self.is_EOF():
+      offset = self.reader.tell()
+      block_count, data = self._ReadRawBlock()
+      yield RawBlock(
+          count=block_count,
+          codec=self.codec,
+          data=data,
+          offset=offset,
+          schema=self.datum_reader.writer_schema,
+      )
+
+  def _read_sync(self):
+    """Reads the synchronization marker that ends a block.
+
+    Raises:
+      DataFileException: if the bytes read are not the sync marker.
     """
     proposed_sync_marker = self.reader.read(SYNC_SIZE)
     if proposed_sync_marker != self.sync_marker:
-      self.reader.seek(-SYNC_SIZE, 1)
+      raise DataFileException(
+          'Invalid sync marker at position %d: %r'
+          % (self.reader.tell() - len(proposed_sync_marker),
+             proposed_sync_marker))
+
+  def _read_block(self):
+    """Reads the next block of the file.
+
+    Returns:
+      False if the end of the file was reached, True otherwise.
+    """
+    if self._prefetch_blocks > 0:
+      return self._ReadPrefetchedBlock()
+    if self.is_EOF():
       return False
-    else:
-      return True
+    self._block_start = self.reader.tell()
+    self._block_count, uncompressed = self._ReadBlockData()
+    self._datum_decoder = avro_io.BufferDecoder(uncompressed)
+    return True
+
+  def _ReadPrefetchedBlock(self):
+    """Reads the next block of the file, as read ahead by a background thread.
+
+    Returns:
+      False if the end of the file was reached, True otherwise.
+    """
+    if self._prefetcher is None:
+      if self.is_EOF():
+        return False
+      self._prefetch_position = self.reader.tell()
+      if self._streaming:
+        self.reader.keep(self._prefetch_position)
+      self._prefetcher = _BlockPrefetcher(
+          self._PrefetchBlock, self._prefetch_blocks)
+    block = self._prefetcher.get()
+    if block is None:
+      self._StopPrefetch()
+      return False
+    if isinstance(block, Exception):
+      self._StopPrefetch()
+      raise block
+    (self._block_start, self._block_count, uncompressed,
+     self._prefetch_position, self._prefetch_at_end) = block
+    if self._streaming:
+      self.reader.keep(self._prefetch_position)
+    self._datum_decoder = avro_io.BufferDecoder(uncompressed)
+    return True
+
+  def _PrefetchBlock(self):
+    """Reads the block at the current position, from the prefetch thread.
+
+    Returns:
+      None if the end of the file was reached, otherwise a tuple:
+      (block position, block count, block data, position of the next block,
+      whether the block ends the file).
+    """
+    block_start = self.reader.tell()
+    if self._AtEndOfInput():
+      return None
+    block_count, uncompressed = self._ReadBlockData()
+    return (block_start, block_count, uncompressed, self.reader.tell(),
+            self._AtEndOfInput())
+
+  def _StopPrefetch(self):
+    """Stops reading ahead, and moves the file to the next block to read.
+
+    A streaming input keeps the bytes of the blocks read ahead and not yet
+    consumed, to move back to them.
+    """
+    if self._prefetcher is not None:
+      self._prefetcher.stop()
+      self._prefetcher = None
+      self.reader.seek(self._prefetch_position)
+      if self._streaming:
+        self.reader.keep(None)
+
+  def _Tell(self):
+    """Returns: the position of the next block to read."""
+    if self._prefetcher is not None:
+      return self._prefetch_position
+    return self.reader.tell()
 
-  # TODO: handle block of length zero
-  # TODO: clean this up with recursion
   def __next__(self):
     """Return the next datum in the file."""
-    if self.block_count == 0:
-      if self.is_EOF():
+    while self.block_count == 0:
+      if not self._read_block():
         raise StopIteration
-      elif self._skip_sync():
-        if self.is_EOF(): raise StopIteration
-        self._read_block_header()
-      else:
-        self._read_block_header()
 
     datum = self.datum_reader.read(self.datum_decoder)
     self._block_count -= 1
     return datum
 
+  def iter_batches(self):
+    """Iterates over the datums of the file, one block at a time.
+
+    Each block is decoded in a single loop, without the per-datum
+    bookkeeping of the iterator interface. Datums are decoded with the read
+    plan of the datum reader, unless its class customizes decoding: see
+    DatumReader.uses_read_plan.
+
+    Yields:
+      Lists of the datums of each block. The first list holds the datums
+      left in the current block, if any.
+    """
+    while True:
+      while self.block_count == 0:
+        if not self._read_block():
+          return
+      if self.datum_reader.uses_read_plan:
+        read = self.datum_reader.read_plan
+      else:
+        read = self.datum_reader.read
+      decoder = self.datum_decoder
+      batch = [read(decoder) for _ in range(self.block_count)]
+      self._block_count = 0
+      yield batch
+
+  def read_all(self):
+    """Returns: the list of the datums left in the file."""
+    datums = []
+    for batch in self.iter_batches():
+      datums.extend(batch)
+    return datums
+
+  def iter_columns(self, fields=None, use_numpy=None):
+    """Iterates over the records of the file, one block of columns at a time.
+
+    Records are decoded straight into per-field columns, without building
+    a dictionary per record. Records are decoded with the schema of the file:
+    the reader's schema and projection of the datum reader do not apply.
+    See avro.io.ColumnReader.
+
+    Args:
+      fields: Optional list of the names of the fields to decode.
+      use_numpy: Whether to decode into NumPy arrays. Defaults to whether
+          NumPy is available.
+    Yields:
+      Dictionaries of the columns of each block, by field name. The first
+      block holds the records left in the current block, if any.
+    """
+    column_reader = avro_io.ColumnReader(
+        self.datum_reader.writer_schema, fields=fields, use_numpy=use_numpy)
+    return self._IterColumns(column_reader)
+
+  def _IterColumns(self, column_reader):
+    while True:
+      while self.block_count == 0:
+        if not self._read_block():
+          return
+      columns = column_reader.read(self.datum_decoder, self.block_count)
+      self._block_count = 0
+      yield columns
+
+  def read_columns(self, fields=None, use_numpy=None):
+    """Decodes the records left in the file into per-field columns.
+
+    Args:
+      fields: Optional list of the names of the fields to decode.
+      use_numpy: Whether to decode into NumPy arrays. Defaults to whether
+          NumPy is available.
+    Returns:
+      A dictionary of the columns, by field name. See iter_columns().
+    """
+    column_reader = avro_io.ColumnReader(
+        self.datum_reader.writer_schema, fields=fields, use_numpy=use_numpy)
+    return column_reader.concat(list(self._IterColumns(column_reader)))
+
+  def __getitem__(self, record):
+    """Reads the record with the given number.
+
+    Only the block holding the record is read and decompressed.
+    Reading continues with the next record of the file.
+
+    Args:
+      record: Number of the record to read, from 0. Negative numbers count
+          from the end of the file.
+    Returns:
+      The record with the given number.
+    """
+    count = self.count()
+    if record < 0:
+      record += count
+    if not (0 <= record < count):
+      raise IndexError('Record number out of range: %r' % record)
+    self._SeekRecord(record)
+    return next(self)
+
+  def count(self):
+    """Returns: the number of records in the file, as per the block index."""
+    if len(self.index) == 0:
+      return 0
+    last = self.index[-1]
+    return last.first_record + last.count
+
+  def records(self, start, stop):
+    """Iterates over a range of records.
+
+    Only the blocks holding the records in the range are read and
+    decompressed. The iteration moves the reader.
+
+    Args:
+      start: Number of the first record of the range.
+      stop: Number of the record following the range.
+          As with slices, negative numbers count from the end of the file,
+          and the range is clamped to the records of the file.
+    Yields:
+      The records numbered from start to stop, excluded.
+    """
+    start, stop, _ = slice(start, stop).indices(self.count())
+    if start < stop:
+      self._SeekRecord(start)
+      for _ in range(stop - start):
+        yield next(self)
+
+  def _SeekRecord(self, record):
+    """Moves the reader to the record with the given number.
+
+    Args:
+      record: Number of the record, in the range of the block index.
+    """
+    self._CheckSeekable('Addressing records by number')
+    index = self.index
+    entry = index[bisect.bisect_right(self._first_records, record) - 1]
+    self.seek(entry.offset)
+    self._read_block()
+    for _ in range(record - entry.first_record):
+      self.datum_reader.skip(self.datum_decoder)
+      self._block_count -= 1
+
+  def _SetIndex(self, index):
+    self._index = index
+    self._first_records = [entry.first_record for entry in index]
+
+  def _CheckSeekable(self, operation):
+    """Fails if the input is read as a non-seekable stream.
+
+    Args:
+      operation: Description of the operation that requires seeking.
+    Raises:
+      DataFileException: if the input is read as a stream.
+    """
+    if self._streaming:
+      raise DataFileException('%s requires a seekable file.' % operation)
+
+  def BuildIndex(self, uncompressed_sizes=False):
+    """Builds the block index of the file.
+
+    Only reads the header of each block: block data is neither read nor
+    decompressed, unless uncompressed sizes are requested for a compressed
+    file. Leaves the current position unmodified.
+
+    Args:
+      uncompressed_sizes: Whether to decompress the blocks of a compressed
+          file to report their uncompressed sizes. Records are not decoded.
+    Returns:
+      The block index of the file, as a list of BlockIndexEntry.
+    Raises:
+      DataFileException: if the input is read as a stream.
+    """
+    self._CheckSeekable('Building a block index')
+    self._StopPrefetch()
+    current_pos = self.reader.tell()
+    index = []
+    first_record = 0
+    position = self._data_start
+    self.reader.seek(position)
+    while position < self.file_length:
+      count = self.raw_decoder.read_long()
+      compressed_size = self.raw_decoder.read_long()
+      if self.codec == 'null':
+        uncompressed_size = compressed_size
+        self.reader.seek(compressed_size, 1)
+      elif uncompressed_sizes:
+        uncompressed_size = len(
+            self._codec.decompress(self.reader.read(compressed_size)))
+      else:
+        uncompressed_size = None
+        self.reader.seek(compressed_size, 1)
+      index.append(BlockIndexEntry(
+          offset=position,
+          count=count,
+          first_record=first_record,
+          compressed_size=compressed_size,
+          uncompressed_size=uncompressed_size,
+      ))
+      self._read_sync()
+      first_record += count
+      position = self.reader.tell()
+    self.reader.seek(current_pos)
+    return index
+
+  def seek(self, position):
+    """Moves the reader to a block boundary.
+
+    Decoding resumes with the first datum of the block at the given position.
+
+    Args:
+      position: Position of a block in the file, as returned by
+          DataFileWriter.sync(), or the position of the reader after
+          a call to sync().
+    """
+    self._StopPrefetch()
+    self.reader.seek(position)
+    self._block_start = position
+    self._block_count = 0
+    self._datum_decoder = None
+
+  def sync(self, position):
+    """Moves the reader to the first block that starts after a position.
+
+    Scans the file forward from the given byte position for the next
+    synchronization marker, and resumes decoding with the block that follows
+    the marker. Moves to the end of the file if there is no such marker.
+
+    Args:
+      position: Byte position in the file to scan from.
+    """
+    self._StopPrefetch()
+    self.reader.seek(position)
+    if self._streaming:
+      self._SyncStream()
+      return
+    window = b''
+    while True:
+      chunk = self.reader.read(SYNC_SCAN_SIZE)
+      if not chunk:
+        position = self.reader.tell()
+        break
+      # Keep the end of the previous chunk, in case it holds a partial marker:
+      window = window[-(SYNC_SIZE - 1):] + chunk
+      index = window.find(self.sync_marker)
+      if index >= 0:
+        position = self.reader.tell() - len(window) + index + SYNC_SIZE
+        break
+    self.seek(position)
+
+  def _SyncStream(self):
+    """Moves a streaming input past the next synchronization marker.
+
+    Looks ahead in the stream buffer, so that the stream is only consumed up
+    to the end of the marker.
+    """
+    while True:
+      window = self.reader.peek(SYNC_SCAN_SIZE)
+      index = window.find(self.sync_marker)
+      if index >= 0:
+        self.reader.seek(index + SYNC_SIZE, 1)
+        break
+      if len(window) < SYNC_SCAN_SIZE:
+        # End of the stream:
+        self.reader.seek(len(window), 1)
+        break
+      # Keep the end of the window, in case it holds a partial marker:
+      self.reader.seek(len(window) - (SYNC_SIZE - 1), 1)
+    self.seek(self.reader.tell())
+
+  def past_sync(self, position):
+    """Reports whether the reader moved past the first sync marker after
+    a given position.
+
+    Together with sync(), this allows to split a file into byte ranges that
+    are decoded independently: a range [start, end) covers the blocks that
+    follow the first marker at or after start, and stops when past_sync(end)
+    becomes true. Each block is thus read by exactly one range.
+
+    Args:
+      position: Byte position in the file.
+    Returns:
+      True if the next datum to read comes from a block that starts after
+      the first sync marker at or after the given position.
+    """
+    if self.block_count == 0:
+      block_start = self._Tell()
+    else:
+      block_start = self._block_start
+    return (block_start >= position + SYNC_SIZE
+            or (self.block_count == 0 and self.is_EOF()))
+
   def close(self):
     """Close this reader."""
+    self._StopPrefetch()
     self.reader.close()
 
 
+@functools.lru_cache(maxsize=256)
+def _ParseSchema(schema_json):
+  """Parses the schema of a data file.
+
+  Files written with the same schema share the same parsed schema.
+  """
+  return schema.Parse(schema_json)
+
+
+class _StreamReader(object):
+  """Buffered reader over a non-seekable input stream.
+
+  Reports positions as the number of bytes consumed from the stream, and
+  detects the end of the stream when reading from it returns no data.
+  """
+
+  def __init__(self, stream, buffer_size=STREAM_BUFFER_SIZE):
+    """Initializes a new stream reader.
+
+    Args:
+      stream: Input stream to read from, with a read(size) method.
+      buffer_size: Minimum number of bytes to read from the stream at a time.
+    """
+    self._stream = stream
+    self._buffer_size = buffer_size
+    self._buffer = b''
+    self._pos = 0      # position of the next byte to read in the buffer
+    self._offset = 0   # position of the buffer in the stream
+    self._eof = False
+    self._keep = None  # position in the stream of the bytes to keep, if any
+
+  def _Fill(self, size):
+    """Buffers at least size bytes, unless the stream ends before."""
+    available = len(self._buffer) - self._pos
+    if available >= size or self._eof:
+      return
+    # Consumed bytes are dropped, except those kept to move back to:
+    keep = self._keep
+    start = self._pos if keep is None else min(self._pos, keep - self._offset)
+    chunks = [self._buffer[start:]]
+    while available < size:
+      chunk = self._stream.read(max(self._buffer_size, size - available))
+      if not chunk:
+        self._eof = True
+        break
+      chunks.append(chunk)
+      available += len(chunk)
+    self._offset += start
+    self._buffer = b''.join(chunks)
+    self._pos -= start
+
+  def read(self, size):
+    self._Fill(size)
+    data = self._buffer[self._pos:self._pos + size]
+    self._pos += len(data)
+    return data
+
+  def peek(self, size):
+    """Returns up to size bytes ahead in the stream, without consuming them.
+
+    Fewer bytes are returned only at the end of the stream.
+    """
+    self._Fill(size)
+    return self._buffer[self._pos:self._pos + size]
+
+  def keep(self, position):
+    """Keeps the bytes consumed from a position on, to move back to them.
+
+    Args:
+      position: Position in the stream of the first byte to keep, not before
+          the current position or the position previously kept, or None to
+          stop keeping consumed bytes.
+    """
+    self._keep = position
+
+  def seek(self, offset, whence=0):
+    """Moves forward, by reading and discarding the bytes skipped over.
+
+    Moves backward only to bytes kept with keep().
+    """
+    if whence == 0:
+      offset -= self.tell()
+    elif whence != 1:
+      raise io.UnsupportedOperation('Cannot seek relative to end of stream')
+    if offset < 0:
+      if self._pos + offset < 0:
+        raise io.UnsupportedOperation('Cannot seek backward in a stream')
+      self._pos += offset
+      return self.tell()
+    while offset > 0 and not self.at_eof():
+      offset -= len(self.read(min(offset, self._buffer_size)))
+    return self.tell()
+
+  def tell(self):
+    return self._offset + self._pos
+
+  def at_eof(self):
+    """Returns: whether the stream has been read entirely."""
+    self._Fill(1)
+    return self._pos >= len(self._buffer)
+
+  def seekable(self):
+    return False
+
+  def close(self):
+    self._stream.close()
+
+
+class _BlockPrefetcher(object):
+  """Reads the blocks of a data file ahead, on a background thread."""
+
+  def __init__(self, read_block, max_blocks):
+    """Starts reading blocks ahead.
+
+    Args:
+      read_block: Function reading the next block, or returning None at the
+          end of the file. Runs on the background thread.
+      max_blocks: Maximum number of blocks read ahead and not yet consumed.
+    """
+    self._read_block = read_block
+    self._queue = queue.Queue(maxsize=max_blocks)
+    self._stopped = threading.Event()
+    self._thread = threading.Thread(
+        target=self._Run, name='avro-prefetch', daemon=True)
+    self._thread.start()
+
+  def _Run(self):
+    while not self._stopped.is_set():
+      try:
+        block = self._read_block()
+      except Exception as exn:
+        block = exn
+      self._queue.put(block)
+      if block is None or isinstance(block, Exception):
+        return
+
+  def get(self):
+    """Returns: the next block, None at the end of the file, or the exception
+        raised while reading the next block.
+    """
+    return self._queue.get()
+
+  def stop(self):
+    """Stops reading ahead, and discards the blocks not yet consumed."""
+    self._stopped.set()
+    while self._thread.is_alive():
+      # Make room for the thread, in case it waits on a full queue:
+      try:
+        while True:
+          self._queue.get_nowait()
+      except queue.Empty:
+        pass
+      self._thread.join(timeout=0.01)
+
+
+# ------------------------------------------------------------------------------
+
+
+def WriteIndex(writer, index, sync_marker):
+  """Writes a sidecar block index.
+
+  The index is written as an Avro data file of INDEX_SCHEMA records.
+  The writer is flushed but not closed.
+
+  Args:
+    writer: File-like object to write the index into.
+    index: Block index to write, as a list of BlockIndexEntry.
+    sync_marker: Sync marker of the indexed data file, recorded in the index
+        to detect an index that does not describe a data file.
+  """
+  dfw = DataFileWriter(writer, avro_io.DatumWriter(), INDEX_SCHEMA)
+  dfw.SetMeta(INDEX_SYNC_KEY, sync_marker)
+  for entry in index:
+    dfw.append(entry._asdict())
+  dfw.flush()
+
+
+def ReadIndex(reader, sync_marker=None):
+  """Reads a sidecar block index, as written by WriteIndex().
+
+  Args:
+    reader: Open sidecar index file to read from.
+    sync_marker: Optional sync marker of the indexed data file.
+  Returns:
+    The block index, as a list of BlockIndexEntry.
+  Raises:
+    DataFileException: if the index was built for a different data file.
+  """
+  dfr = DataFileReader(reader, avro_io.DatumReader())
+  if sync_marker is not None and dfr.GetMeta(INDEX_SYNC_KEY) != sync_marker:
+    raise DataFileException('Block index does not match the data file.')
+  return [BlockIndexEntry(**entry) for entry in dfr]
+
+
+# ------------------------------------------------------------------------------
+
+
+def ParallelScan(
+    path,
+    function=None,
+    per_block=False,
+    ordered=True,
+    processes=None,
+    projection=None,
+    split_size=PARALLEL_SPLIT_SIZE,
+    max_splits=None,
+    queue_size=PARALLEL_QUEUE_SIZE,
+):
+  """Decodes a data file with a pool of worker processes.
+
+  The file is split into byte ranges of split_size bytes. Each worker opens
+  the file, syncs to the first block after the start of its range, and decodes
+  the blocks that start within its range (see DataFileReader.past_sync()).
+  Each block is thus decoded by exactly one worker.
+
+  Memory use is bounded: at most max_splits splits are scheduled ahead of the
+  first split not yet fully yielded, and the workers block once queue_size
+  block results are waiting to be consumed.
+
+  Args:
+    path: Path of the data file to read.
+    function: Optional function applied in the worker processes, to each
+        record or to each block as a list of records, depending on per_block.
+        Must be picklable, eg. a module-level function.
+    per_block: When set, yield one result per block rather than per record.
+    ordered: When set, results are yielded in the order of the file.
+        Otherwise, the results of each block are yielded as soon as the
+        block has been decoded.
+    processes: Number of worker processes. Defaults to the number of CPUs.
+    projection: Optional list of the paths of the fields to read.
+        See DatumReader.
+    split_size: Size of the byte ranges the file is split into, in bytes.
+    max_splits: Maximum number of splits scheduled at once.
+        Defaults to twice the number of worker processes.
+    queue_size: Maximum number of block results buffered between the worker
+        processes and the consumer.
+  Yields:
+    The result of the function for each record, or for each block, or the
+    record or the list of the records of the block if no function is given.
+  """
+  file_length = os.path.getsize(path)
+  tasks = [
+      (split, path, start, min(start + split_size, file_length),
+       function, per_block, projection)
+      for split, start in enumerate(range(0, file_length, split_size))]
+  if processes is None:
+    processes = os.cpu_count() or 1
+  if max_splits is None:
+    max_splits = 2 * processes
+  # Results are streamed back one block at a time, as messages
+  # (split, kind, value): see _ScanSplit().
+  messages = multiprocessing.Queue(maxsize=queue_size)
+  pool = multiprocessing.Pool(
+      processes, initializer=_InitScanWorker, initargs=(messages,))
+  # Number of splits submitted and not yet done or failed:
+  running = 0
+  try:
+    # Results received ahead of the split being yielded, by split:
+    pending = collections.defaultdict(list)
+    finished = set()
+    current = 0
+    submitted = 0
+    while current < len(tasks):
+      # Splits are scheduled within a window that starts at the first split
+      # not yet fully yielded, which bounds the pending results:
+      while submitted < min(current + max_splits, len(tasks)):
+        pool.apply_async(
+            _ScanSplit, (tasks[submitted],),
+            error_callback=lambda exn: messages.put((None, _SCAN_ERROR, exn)))
+        submitted += 1
+        running += 1
+
+      split, kind, value = messages.get()
+      if kind != _SCAN_RESULTS:
+        running -= 1
+      if kind == _SCAN_ERROR:
+        raise value
+      elif not ordered:
+        if kind == _SCAN_RESULTS:
+          yield from value
+        else:
+          current += 1
+      elif kind == _SCAN_DONE:
+        finished.add(split)
+        while current in finished:
+          finished.remove(current)
+          current += 1
+          yield from pending.pop(current, ())
+      elif split == current:
+        yield from value
+      else:
+        pending[split].extend(value)
+  finally:
+    # The pool is never terminated: a worker killed while it waits on, or
+    # holds the lock of, the message queue may stall the shutdown. Instead,
+    # the messages of the running splits are drained, after an error or when
+    # the consumer stops early, until every worker is idle:
+    while running:
+      _, kind, _ = messages.get()
+      if kind != _SCAN_RESULTS:
+        running -= 1
+    pool.close()
+    pool.join()
+
+
+# Kinds of the messages sent by the worker processes of ParallelScan():
+_SCAN_RESULTS = 'results'  # results of a block
+_SCAN_DONE = 'done'        # all the blocks of the split have been sent
+_SCAN_ERROR = 'error'      # a worker failed, with the exception
+
+# Queue of the messages of a worker process of ParallelScan():
+_scan_messages = None
+
+
+def _InitScanWorker(messages):
+  """Initializes a worker process of ParallelScan()."""
+  global _scan_messages
+  _scan_messages = messages
+
+
+def _ScanSplit(task):
+  """Decodes the blocks of a data file that start within a byte range.
+
+  Runs in a worker process of ParallelScan(), and sends the results of each
+  block as soon as the block is decoded.
+
+  Args:
+    task: Tuple (split, path, start, end, function, per_block, projection).
+  """
+  split, path, start, end, function, per_block, projection = task
+  with open(path, 'rb') as reader:
+    dfr = DataFileReader(reader, avro_io.DatumReader(), projection=projection)
+    dfr.sync(start)
+    batches = dfr.iter_batches()
+    while not dfr.past_sync(end):
+      block = next(batches, None)
+      if block is None:
+        break
+      if per_block:
+        results = [block if function is None else function(block)]
+      elif function is None:
+        results = block
+      else:
+        results = list(map(function, block))
+      _scan_messages.put((split, _SCAN_RESULTS, results))
+  _scan_messages.put((split, _SCAN_DONE, None))
+
+
 if __name__ == '__main__':
   raise Exception('Not a standalone module')
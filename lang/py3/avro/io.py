@@ -41,14 +41,25 @@ following mapping:
  - Schema booleans are implemented as bool.
 """
 
+import array
 import binascii
+import collections
+import copy
 import json
 import logging
+import operator
 import struct
 import sys
+import threading
 
 from avro import schema
 
+try:
+  import numpy
+  has_numpy = True
+except ImportError:
+  has_numpy = False
+
 
 # ------------------------------------------------------------------------------
 # Constants
@@ -64,6 +75,8 @@ STRUCT_LONG = struct.Struct('!Q')    # big-endian unsigned long long
 STRUCT_FLOAT = struct.Struct('!f')   # big-endian float
 STRUCT_DOUBLE = struct.Struct('!d')  # big-endian double
 STRUCT_CRC32 = struct.Struct('>I')   # big-endian unsigned int
+STRUCT_FLOAT_LE = struct.Struct('<f')   # little-endian float
+STRUCT_DOUBLE_LE = struct.Struct('<d')  # little-endian double
 
 
 # ------------------------------------------------------------------------------
@@ -72,11 +85,20 @@ STRUCT_CRC32 = struct.Struct('>I')   # big-endian unsigned int
 
 class AvroTypeException(schema.AvroException):
   """Raised when datum is not an example of schema."""
-  def __init__(self, expected_schema, datum):
+  def __init__(self, expected_schema, datum, path=None):
+    """
+    path optionally locates the datum within the top-level datum being
+    written, eg. 'user.emails[2]'.
+    """
     pretty_expected = json.dumps(json.loads(str(expected_schema)), indent=2)
-    fail_msg = "The datum %s is not an example of the schema %s"\
-               % (datum, pretty_expected)
+    if path:
+      fail_msg = "The datum %s at %s is not an example of the schema %s"\
+                 % (datum, path, pretty_expected)
+    else:
+      fail_msg = "The datum %s is not an example of the schema %s"\
+                 % (datum, pretty_expected)
     schema.AvroException.__init__(self, fail_msg)
+    self.path = path
 
 
 class SchemaResolutionException(schema.AvroException):
@@ -121,7 +143,7 @@ def Validate(expected_schema, datum):
   elif schema_type == 'fixed':
     return isinstance(datum, bytes) and (len(datum) == expected_schema.size)
   elif schema_type == 'enum':
-    return datum in expected_schema.symbols
+    return isinstance(datum, str) and (datum in expected_schema.symbol_set)
   elif schema_type == 'array':
     return (isinstance(datum, list)
         and all(Validate(expected_schema.items, item) for item in datum))
@@ -141,6 +163,106 @@ def Validate(expected_schema, datum):
     raise AvroTypeException('Unknown Avro schema type: %r' % schema_type)
 
 
+def CompileValidator(expected_schema):
+  """Compiles a schema into a validation function.
+
+  The returned function is equivalent to Validate(expected_schema, datum),
+  without the per-datum dispatch on the schema type.
+
+  Args:
+    expected_schema: Schema to validate against.
+  Returns:
+    A function datum -> bool.
+  """
+  return _CompileValidator(expected_schema, memo={})
+
+
+def _CompileValidator(expected_schema, memo):
+  key = id(expected_schema)
+  validator = memo.get(key)
+  if validator is None:
+    if expected_schema.type in ['record', 'error', 'request']:
+      # Records may be recursive: register a forwarding validator first.
+      resolved = []
+      memo[key] = lambda datum: resolved[0](datum)
+      validator = _CompileValidatorData(expected_schema, memo)
+      resolved.append(validator)
+    else:
+      validator = _CompileValidatorData(expected_schema, memo)
+    memo[key] = validator
+  return validator
+
+
+def _CompileValidatorData(expected_schema, memo):
+  schema_type = expected_schema.type
+  if schema_type == 'null':
+    return lambda datum: datum is None
+  elif schema_type == 'boolean':
+    return lambda datum: isinstance(datum, bool)
+  elif schema_type == 'string':
+    return lambda datum: isinstance(datum, str)
+  elif schema_type == 'bytes':
+    return lambda datum: isinstance(datum, bytes)
+  elif schema_type == 'int':
+    return lambda datum: (isinstance(datum, int)
+        and (INT_MIN_VALUE <= datum <= INT_MAX_VALUE))
+  elif schema_type == 'long':
+    return lambda datum: (isinstance(datum, int)
+        and (LONG_MIN_VALUE <= datum <= LONG_MAX_VALUE))
+  elif schema_type in ['float', 'double']:
+    return lambda datum: isinstance(datum, (int, float))
+  elif schema_type == 'fixed':
+    size = expected_schema.size
+    return lambda datum: isinstance(datum, bytes) and (len(datum) == size)
+  elif schema_type == 'enum':
+    symbols = expected_schema.symbol_set
+    return lambda datum: isinstance(datum, str) and (datum in symbols)
+  elif schema_type == 'array':
+    validate_item = _CompileValidator(expected_schema.items, memo)
+    return lambda datum: (isinstance(datum, list)
+        and all(map(validate_item, datum)))
+  elif schema_type == 'map':
+    validate_value = _CompileValidator(expected_schema.values, memo)
+    return lambda datum: (isinstance(datum, dict)
+        and all(isinstance(key, str) for key in datum.keys())
+        and all(map(validate_value, datum.values())))
+  elif schema_type in ['union', 'error_union']:
+    validate_branches = tuple(
+        _CompileValidator(union_branch, memo)
+        for union_branch in expected_schema.schemas)
+    return lambda datum: any(
+        validate_branch(datum) for validate_branch in validate_branches)
+  elif schema_type in ['record', 'error', 'request']:
+    validate_fields = tuple(
+        (field.name, _CompileValidator(field.type, memo))
+        for field in expected_schema.fields)
+    return lambda datum: (isinstance(datum, dict)
+        and all(validate_field(datum.get(field_name))
+                for field_name, validate_field in validate_fields))
+  else:
+    raise AvroTypeException('Unknown Avro schema type: %r' % schema_type)
+
+
+def SelectUnionBranch(union_schema, datum):
+  """Selects the branch of a union to write a datum with.
+
+  The datum is written with the first branch, in the order reported by
+  UnionSchema.BranchesForType(), that it is valid for. Branches whose
+  Python representation does not match the type of the datum are never
+  considered.
+
+  Args:
+    union_schema: Union schema to select a branch from.
+    datum: Datum to write.
+  Returns:
+    The index of the selected branch, or -1 if no branch matches the datum.
+  """
+  for index in union_schema.BranchesForType(type(datum)):
+    if Validate(union_schema.schemas[index], datum):
+      return index
+  return -1
+
+
 # ------------------------------------------------------------------------------
 # Decoder/Encoder
 
@@ -204,17 +326,23 @@ class BinaryDecoder(object):
     datum = (n >> 1) ^ -(n & 1)
     return datum
 
+  def read_longs(self, count):
+    """Reads a number of consecutive int or long values.
+
+    Args:
+      count: Number of values to read.
+    Returns:
+      The list of the values read.
+    """
+    return [self.read_long() for _ in range(count)]
+
   def read_float(self):
     """
     A float is written as 4 bytes.
     The float is converted into a 32-bit integer using a method equivalent to
     Java's floatToIntBits and then encoded in little-endian format.
     """
-    bits = (((ord(self.read(1)) & 0xff)) |
-      ((ord(self.read(1)) & 0xff) <<  8) |
-      ((ord(self.read(1)) & 0xff) << 16) |
-      ((ord(self.read(1)) & 0xff) << 24))
-    return STRUCT_FLOAT.unpack(STRUCT_INT.pack(bits))[0]
+    return STRUCT_FLOAT_LE.unpack(self.read(4))[0]
 
   def read_double(self):
     """
@@ -222,15 +350,7 @@ class BinaryDecoder(object):
     The double is converted into a 64-bit integer using a method equivalent to
     Java's doubleToLongBits and then encoded in little-endian format.
     """
-    bits = (((ord(self.read(1)) & 0xff)) |
-      ((ord(self.read(1)) & 0xff) <<  8) |
-      ((ord(self.read(1)) & 0xff) << 16) |
-      ((ord(self.read(1)) & 0xff) << 24) |
-      ((ord(self.read(1)) & 0xff) << 32) |
-      ((ord(self.read(1)) & 0xff) << 40) |
-      ((ord(self.read(1)) & 0xff) << 48) |
-      ((ord(self.read(1)) & 0xff) << 56))
-    return STRUCT_DOUBLE.unpack(STRUCT_LONG.pack(bits))[0]
+    return STRUCT_DOUBLE_LE.unpack(self.read(8))[0]
 
   def read_bytes(self):
     """
@@ -284,7 +404,198 @@ class BinaryDecoder(object):
     self.skip_bytes()
 
   def skip(self, n):
-    self.reader.seek(self.reader.tell() + n)
+    self.reader.seek(n, 1)
+
+
+# ------------------------------------------------------------------------------
+
+
+class BufferDecoder(object):
+  """Read leaf values from an in-memory buffer.
+
+  Same interface as BinaryDecoder, but decodes directly from a bytes-like
+  object (bytes, bytearray or memoryview) using an integer cursor instead of
+  issuing read() calls on a file object.
+  """
+  def __init__(self, buffer, offset=0):
+    """
+    buffer is a bytes-like object holding the encoded data;
+    offset is the position to start decoding from.
+    """
+    self._buffer = buffer
+    self._view = memoryview(buffer)
+    self._pos = offset
+
+  @property
+  def buffer(self):
+    """Reports the buffer this decoder reads from."""
+    return self._buffer
+
+  @property
+  def remaining(self):
+    """Reports the number of bytes left to decode in the buffer."""
+    return len(self._view) - self._pos
+
+  def tell(self):
+    """Reports the current position of the cursor in the buffer."""
+    return self._pos
+
+  def read(self, n):
+    """Read n bytes.
+
+    Args:
+      n: Number of bytes to read.
+    Returns:
+      The next n bytes from the input.
+    """
+    assert (n >= 0), n
+    pos = self._pos
+    end = pos + n
+    assert (end <= len(self._view)), (n, self.remaining)
+    self._pos = end
+    return self._view[pos:end].tobytes()
+
+  def read_null(self):
+    """
+    null is written as zero bytes
+    """
+    return None
+
+  def read_boolean(self):
+    """
+    a boolean is written as a single byte
+    whose value is either 0 (false) or 1 (true).
+    """
+    pos = self._pos
+    self._pos = pos + 1
+    return self._view[pos] == 1
+
+  def read_int(self):
+    """
+    int and long values are written using variable-length, zig-zag coding.
+    """
+    return self.read_long()
+
+  def read_long(self):
+    """
+    int and long values are written using variable-length, zig-zag coding.
+    """
+    view = self._view
+    pos = self._pos
+    b = view[pos]
+    pos += 1
+    n = b & 0x7F
+    shift = 7
+    while (b & 0x80) != 0:
+      b = view[pos]
+      pos += 1
+      n |= (b & 0x7F) << shift
+      shift += 7
+    self._pos = pos
+    return (n >> 1) ^ -(n & 1)
+
+  def read_longs(self, count):
+    """Reads a number of consecutive int or long values.
+
+    Args:
+      count: Number of values to read.
+    Returns:
+      The list of the values read.
+    """
+    view = self._view
+    pos = self._pos
+    values = []
+    append = values.append
+    for _ in range(count):
+      b = view[pos]
+      pos += 1
+      n = b & 0x7F
+      shift = 7
+      while (b & 0x80) != 0:
+        b = view[pos]
+        pos += 1
+        n |= (b & 0x7F) << shift
+        shift += 7
+      append((n >> 1) ^ -(n & 1))
+    self._pos = pos
+    return values
+
+  def read_float(self):
+    """
+    A float is written as 4 bytes, in little-endian format.
+    """
+    pos = self._pos
+    self._pos = pos + 4
+    return STRUCT_FLOAT_LE.unpack_from(self._view, pos)[0]
+
+  def read_double(self):
+    """
+    A double is written as 8 bytes, in little-endian format.
+    """
+    pos = self._pos
+    self._pos = pos + 8
+    return STRUCT_DOUBLE_LE.unpack_from(self._view, pos)[0]
+
+  def read_bytes(self):
+    """
+    Bytes are encoded as a long followed by that many bytes of data.
+    """
+    nbytes = self.read_long()
+    assert (nbytes >= 0), nbytes
+    return self.read(nbytes)
+
+  def read_utf8(self):
+    """
+    A string is encoded as a long followed by
+    that many bytes of UTF-8 encoded character data.
+    """
+    nbytes = self.read_long()
+    assert (nbytes >= 0), nbytes
+    pos = self._pos
+    end = pos + nbytes
+    assert (end <= len(self._view)), (nbytes, self.remaining)
+    self._pos = end
+    try:
+      return str(self._view[pos:end], 'utf-8')
+    except UnicodeDecodeError as exn:
+      logging.error('Invalid UTF-8 input bytes: %r', self._view[pos:end].tobytes())
+      raise exn
+
+  def check_crc32(self, bytes):
+    checksum = STRUCT_CRC32.unpack(self.read(4))[0];
+    if binascii.crc32(bytes) & 0xffffffff != checksum:
+      raise schema.AvroException("Checksum failure")
+
+  def skip_null(self):
+    pass
+
+  def skip_boolean(self):
+    self._pos += 1
+
+  def skip_int(self):
+    self.skip_long()
+
+  def skip_long(self):
+    view = self._view
+    pos = self._pos
+    while (view[pos] & 0x80) != 0:
+      pos += 1
+    self._pos = pos + 1
+
+  def skip_float(self):
+    self._pos += 4
+
+  def skip_double(self):
+    self._pos += 8
+
+  def skip_bytes(self):
+    self.skip(self.read_long())
+
+  def skip_utf8(self):
+    self.skip_bytes()
+
+  def skip(self, n):
+    self._pos += n
 
 
 # ------------------------------------------------------------------------------
@@ -341,11 +652,7 @@ class BinaryEncoder(object):
     """
     int and long values are written using variable-length, zig-zag coding.
     """
-    datum = (datum << 1) ^ (datum >> 63)
-    while (datum & ~0x7F) != 0:
-      self.WriteByte((datum & 0x7f) | 0x80)
-      datum >>= 7
-    self.WriteByte(datum)
+    self.writer.write(_EncodeLong(datum))
 
   def write_float(self, datum):
     """
@@ -353,11 +660,7 @@ class BinaryEncoder(object):
     The float is converted into a 32-bit integer using a method equivalent to
     Java's floatToIntBits and then encoded in little-endian format.
     """
-    bits = STRUCT_INT.unpack(STRUCT_FLOAT.pack(datum))[0]
-    self.WriteByte((bits) & 0xFF)
-    self.WriteByte((bits >> 8) & 0xFF)
-    self.WriteByte((bits >> 16) & 0xFF)
-    self.WriteByte((bits >> 24) & 0xFF)
+    self.writer.write(STRUCT_FLOAT_LE.pack(datum))
 
   def write_double(self, datum):
     """
@@ -365,15 +668,7 @@ class BinaryEncoder(object):
     The double is converted into a 64-bit integer using a method equivalent to
     Java's doubleToLongBits and then encoded in little-endian format.
     """
-    bits = STRUCT_LONG.unpack(STRUCT_DOUBLE.pack(datum))[0]
-    self.WriteByte((bits) & 0xFF)
-    self.WriteByte((bits >> 8) & 0xFF)
-    self.WriteByte((bits >> 16) & 0xFF)
-    self.WriteByte((bits >> 24) & 0xFF)
-    self.WriteByte((bits >> 32) & 0xFF)
-    self.WriteByte((bits >> 40) & 0xFF)
-    self.WriteByte((bits >> 48) & 0xFF)
-    self.WriteByte((bits >> 56) & 0xFF)
+    self.writer.write(STRUCT_DOUBLE_LE.pack(datum))
 
   def write_bytes(self, datum):
     """
@@ -397,6 +692,152 @@ class BinaryEncoder(object):
     self.write(STRUCT_CRC32.pack(binascii.crc32(bytes) & 0xffffffff));
 
 
+def _EncodeLong(datum):
+  """Encodes an int or a long as a zig-zag varint.
+
+  Args:
+    datum: Integer to encode.
+  Returns:
+    The encoded varint, as a bytearray.
+  """
+  datum = (datum << 1) ^ (datum >> 63)
+  encoded = bytearray()
+  while (datum & ~0x7F) != 0:
+    encoded.append((datum & 0x7f) | 0x80)
+    datum >>= 7
+  encoded.append(datum)
+  return encoded
+
+
+# ------------------------------------------------------------------------------
+
+
+class BufferEncoder(object):
+  """Write leaf values into an in-memory buffer.
+
+  Same interface as BinaryEncoder, but appends into a growable bytearray
+  instead of issuing write() calls on a file object.
+  The encoded data may be handed off without copy through getbuffer().
+  """
+
+  def __init__(self):
+    self._buffer = bytearray()
+
+  @property
+  def buffer(self):
+    """Reports the bytearray this encoder appends into."""
+    return self._buffer
+
+  def __len__(self):
+    return len(self._buffer)
+
+  def tell(self):
+    """Reports the number of bytes written so far."""
+    return len(self._buffer)
+
+  def getbuffer(self):
+    """Returns: a read-only memoryview of the encoded bytes, without copy.
+
+    The buffer cannot be truncated while the view is alive: release it
+    (or use it as a context manager) before calling truncate().
+    """
+    return memoryview(self._buffer).toreadonly()
+
+  def getvalue(self):
+    """Returns: a copy of the encoded bytes, as bytes."""
+    return bytes(self._buffer)
+
+  def truncate(self, size=0):
+    """Discards everything written after the first size bytes."""
+    del self._buffer[size:]
+
+  def write(self, datum):
+    """Write a sequence of bytes.
+
+    Args:
+      datum: Byte array, as a Python bytes.
+    """
+    assert isinstance(datum, bytes), ('Expecting bytes, got %r' % datum)
+    self._buffer += datum
+
+  def WriteByte(self, byte):
+    self._buffer.append(byte)
+
+  def write_null(self, datum):
+    """
+    null is written as zero bytes
+    """
+    pass
+
+  def write_boolean(self, datum):
+    """
+    a boolean is written as a single byte
+    whose value is either 0 (false) or 1 (true).
+    """
+    self._buffer.append(1 if datum else 0)
+
+  def write_int(self, datum):
+    """
+    int and long values are written using variable-length, zig-zag coding.
+    """
+    self.write_long(datum)
+
+  def write_long(self, datum):
+    """
+    int and long values are written using variable-length, zig-zag coding.
+    """
+    datum = (datum << 1) ^ (datum >> 63)
+    buffer = self._buffer
+    while (datum & ~0x7F) != 0:
+      buffer.append((datum & 0x7f) | 0x80)
+      datum >>= 7
+    buffer.append(datum)
+
+  def write_float(self, datum):
+    """
+    A float is written as 4 bytes, in little-endian format.
+    """
+    buffer = self._buffer
+    pos = len(buffer)
+    buffer += _FLOAT_PADDING
+    STRUCT_FLOAT_LE.pack_into(buffer, pos, datum)
+
+  def write_double(self, datum):
+    """
+    A double is written as 8 bytes, in little-endian format.
+    """
+    buffer = self._buffer
+    pos = len(buffer)
+    buffer += _DOUBLE_PADDING
+    STRUCT_DOUBLE_LE.pack_into(buffer, pos, datum)
+
+  def write_bytes(self, datum):
+    """
+    Bytes are encoded as a long followed by that many bytes of data.
+    """
+    self.write_long(len(datum))
+    self._buffer += datum
+
+  def write_utf8(self, datum):
+    """
+    A string is encoded as a long followed by
+    that many bytes of UTF-8 encoded character data.
+    """
+    datum = datum.encode("utf-8")
+    self.write_long(len(datum))
+    self._buffer += datum
+
+  def write_crc32(self, bytes):
+    """
+    A 4-byte, big-endian CRC32 checksum
+    """
+    self._buffer += STRUCT_CRC32.pack(binascii.crc32(bytes) & 0xffffffff)
+
+
+_FLOAT_PADDING = bytes(STRUCT_FLOAT_LE.size)
+_DOUBLE_PADDING = bytes(STRUCT_DOUBLE_LE.size)
+
+
 # ------------------------------------------------------------------------------
 # DatumReader/Writer
 
@@ -455,29 +896,179 @@ class DatumReader(object):
       return True
     return False
 
-  def __init__(self, writer_schema=None, reader_schema=None):
+  @staticmethod
+  def match_union_branch(writer_schema, reader_schema):
+    """Selects the branch of a reader's union to resolve a writer's schema with.
+
+    A branch of the same type as the writer's schema is preferred, so that
+    values are not promoted needlessly (eg. a long to a double); otherwise,
+    the first branch that matches the writer's schema is selected.
+
+    Args:
+      writer_schema: Writer's schema, not a union.
+      reader_schema: Reader's union schema.
+    Returns:
+      The selected branch of the reader's union, or None if none matches.
+    """
+    matches = [
+        branch for branch in reader_schema.schemas
+        if DatumReader.match_schemas(writer_schema, branch)]
+    for branch in matches:
+      if branch.type == writer_schema.type:
+        return branch
+    return matches[0] if matches else None
+
+  def __init__(self, writer_schema=None, reader_schema=None, projection=None,
+               numeric_arrays=None):
     """
     As defined in the Avro specification, we call the schema encoded
     in the data the "writer's schema", and the schema expected by the
     reader the "reader's schema".
-    """
+
+    Instead of a reader's schema, a projection may be given as a list of
+    field paths, eg. ['user.id', 'ts']: the reader's schema is then derived
+    from each writer's schema with avro.schema.Project(), and the fields left
+    out are skipped without being decoded.
+
+    Arrays are decoded as lists, unless numeric_arrays is 'array' or 'numpy':
+    arrays of int, long, float or double are then decoded in bulk, into
+    array.array or NumPy arrays of the type of the reader's items.
+    """
+    if numeric_arrays not in NUMERIC_ARRAYS:
+      raise schema.AvroException(
+          'Invalid numeric_arrays: %r, expecting one of %r.'
+          % (numeric_arrays, NUMERIC_ARRAYS))
+    if numeric_arrays == 'numpy' and not has_numpy:
+      raise schema.AvroException('NumPy is not available.')
+    self._numeric_arrays = numeric_arrays
     self._writer_schema = writer_schema
     self._reader_schema = reader_schema
+    self._projection = None
+    if projection is not None:
+      self.projection = projection
+
+    # Compiled resolution plan for (writer_schema, reader_schema).
+    # Reset whenever either schema changes.
+    self._read_plan = None
+
+    # Compiled plan skipping over datums of writer_schema.
+    # Reset whenever the writer's schema changes.
+    self._skip_plan = None
+
+    # Subclasses that customize the decoding of some types decode through
+    # read_data() and skip_data(), which the compiled plans bypass:
+    self._read_hooks_overridden = _OverridesAny(
+        type(self), DatumReader, _READ_HOOKS)
+    self._skip_hooks_overridden = _OverridesAny(
+        type(self), DatumReader, _SKIP_HOOKS)
 
   # read/write properties
   def set_writer_schema(self, writer_schema):
     self._writer_schema = writer_schema
+    if self._projection is not None:
+      # Derive the reader's schema from the new writer's schema:
+      self._reader_schema = None
+    self._read_plan = None
+    self._skip_plan = None
   writer_schema = property(lambda self: self._writer_schema,
                             set_writer_schema)
   def set_reader_schema(self, reader_schema):
     self._reader_schema = reader_schema
+    self._read_plan = None
   reader_schema = property(lambda self: self._reader_schema,
                             set_reader_schema)
+  def set_projection(self, projection):
+    if projection is not None:
+      projection = tuple(projection)
+    self._projection = projection
+    self._reader_schema = None
+    self._read_plan = None
+  projection = property(lambda self: self._projection, set_projection)
+
+  @property
+  def numeric_arrays(self):
+    """Returns: how arrays of numbers are decoded: None, 'array' or 'numpy'."""
+    return self._numeric_arrays
+
+  @property
+  def uses_read_plan(self):
+    """Returns: whether read() decodes datums with the compiled read plan,
+        ie. whether the class of this reader overrides neither read() nor
+        the methods decoding or skipping values, eg. read_record().
+    """
+    return (type(self).read is DatumReader.read
+            and not self._read_hooks_overridden)
+
+  @property
+  def read_plan(self):
+    """Returns: the compiled plan used to decode datums.
+
+    The plan is a function decoder -> datum, compiled from the writer's and
+    the reader's schemas on first use and cached until either schema changes.
+    Plans are also shared by all the readers of the same class resolving
+    equal schemas, or applying the same projection to equal writer's schemas,
+    with the same numeric_arrays: see READ_PLAN_CACHE_SIZE.
+    """
+    if self._read_plan is None:
+      self.resolve()
+    return self._read_plan
+
+  def resolve(self):
+    """Resolves the writer's and the reader's schemas, ahead of the first read.
+
+    Compiles the read plan, or fetches it from the plans shared across
+    readers, and derives the reader's schema from the projection, if any.
+    Resolution errors are still reported when the data is read.
+    """
+    if self._read_plan is None:
+      if self.reader_schema is not None:
+        reader_key = str(self.reader_schema)
+      else:
+        reader_key = self.projection
+      key = (type(self), self.numeric_arrays, str(self.writer_schema),
+             reader_key)
+      with _READ_PLAN_CACHE_LOCK:
+        cached = _READ_PLAN_CACHE.get(key)
+        if cached is not None:
+          _READ_PLAN_CACHE.move_to_end(key)
+      if cached is None:
+        reader_schema = self.reader_schema
+        if reader_schema is None:
+          if self.projection is not None:
+            reader_schema = schema.Project(self.writer_schema, self.projection)
+          else:
+            reader_schema = self.writer_schema
+        cached = (reader_schema,
+                  self.compile_read(self.writer_schema, reader_schema))
+        with _READ_PLAN_CACHE_LOCK:
+          _READ_PLAN_CACHE[key] = cached
+          while len(_READ_PLAN_CACHE) > READ_PLAN_CACHE_SIZE:
+            _READ_PLAN_CACHE.popitem(last=False)
+      self._reader_schema, self._read_plan = cached
+
+  @property
+  def skip_plan(self):
+    """Returns: the compiled plan used to skip over datums.
+
+    The plan is a function decoder -> None, compiled from the writer's schema
+    on first use and cached until the writer's schema changes.
+    """
+    if self._skip_plan is None:
+      self._skip_plan = self.compile_skip(self.writer_schema)
+    return self._skip_plan
 
   def read(self, decoder):
-    if self.reader_schema is None:
-      self.reader_schema = self.writer_schema
-    return self.read_data(self.writer_schema, self.reader_schema, decoder)
+    if self._read_hooks_overridden:
+      self.resolve()
+      return self.read_data(self.writer_schema, self.reader_schema, decoder)
+    return self.read_plan(decoder)
+
+  def skip(self, decoder):
+    """Skips over the next datum, without decoding it."""
+    if self._skip_hooks_overridden:
+      self.skip_data(self.writer_schema, decoder)
+      return
+    self.skip_plan(decoder)
 
   def read_data(self, writer_schema, reader_schema, decoder):
     # schema matching
@@ -488,12 +1079,18 @@ class DatumReader(object):
     # schema resolution: reader's schema is a union, writer's schema is not
     if (writer_schema.type not in ['union', 'error_union']
         and reader_schema.type in ['union', 'error_union']):
-      for s in reader_schema.schemas:
-        if DatumReader.match_schemas(writer_schema, s):
-          return self.read_data(writer_schema, s, decoder)
+      s = DatumReader.match_union_branch(writer_schema, reader_schema)
+      if s is not None:
+        return self.read_data(writer_schema, s, decoder)
       fail_msg = 'Schemas do not match.'
       raise SchemaResolutionException(fail_msg, writer_schema, reader_schema)
 
+    # schema promotion of an int or a long to a float or a double,
+    # as in the read plans
+    if (writer_schema.type in ['int', 'long']
+        and reader_schema.type in ['float', 'double']):
+      return float(decoder.read_long())
+
     # function dispatch for reading data based on type of writer's schema
     if writer_schema.type == 'null':
       return decoder.read_null()
@@ -584,7 +1181,7 @@ class DatumReader(object):
     read_symbol = writer_schema.symbols[index_of_symbol]
 
     # schema resolution
-    if read_symbol not in reader_schema.symbols:
+    if read_symbol not in reader_schema.symbol_set:
       fail_msg = "Symbol %s not present in Reader's Schema" % read_symbol
       raise SchemaResolutionException(fail_msg, writer_schema, reader_schema)
 
@@ -749,65 +1346,771 @@ class DatumReader(object):
     """
     Basically a JSON Decoder?
     """
-    if field_schema.type == 'null':
-      return None
-    elif field_schema.type == 'boolean':
-      return bool(default_value)
-    elif field_schema.type == 'int':
-      return int(default_value)
-    elif field_schema.type == 'long':
-      return int(default_value)
-    elif field_schema.type in ['float', 'double']:
-      return float(default_value)
-    elif field_schema.type in ['enum', 'fixed', 'string', 'bytes']:
-      return default_value
-    elif field_schema.type == 'array':
-      read_array = []
-      for json_val in default_value:
-        item_val = self._read_default_value(field_schema.items, json_val)
-        read_array.append(item_val)
-      return read_array
-    elif field_schema.type == 'map':
-      read_map = {}
-      for key, json_val in default_value.items():
-        map_val = self._read_default_value(field_schema.values, json_val)
-        read_map[key] = map_val
-      return read_map
-    elif field_schema.type in ['union', 'error_union']:
-      return self._read_default_value(field_schema.schemas[0], default_value)
-    elif field_schema.type == 'record':
+    return _ReadDefaultValue(field_schema, default_value)
+
+  # ----------------------------------------------------------------------------
+  # Resolution plans
+
+  def compile_read(self, writer_schema, reader_schema):
+    """Compiles a (writer's schema, reader's schema) pair into a read plan.
+
+    Schema matching, promotions, union branch mapping, skipped fields and
+    default values are resolved once, ahead of time, into a tree of
+    specialized decode functions. Resolution errors are deferred until the
+    offending part of the plan is actually run, as read_data() would.
+
+    Args:
+      writer_schema: Schema the data was written with.
+      reader_schema: Schema the data is read with.
+    Returns:
+      A function decoder -> datum.
+    """
+    return self._CompileRead(writer_schema, reader_schema, memo={})
+
+  def _CompileRead(self, writer_schema, reader_schema, memo):
+    key = (id(writer_schema), id(reader_schema))
+    plan = memo.get(key)
+    if plan is None:
+      if writer_schema.type in ['record', 'error', 'request']:
+        # Records may be recursive: register a forwarding plan first.
+        resolved = []
+        memo[key] = lambda decoder: resolved[0](decoder)
+        plan = self._CompileReadData(writer_schema, reader_schema, memo)
+        resolved.append(plan)
+      else:
+        plan = self._CompileReadData(writer_schema, reader_schema, memo)
+      memo[key] = plan
+    return plan
+
+  def _CompileReadData(self, writer_schema, reader_schema, memo):
+    # schema matching
+    if not DatumReader.match_schemas(writer_schema, reader_schema):
+      return _FailResolution(
+          'Schemas do not match.', writer_schema, reader_schema)
+
+    # schema resolution: reader's schema is a union, writer's schema is not
+    if (writer_schema.type not in ['union', 'error_union']
+        and reader_schema.type in ['union', 'error_union']):
+      s = DatumReader.match_union_branch(writer_schema, reader_schema)
+      if s is not None:
+        return self._CompileRead(writer_schema, s, memo)
+      return _FailResolution(
+          'Schemas do not match.', writer_schema, reader_schema)
+
+    # plan selection based on type of writer's schema
+    w_type = writer_schema.type
+    if w_type in ['int', 'long'] and reader_schema.type in ['float', 'double']:
+      return _ReadLongAsFloat
+    elif w_type in _READ_PRIMITIVE:
+      return _READ_PRIMITIVE[w_type]
+    elif w_type == 'fixed':
+      return self._CompileReadFixed(writer_schema, reader_schema, memo)
+    elif w_type == 'enum':
+      return self._CompileReadEnum(writer_schema, reader_schema, memo)
+    elif w_type == 'array':
+      return self._CompileReadArray(writer_schema, reader_schema, memo)
+    elif w_type == 'map':
+      return self._CompileReadMap(writer_schema, reader_schema, memo)
+    elif w_type in ['union', 'error_union']:
+      return self._CompileReadUnion(writer_schema, reader_schema, memo)
+    elif w_type in ['record', 'error', 'request']:
+      return self._CompileReadRecord(writer_schema, reader_schema, memo)
+    else:
+      fail_msg = "Cannot read unknown schema type: %s" % writer_schema.type
+      raise schema.AvroException(fail_msg)
+
+  def _CompileReadFixed(self, writer_schema, reader_schema, memo):
+    size = writer_schema.size
+    def ReadFixed(decoder):
+      return decoder.read(size)
+    return ReadFixed
+
+  def _CompileReadEnum(self, writer_schema, reader_schema, memo):
+    # Map: writer's symbol index -> reader's symbol, or None if the reader's
+    # schema does not define the symbol.
+    reader_symbols = reader_schema.symbol_set
+    symbol_table = tuple(
+        symbol if symbol in reader_symbols else None
+        for symbol in writer_schema.symbols)
+    def ReadEnum(decoder):
+      index_of_symbol = decoder.read_int()
+      if not (0 <= index_of_symbol < len(symbol_table)):
+        fail_msg = "Can't access enum index %d for enum with %d symbols"\
+                   % (index_of_symbol, len(symbol_table))
+        raise SchemaResolutionException(fail_msg, writer_schema, reader_schema)
+      read_symbol = symbol_table[index_of_symbol]
+      if read_symbol is None:
+        fail_msg = "Symbol %s not present in Reader's Schema"\
+                   % writer_schema.symbols[index_of_symbol]
+        raise SchemaResolutionException(fail_msg, writer_schema, reader_schema)
+      return read_symbol
+    return ReadEnum
+
+  def _CompileReadArray(self, writer_schema, reader_schema, memo):
+    if self.numeric_arrays is not None:
+      plan = _CompileReadNumericArray(
+          writer_schema.items, reader_schema.items, self.numeric_arrays)
+      if plan is not None:
+        return plan
+    read_item = self._CompileRead(
+        writer_schema.items, reader_schema.items, memo)
+    def ReadArray(decoder):
+      read_items = []
+      append = read_items.append
+      block_count = decoder.read_long()
+      while block_count != 0:
+        if block_count < 0:
+          block_count = -block_count
+          decoder.skip_long()
+        for i in range(block_count):
+          append(read_item(decoder))
+        block_count = decoder.read_long()
+      return read_items
+    return ReadArray
+
+  def _CompileReadMap(self, writer_schema, reader_schema, memo):
+    read_value = self._CompileRead(
+        writer_schema.values, reader_schema.values, memo)
+    def ReadMap(decoder):
+      read_items = {}
+      block_count = decoder.read_long()
+      while block_count != 0:
+        if block_count < 0:
+          block_count = -block_count
+          decoder.skip_long()
+        for i in range(block_count):
+          key = decoder.read_utf8()
+          read_items[key] = read_value(decoder)
+        block_count = decoder.read_long()
+      return read_items
+    return ReadMap
+
+  def _CompileReadUnion(self, writer_schema, reader_schema, memo):
+    branches = tuple(
+        self._CompileRead(branch_schema, reader_schema, memo)
+        for branch_schema in writer_schema.schemas)
+    def ReadUnion(decoder):
+      index_of_schema = decoder.read_long()
+      if not (0 <= index_of_schema < len(branches)):
+        fail_msg = "Can't access branch index %d for union with %d branches"\
+                   % (index_of_schema, len(branches))
+        raise SchemaResolutionException(fail_msg, writer_schema, reader_schema)
+      return branches[index_of_schema](decoder)
+    return ReadUnion
+
+  def _CompileReadRecord(self, writer_schema, reader_schema, memo):
+    readers_fields_dict = reader_schema.field_map
+    writers_fields_dict = writer_schema.field_map
+
+    # Fields present in the reader's record but not in the writer's:
+    for field_name, field in readers_fields_dict.items():
+      if field_name not in writers_fields_dict and not field.has_default:
+        return _FailResolution(
+            'No default value for field %s' % field_name,
+            writer_schema, reader_schema)
+    # Default values are decoded once, on first use, so that invalid default
+    # values fail when records are read, as other resolution errors do.
+    # Immutable values are shared by all records, mutable ones are copied
+    # into each record.
+    default_fields = tuple(
+        field for field_name, field in readers_fields_dict.items()
+        if field_name not in writers_fields_dict)
+    decoded_defaults = []
+    def DecodeDefaults():
+      shared_defaults = {}
+      copied_defaults = []
+      for field in default_fields:
+        default_value = _ReadDefaultValue(field.type, field.default)
+        copy_default = _GetCopyFunction(default_value)
+        if copy_default is None:
+          shared_defaults[field.name] = default_value
+        else:
+          copied_defaults.append((field.name, default_value, copy_default))
+      decoded_defaults.append((shared_defaults, tuple(copied_defaults)))
+      return decoded_defaults[0]
+
+    # Writer fields in order: (name, read function) for fields in the reader's
+    # record, (None, skip function) for each run of fields to ignore.
+    field_plans = []
+    skipped = []
+    for field in writer_schema.fields:
+      readers_field = readers_fields_dict.get(field.name)
+      if readers_field is not None:
+        if skipped:
+          field_plans.append((None, self._CompileSkipSequence(skipped, memo)))
+          skipped = []
+        field_plans.append((
+            field.name,
+            self._CompileRead(field.type, readers_field.type, memo)))
+      else:
+        skipped.append(field.type)
+    if skipped:
+      field_plans.append((None, self._CompileSkipSequence(skipped, memo)))
+    field_plans = tuple(field_plans)
+
+    def ReadRecord(decoder):
       read_record = {}
-      for field in field_schema.fields:
-        json_val = default_value.get(field.name)
-        if json_val is None: json_val = field.default
-        field_val = self._read_default_value(field.type, json_val)
-        read_record[field.name] = field_val
+      for field_name, read_field in field_plans:
+        if field_name is None:
+          read_field(decoder)
+        else:
+          read_record[field_name] = read_field(decoder)
+      if default_fields:
+        if decoded_defaults:
+          shared_defaults, copied_defaults = decoded_defaults[0]
+        else:
+          shared_defaults, copied_defaults = DecodeDefaults()
+        read_record.update(shared_defaults)
+        for field_name, default_value, copy_default in copied_defaults:
+          read_record[field_name] = copy_default(default_value)
       return read_record
+    return ReadRecord
+
+  def compile_skip(self, writer_schema):
+    """Compiles a writer's schema into a skip plan.
+
+    Args:
+      writer_schema: Schema the data was written with.
+    Returns:
+      A function decoder -> None, skipping over a datum without decoding it.
+    """
+    return self._CompileSkip(writer_schema, memo={})
+
+  def _CompileSkip(self, writer_schema, memo):
+    key = (id(writer_schema), None)
+    plan = memo.get(key)
+    if plan is None:
+      if writer_schema.type in ['record', 'error', 'request']:
+        resolved = []
+        memo[key] = lambda decoder: resolved[0](decoder)
+        plan = self._CompileSkipData(writer_schema, memo)
+        resolved.append(plan)
+      else:
+        plan = self._CompileSkipData(writer_schema, memo)
+      memo[key] = plan
+    return plan
+
+  def _CompileSkipData(self, writer_schema, memo):
+    w_type = writer_schema.type
+    size = _GetFixedSize(writer_schema)
+    if size is not None and w_type != 'null':
+      def SkipFixedSize(decoder):
+        decoder.skip(size)
+      return SkipFixedSize
+    elif w_type in _SKIP_PRIMITIVE:
+      return _SKIP_PRIMITIVE[w_type]
+    elif w_type == 'enum':
+      return _SKIP_PRIMITIVE['int']
+    elif w_type in ['array', 'map']:
+      if w_type == 'array':
+        skip_item = self._CompileSkip(writer_schema.items, memo)
+        item_size = _GetFixedSize(writer_schema.items)
+      else:
+        skip_value = self._CompileSkip(writer_schema.values, memo)
+        def skip_item(decoder):
+          decoder.skip_utf8()
+          skip_value(decoder)
+        item_size = None
+      def SkipBlocks(decoder):
+        block_count = decoder.read_long()
+        while block_count != 0:
+          if block_count < 0:
+            # Blocks with a byte size are skipped in one jump:
+            decoder.skip(decoder.read_long())
+          elif item_size is not None:
+            decoder.skip(block_count * item_size)
+          else:
+            for i in range(block_count):
+              skip_item(decoder)
+          block_count = decoder.read_long()
+      return SkipBlocks
+    elif w_type in ['union', 'error_union']:
+      branches = tuple(
+          self._CompileSkip(branch_schema, memo)
+          for branch_schema in writer_schema.schemas)
+      def SkipUnion(decoder):
+        index_of_schema = decoder.read_long()
+        if not (0 <= index_of_schema < len(branches)):
+          fail_msg = "Can't access branch index %d for union with %d branches"\
+                     % (index_of_schema, len(branches))
+          raise SchemaResolutionException(fail_msg, writer_schema)
+        branches[index_of_schema](decoder)
+      return SkipUnion
+    elif w_type in ['record', 'error', 'request']:
+      return self._CompileSkipSequence(
+          [field.type for field in writer_schema.fields], memo)
     else:
-      fail_msg = 'Unknown type: %s' % field_schema.type
+      fail_msg = "Unknown schema type: %s" % writer_schema.type
       raise schema.AvroException(fail_msg)
 
+  def _CompileSkipSequence(self, writer_schemas, memo):
+    """Compiles a plan skipping consecutive values, eg. fields of a record.
+
+    Runs of fixed-size values (null, boolean, float, double, fixed, and
+    records of those) are skipped in a single jump.
+    """
+    skips = []
+    run_size = 0
+    for writer_schema in writer_schemas:
+      size = _GetFixedSize(writer_schema)
+      if size is not None:
+        run_size += size
+      else:
+        if run_size > 0:
+          skips.append(_SkipBytes(run_size))
+          run_size = 0
+        skips.append(self._CompileSkip(writer_schema, memo))
+    if run_size > 0:
+      skips.append(_SkipBytes(run_size))
+
+    if len(skips) == 0:
+      return _SKIP_PRIMITIVE['null']
+    elif len(skips) == 1:
+      return skips[0]
+    skips = tuple(skips)
+    def SkipSequence(decoder):
+      for skip in skips:
+        skip(decoder)
+    return SkipSequence
+
+
+# Methods of DatumReader that subclasses may override to customize the
+# decoding of values, see DatumReader.read():
+_SKIP_HOOKS = (
+  'skip_data', 'skip_fixed', 'skip_enum', 'skip_array', 'skip_map',
+  'skip_union', 'skip_record',
+)
+_READ_HOOKS = (
+  'read_data', 'read_fixed', 'read_enum', 'read_array', 'read_map',
+  'read_union', 'read_record', '_read_default_value',
+) + _SKIP_HOOKS
+
+
+def _OverridesAny(cls, base, method_names):
+  """Reports whether a class overrides some of the methods of a base class.
+
+  Args:
+    cls: Class to check, base or a subclass of base.
+    base: Base class defining the methods.
+    method_names: Names of the methods to check.
+  Returns:
+    True if cls defines any of the methods differently than base.
+  """
+  return any(getattr(cls, name) is not base.__dict__[name]
+             for name in method_names)
+
+
+# Maximum number of compiled read plans shared across DatumReader instances:
+READ_PLAN_CACHE_SIZE = 256
+
+# Ways of decoding arrays of numbers, see DatumReader: as lists (None),
+# as array.array ('array') or as NumPy arrays ('numpy').
+NUMERIC_ARRAYS = (None, 'array', 'numpy')
+
+# Compiled read plans shared across DatumReader instances, as
+# (reader's schema, plan), keyed by (DatumReader class, numeric_arrays, JSON
+# of the writer's schema, JSON of the reader's schema or projection), least
+# recently used first. Plans do not refer to the reader that compiled them:
+_READ_PLAN_CACHE = collections.OrderedDict()
+_READ_PLAN_CACHE_LOCK = threading.Lock()
+
+# Plans for primitive types, indexed by type of the writer's schema:
+_READ_PRIMITIVE = {
+  'null': operator.methodcaller('read_null'),
+  'boolean': operator.methodcaller('read_boolean'),
+  'string': operator.methodcaller('read_utf8'),
+  'int': operator.methodcaller('read_int'),
+  'long': operator.methodcaller('read_long'),
+  'float': operator.methodcaller('read_float'),
+  'double': operator.methodcaller('read_double'),
+  'bytes': operator.methodcaller('read_bytes'),
+}
+
+_SKIP_PRIMITIVE = {
+  'null': operator.methodcaller('skip_null'),
+  'boolean': operator.methodcaller('skip_boolean'),
+  'string': operator.methodcaller('skip_utf8'),
+  'int': operator.methodcaller('skip_int'),
+  'long': operator.methodcaller('skip_long'),
+  'float': operator.methodcaller('skip_float'),
+  'double': operator.methodcaller('skip_double'),
+  'bytes': operator.methodcaller('skip_bytes'),
+}
+
+
+# Types of the immutable values of the generic data representation:
+_IMMUTABLE_TYPES = (type(None), bool, int, float, str, bytes)
+
+
+def _GetCopyFunction(value):
+  """Reports how to copy a value decoded with the generic representation.
+
+  Args:
+    value: Value to copy, eg. a decoded default value.
+  Returns:
+    None if the value is immutable and may be shared,
+    a shallow copy function for lists and maps of immutable values,
+    or copy.deepcopy for nested lists, maps and records.
+  """
+  if isinstance(value, _IMMUTABLE_TYPES):
+    return None
+  elif isinstance(value, list):
+    if all(isinstance(item, _IMMUTABLE_TYPES) for item in value):
+      return list
+  elif isinstance(value, dict):
+    if all(isinstance(item, _IMMUTABLE_TYPES) for item in value.values()):
+      return dict
+  return copy.deepcopy
+
+
+def _ReadDefaultValue(field_schema, default_value):
+  """Decodes the JSON default value of a field.
+
+  Args:
+    field_schema: Schema of the field.
+    default_value: Default value of the field, as decoded from JSON.
+  Returns:
+    The default value, in the generic representation of the field's schema.
+  """
+  if field_schema.type == 'null':
+    return None
+  elif field_schema.type == 'boolean':
+    return bool(default_value)
+  elif field_schema.type == 'int':
+    return int(default_value)
+  elif field_schema.type == 'long':
+    return int(default_value)
+  elif field_schema.type in ['float', 'double']:
+    return float(default_value)
+  elif field_schema.type in ['enum', 'fixed', 'string', 'bytes']:
+    return default_value
+  elif field_schema.type == 'array':
+    read_array = []
+    for json_val in default_value:
+      item_val = _ReadDefaultValue(field_schema.items, json_val)
+      read_array.append(item_val)
+    return read_array
+  elif field_schema.type == 'map':
+    read_map = {}
+    for key, json_val in default_value.items():
+      map_val = _ReadDefaultValue(field_schema.values, json_val)
+      read_map[key] = map_val
+    return read_map
+  elif field_schema.type in ['union', 'error_union']:
+    return _ReadDefaultValue(field_schema.schemas[0], default_value)
+  elif field_schema.type == 'record':
+    read_record = {}
+    for field in field_schema.fields:
+      json_val = default_value.get(field.name)
+      if json_val is None: json_val = field.default
+      field_val = _ReadDefaultValue(field.type, json_val)
+      read_record[field.name] = field_val
+    return read_record
+  else:
+    fail_msg = 'Unknown type: %s' % field_schema.type
+    raise schema.AvroException(fail_msg)
+
+
+def _GetFixedSize(writer_schema, enclosing=()):
+  """Reports the size of the encoding of a schema, if it is fixed.
+
+  Args:
+    writer_schema: Schema to report the encoding size of.
+    enclosing: Records enclosing writer_schema, to detect recursion.
+  Returns:
+    The number of bytes any value of the schema is encoded with,
+    or None if the size depends on the value.
+  """
+  w_type = writer_schema.type
+  if w_type in _FIXED_SIZES:
+    return _FIXED_SIZES[w_type]
+  elif w_type == 'fixed':
+    return writer_schema.size
+  elif w_type in ['record', 'error', 'request']:
+    if any(writer_schema is record for record in enclosing):
+      return None
+    enclosing += (writer_schema,)
+    size = 0
+    for field in writer_schema.fields:
+      field_size = _GetFixedSize(field.type, enclosing)
+      if field_size is None:
+        return None
+      size += field_size
+    return size
+  return None
+
+
+# Encoding sizes of the fixed-size primitive types:
+_FIXED_SIZES = {
+  'null': 0,
+  'boolean': 1,
+  'float': 4,
+  'double': 8,
+}
+
+
+def _SkipBytes(size):
+  """Builds a plan skipping a fixed number of bytes."""
+  def SkipBytes(decoder):
+    decoder.skip(size)
+  return SkipBytes
+
+
+def _ReadLongAsFloat(decoder):
+  """Promotes an int or a long to a float or a double."""
+  return float(decoder.read_long())
+
+
+def _FailResolution(fail_msg, writer_schema, reader_schema):
+  """Builds a plan that fails with a schema resolution error when run."""
+  def Fail(decoder):
+    raise SchemaResolutionException(fail_msg, writer_schema, reader_schema)
+  return Fail
+
+
+# Types of the items of the arrays that may be decoded in bulk:
+_NUMERIC_ITEM_TYPES = frozenset(['int', 'long', 'float', 'double'])
+
+
+def _CompileReadNumericArray(writer_items, reader_items, numeric_arrays):
+  """Compiles the bulk decoding of an array of numbers.
+
+  Each block of the array is decoded at once: floats and doubles are copied
+  from the encoded bytes, ints and longs are decoded in a single loop, or
+  vectorized with NumPy when decoding from a BufferDecoder.
+
+  Args:
+    writer_items: Schema of the items, in the writer's schema.
+    reader_items: Schema of the items, in the reader's schema.
+    numeric_arrays: Type of the decoded arrays, 'array' or 'numpy'.
+  Returns:
+    A plan decoding the array into an array.array or a NumPy array of the
+    type of the items, or None if the items are not numbers.
+  """
+  item_type = writer_items.type
+  if (item_type not in _NUMERIC_ITEM_TYPES
+      or reader_items.type != item_type):
+    return None
+  item_size = _FIXED_SIZES.get(item_type)
+  typecode = _COLUMN_TYPECODES[item_type]
+
+  if numeric_arrays == 'numpy':
+    dtype = numpy.dtype(_COLUMN_DTYPES[typecode])
+    encoded_dtype = dtype.newbyteorder('<')
+    def ReadBlock(decoder, count, size):
+      if isinstance(decoder, BufferDecoder):
+        offset = decoder.tell()
+        if item_size is None:
+          values, end = _DecodeVarints(decoder.buffer, offset, count, size)
+        else:
+          end = offset + count * item_size
+          values = numpy.frombuffer(
+              decoder.buffer, dtype=encoded_dtype, count=count, offset=offset)
+        decoder.skip(end - offset)
+      elif item_size is None:
+        values = numpy.array(decoder.read_longs(count), dtype=numpy.int64)
+      else:
+        values = numpy.frombuffer(
+            decoder.read(count * item_size), dtype=encoded_dtype)
+      # Copies into a native, writable array:
+      return values.astype(dtype)
+    def Empty():
+      return numpy.empty(0, dtype=dtype)
+  else:
+    byteswap = (sys.byteorder != 'little')
+    def ReadBlock(decoder, count, size):
+      if item_size is None:
+        return array.array(typecode, decoder.read_longs(count))
+      values = array.array(typecode)
+      values.frombytes(decoder.read(count * item_size))
+      if byteswap:
+        values.byteswap()
+      return values
+    def Empty():
+      return array.array(typecode)
+
+  def ReadNumericArray(decoder):
+    blocks = []
+    block_count = decoder.read_long()
+    while block_count != 0:
+      block_size = None
+      if block_count < 0:
+        block_count = -block_count
+        block_size = decoder.read_long()
+      blocks.append(ReadBlock(decoder, block_count, block_size))
+      block_count = decoder.read_long()
+    if not blocks:
+      return Empty()
+    elif len(blocks) == 1:
+      return blocks[0]
+    return _ConcatColumns(blocks)
+  return ReadNumericArray
+
+
+def _DecodeVarints(buffer, offset, count, size=None):
+  """Decodes consecutive zig-zag varints with NumPy.
+
+  Args:
+    buffer: Bytes-like object holding the encoded values.
+    offset: Position of the first value in the buffer.
+    count: Number of values to decode.
+    size: Size of the encoded values, in bytes, if known.
+  Returns:
+    The values, as an int64 NumPy array, and the position following the last
+    value in the buffer.
+  """
+  if count == 0:
+    return numpy.empty(0, dtype=numpy.int64), offset
+  if size is None:
+    # A long is encoded in at most 10 bytes:
+    size = count * 10
+  data = numpy.frombuffer(
+      memoryview(buffer).cast('B')[offset:offset + size], dtype=numpy.uint8)
+
+  # The last byte of each varint has its high bit clear:
+  ends = numpy.flatnonzero(data < 0x80)[:count]
+  if len(ends) < count:
+    raise schema.AvroException(
+        'Truncated array: expecting %d values, got %d.' % (count, len(ends)))
+  starts = numpy.empty(count, dtype=numpy.int64)
+  starts[0] = 0
+  starts[1:] = ends[:-1] + 1
+  lengths = ends - starts + 1
+
+  values = (data[starts] & 0x7F).astype(numpy.uint64)
+  for index in range(1, int(lengths.max())):
+    rows = numpy.flatnonzero(lengths > index)
+    values[rows] |= (
+        (data[starts[rows] + index] & 0x7F).astype(numpy.uint64)
+        << numpy.uint64(7 * index))
+  values = ((values >> numpy.uint64(1)).astype(numpy.int64)
+            ^ -(values & numpy.uint64(1)).astype(numpy.int64))
+  return values, offset + int(ends[-1]) + 1
+
 
 # ------------------------------------------------------------------------------
 
 
+# Methods of DatumWriter that subclasses may override to customize the
+# encoding of values, see DatumWriter.write():
+_WRITE_HOOKS = (
+  'write_data', 'write_fixed', 'write_enum', 'write_array', 'write_map',
+  'write_union', 'write_record',
+)
+
+
 class DatumWriter(object):
   """DatumWriter for generic python objects."""
-  def __init__(self, writer_schema=None):
+  def __init__(
+      self,
+      writer_schema=None,
+      validate_inline=False,
+      max_block_items=None,
+  ):
+    """Initializes a new datum writer.
+
+    Args:
+      writer_schema: Schema to encode datums with.
+      validate_inline: When set, datums are type-checked while they are
+          encoded rather than validated by a separate traversal beforehand.
+          Each datum is then walked once; an invalid datum raises an
+          AvroTypeException reporting the path to the offending value, and
+          leaves the output of the encoder untouched.
+      max_block_items: When set, arrays and maps are encoded as blocks of at
+          most this many items, each prefixed with a negative item count and
+          its size in bytes, so that readers may skip them without decoding
+          their items. By default, each non-empty array or map is encoded as
+          a single block without a byte size.
+    """
+    if max_block_items is not None and max_block_items <= 0:
+      raise schema.AvroException(
+          'Invalid maximum number of items per block: %r' % max_block_items)
     self._writer_schema = writer_schema
+    self._validate_inline = validate_inline
+    self._max_block_items = max_block_items
+
+    # Compiled validation and encoding plans for writer_schema.
+    # Reset whenever the schema changes.
+    self._validator = None
+    self._write_plan = None
+
+    # Subclasses that customize the encoding of some types encode through
+    # write_data(), which the compiled plans bypass:
+    self._write_hooks_overridden = _OverridesAny(
+        type(self), DatumWriter, _WRITE_HOOKS)
 
   # read/write properties
   def set_writer_schema(self, writer_schema):
     self._writer_schema = writer_schema
+    self._validator = None
+    self._write_plan = None
   writer_schema = property(lambda self: self._writer_schema,
                             set_writer_schema)
 
+  @property
+  def validate_inline(self):
+    """Returns: whether datums are type-checked while being encoded."""
+    return self._validate_inline
+
+  @property
+  def max_block_items(self):
+    """Returns: the maximum number of items per size-prefixed block,
+        or None if arrays and maps are encoded without block sizes.
+    """
+    return self._max_block_items
+
+  @property
+  def write_plan(self):
+    """Returns: the compiled plan used to encode datums.
+
+    The plan is a function (datum, encoder) -> None, compiled from the
+    writer's schema on first use and cached until the schema changes.
+    """
+    if self._write_plan is None:
+      self._write_plan = self.compile_write(
+          self.writer_schema, validate=self.validate_inline)
+    return self._write_plan
+
   def write(self, datum, encoder):
+    if self._write_hooks_overridden:
+      if not Validate(self.writer_schema, datum):
+        raise AvroTypeException(self.writer_schema, datum)
+      self.write_data(self.writer_schema, datum, encoder)
+      return
+
+    if self.validate_inline:
+      self._WriteValidating(datum, encoder)
+      return
+
     # validate datum
-    if not Validate(self.writer_schema, datum):
+    if self._validator is None:
+      self._validator = CompileValidator(self.writer_schema)
+    if not self._validator(datum):
       raise AvroTypeException(self.writer_schema, datum)
 
-    self.write_data(self.writer_schema, datum, encoder)
+    self.write_plan(datum, encoder)
+
+  def _WriteValidating(self, datum, encoder):
+    """Encodes a datum, checking value types as they are encoded.
+
+    Encodes in place when the encoder is a BufferEncoder, or into a scratch
+    buffer copied to the encoder once the whole datum has been encoded.
+    On error, the output of the encoder is left untouched.
+    """
+    if isinstance(encoder, BufferEncoder):
+      buffer_encoder = encoder
+    else:
+      buffer_encoder = BufferEncoder()
+    mark = buffer_encoder.tell()
+    try:
+      self.write_plan(datum, buffer_encoder)
+    except _DatumTypeMismatch as exn:
+      buffer_encoder.truncate(mark)
+      raise AvroTypeException(
+          exn.expected_schema, exn.datum,
+          path=''.join(reversed(exn.path)).lstrip('.'))
+    if buffer_encoder is not encoder:
+      encoder.write(buffer_encoder.getvalue())
 
   def write_data(self, writer_schema, datum, encoder):
     # function dispatch to write datum
@@ -855,7 +2158,7 @@ class DatumWriter(object):
     An enum is encoded by a int, representing the zero-based position
     of the symbol in the schema.
     """
-    index_of_datum = writer_schema.symbols.index(datum)
+    index_of_datum = writer_schema.symbol_index[datum]
     encoder.write_int(index_of_datum)
 
   def write_array(self, writer_schema, datum, encoder):
@@ -908,10 +2211,7 @@ class DatumWriter(object):
     The value is then encoded per the indicated schema within the union.
     """
     # resolve union
-    index_of_schema = -1
-    for i, candidate_schema in enumerate(writer_schema.schemas):
-      if Validate(candidate_schema, datum):
-        index_of_schema = i
+    index_of_schema = SelectUnionBranch(writer_schema, datum)
     if index_of_schema < 0: raise AvroTypeException(writer_schema, datum)
 
     # write data
@@ -928,6 +2228,878 @@ class DatumWriter(object):
     for field in writer_schema.fields:
       self.write_data(field.type, datum.get(field.name), encoder)
 
+  # ----------------------------------------------------------------------------
+  # Encoding plans
+
+  def compile_write(self, writer_schema, validate=False):
+    """Compiles a schema into an encoding plan.
+
+    Field order, union branch tests, enum symbol indexes and the encoder
+    method for each leaf are resolved once, ahead of time, into a tree of
+    specialized encode functions.
+
+    Args:
+      writer_schema: Schema to encode datums with.
+      validate: When set, the plan checks the type of every value it encodes
+          and raises _DatumTypeMismatch on the first invalid value.
+          Validating plans require an encoder that supports truncate(),
+          such as BufferEncoder, to undo partially encoded union branches.
+    Returns:
+      A function (datum, encoder) -> None.
+    """
+    return self._CompileWrite(writer_schema, validate, memo={})
+
+  def _CompileWrite(self, writer_schema, validate, memo):
+    key = id(writer_schema)
+    plan = memo.get(key)
+    if plan is None:
+      if writer_schema.type in ['record', 'error', 'request']:
+        # Records may be recursive: register a forwarding plan first.
+        resolved = []
+        memo[key] = lambda datum, encoder: resolved[0](datum, encoder)
+        plan = self._CompileWriteData(writer_schema, validate, memo)
+        resolved.append(plan)
+      else:
+        plan = self._CompileWriteData(writer_schema, validate, memo)
+      memo[key] = plan
+    return plan
+
+  def _CompileWriteData(self, writer_schema, validate, memo):
+    w_type = writer_schema.type
+    if w_type in _WRITE_PRIMITIVE or w_type == 'fixed':
+      if w_type == 'fixed':
+        write = _WriteFixed
+      else:
+        write = _WRITE_PRIMITIVE[w_type]
+      if not validate:
+        return write
+      is_valid = _CompileValidatorData(writer_schema, memo=None)
+      def WriteValidated(datum, encoder):
+        if not is_valid(datum):
+          raise _DatumTypeMismatch(writer_schema, datum)
+        write(datum, encoder)
+      return WriteValidated
+    elif w_type == 'enum':
+      return self._CompileWriteEnum(writer_schema, validate, memo)
+    elif w_type == 'array':
+      return self._CompileWriteArray(writer_schema, validate, memo)
+    elif w_type == 'map':
+      return self._CompileWriteMap(writer_schema, validate, memo)
+    elif w_type in ['union', 'error_union']:
+      return self._CompileWriteUnion(writer_schema, validate, memo)
+    elif w_type in ['record', 'error', 'request']:
+      return self._CompileWriteRecord(writer_schema, validate, memo)
+    else:
+      fail_msg = 'Unknown type: %s' % writer_schema.type
+      raise schema.AvroException(fail_msg)
+
+  def _CompileWriteEnum(self, writer_schema, validate, memo):
+    symbol_index = writer_schema.symbol_index
+    if not validate:
+      def WriteEnum(datum, encoder):
+        encoder.write_int(symbol_index[datum])
+    else:
+      def WriteEnum(datum, encoder):
+        index = symbol_index.get(datum) if isinstance(datum, str) else None
+        if index is None:
+          raise _DatumTypeMismatch(writer_schema, datum)
+        encoder.write_int(index)
+    return WriteEnum
+
+  def _CompileWriteArray(self, writer_schema, validate, memo):
+    write_item = self._CompileWrite(writer_schema.items, validate, memo)
+    max_block_items = self.max_block_items
+    if max_block_items is not None:
+      def WriteArray(datum, encoder):
+        if validate and not isinstance(datum, list):
+          raise _DatumTypeMismatch(writer_schema, datum)
+        index = 0
+        try:
+          for start in range(0, len(datum), max_block_items):
+            block = BufferEncoder()
+            for index in range(start, min(start + max_block_items, len(datum))):
+              write_item(datum[index], block)
+            _WriteSizedBlock(index + 1 - start, block, encoder)
+        except _DatumTypeMismatch as exn:
+          exn.path.append('[%d]' % index)
+          raise
+        encoder.write_long(0)
+    elif not validate:
+      def WriteArray(datum, encoder):
+        if len(datum) > 0:
+          encoder.write_long(len(datum))
+          for item in datum:
+            write_item(item, encoder)
+        encoder.write_long(0)
+    else:
+      def WriteArray(datum, encoder):
+        if not isinstance(datum, list):
+          raise _DatumTypeMismatch(writer_schema, datum)
+        if len(datum) > 0:
+          encoder.write_long(len(datum))
+          index = 0
+          try:
+            for item in datum:
+              write_item(item, encoder)
+              index += 1
+          except _DatumTypeMismatch as exn:
+            exn.path.append('[%d]' % index)
+            raise
+        encoder.write_long(0)
+    return WriteArray
+
+  def _CompileWriteMap(self, writer_schema, validate, memo):
+    write_value = self._CompileWrite(writer_schema.values, validate, memo)
+    max_block_items = self.max_block_items
+    if max_block_items is not None:
+      def WriteMap(datum, encoder):
+        if validate and not isinstance(datum, dict):
+          raise _DatumTypeMismatch(writer_schema, datum)
+        block = BufferEncoder()
+        count = 0
+        for key, val in datum.items():
+          if validate and not isinstance(key, str):
+            raise _DatumTypeMismatch(writer_schema, datum)
+          block.write_utf8(key)
+          try:
+            write_value(val, block)
+          except _DatumTypeMismatch as exn:
+            exn.path.append('[%r]' % key)
+            raise
+          count += 1
+          if count == max_block_items:
+            _WriteSizedBlock(count, block, encoder)
+            block = BufferEncoder()
+            count = 0
+        if count > 0:
+          _WriteSizedBlock(count, block, encoder)
+        encoder.write_long(0)
+    elif not validate:
+      def WriteMap(datum, encoder):
+        if len(datum) > 0:
+          encoder.write_long(len(datum))
+          for key, val in datum.items():
+            encoder.write_utf8(key)
+            write_value(val, encoder)
+        encoder.write_long(0)
+    else:
+      def WriteMap(datum, encoder):
+        if not isinstance(datum, dict):
+          raise _DatumTypeMismatch(writer_schema, datum)
+        if len(datum) > 0:
+          encoder.write_long(len(datum))
+          for key, val in datum.items():
+            if not isinstance(key, str):
+              raise _DatumTypeMismatch(writer_schema, datum)
+            encoder.write_utf8(key)
+            try:
+              write_value(val, encoder)
+            except _DatumTypeMismatch as exn:
+              exn.path.append('[%r]' % key)
+              raise
+        encoder.write_long(0)
+    return WriteMap
+
+  def _CompileWriteUnion(self, writer_schema, validate, memo):
+    validator_memo = {}
+    branch_plans = tuple(
+        (index,
+         _CompileValidator(branch_schema, validator_memo),
+         self._CompileWrite(branch_schema, validate, memo))
+        for index, branch_schema in enumerate(writer_schema.schemas))
+
+    # Map: Python type -> candidate branch plans, see SelectUnionBranch().
+    branch_table = {}
+    def GetBranches(python_type):
+      branches = tuple(
+          branch_plans[index]
+          for index in writer_schema.BranchesForType(python_type))
+      branch_table[python_type] = branches
+      return branches
+
+    if not validate:
+      def WriteUnion(datum, encoder):
+        branches = branch_table.get(type(datum)) or GetBranches(type(datum))
+        if len(branches) == 1:
+          index_of_schema, is_valid, write_branch = branches[0]
+        else:
+          for index_of_schema, is_valid, write_branch in branches:
+            if is_valid(datum):
+              break
+          else:
+            raise AvroTypeException(writer_schema, datum)
+        encoder.write_long(index_of_schema)
+        write_branch(datum, encoder)
+    else:
+      # When several branches remain, they are encoded by trial and rolled
+      # back until one succeeds, which validates the datum in the same pass.
+      def WriteUnion(datum, encoder):
+        branches = branch_table.get(type(datum)) or GetBranches(type(datum))
+        if len(branches) == 1:
+          index_of_schema, is_valid, write_branch = branches[0]
+          encoder.write_long(index_of_schema)
+          write_branch(datum, encoder)
+          return
+        mark = encoder.tell()
+        for index_of_schema, is_valid, write_branch in branches:
+          try:
+            encoder.write_long(index_of_schema)
+            write_branch(datum, encoder)
+            return
+          except _DatumTypeMismatch:
+            encoder.truncate(mark)
+        raise _DatumTypeMismatch(writer_schema, datum)
+    return WriteUnion
+
+  def _CompileWriteRecord(self, writer_schema, validate, memo):
+    field_plans = tuple(
+        (field.name, self._CompileWrite(field.type, validate, memo))
+        for field in writer_schema.fields)
+    if not validate:
+      def WriteRecord(datum, encoder):
+        get = datum.get
+        for field_name, write_field in field_plans:
+          write_field(get(field_name), encoder)
+    else:
+      def WriteRecord(datum, encoder):
+        if not isinstance(datum, dict):
+          raise _DatumTypeMismatch(writer_schema, datum)
+        get = datum.get
+        field_name = None
+        try:
+          for field_name, write_field in field_plans:
+            write_field(get(field_name), encoder)
+        except _DatumTypeMismatch as exn:
+          exn.path.append('.' + field_name)
+          raise
+    return WriteRecord
+
+
+def _WriteSizedBlock(count, block, encoder):
+  """Writes a block of encoded array items or map entries, with its size.
+
+  Args:
+    count: Number of items encoded in the block.
+    block: BufferEncoder holding the encoded items.
+    encoder: Encoder to write the block to.
+  """
+  encoder.write_long(-count)
+  encoder.write_long(len(block))
+  encoder.write(block.getvalue())
+
+
+class _DatumTypeMismatch(Exception):
+  """Raised by validating encoding plans on the first invalid value.
+
+  Lightweight on purpose: union branches are selected by trial, and failed
+  trials must be cheap. DatumWriter.write() converts the mismatch into an
+  AvroTypeException reporting the path to the offending value.
+  """
+
+  def __init__(self, expected_schema, datum):
+    super(_DatumTypeMismatch, self).__init__()
+    self.expected_schema = expected_schema
+    self.datum = datum
+    # Path elements to the invalid value, innermost first:
+    self.path = []
+
+
+def _EncoderMethodCaller(name):
+  """Builds a plan calling an encoder method on the datum to write.
+
+  Write counterpart of operator.methodcaller(), for plans taking
+  (datum, encoder) arguments.
+  """
+  get_method = operator.attrgetter(name)
+  def CallEncoderMethod(datum, encoder):
+    get_method(encoder)(datum)
+  return CallEncoderMethod
+
+
+# Plans for primitive types, indexed by type of the writer's schema:
+_WRITE_PRIMITIVE = {
+  'null': _EncoderMethodCaller('write_null'),
+  'boolean': _EncoderMethodCaller('write_boolean'),
+  'string': _EncoderMethodCaller('write_utf8'),
+  'int': _EncoderMethodCaller('write_int'),
+  'long': _EncoderMethodCaller('write_long'),
+  'float': _EncoderMethodCaller('write_float'),
+  'double': _EncoderMethodCaller('write_double'),
+  'bytes': _EncoderMethodCaller('write_bytes'),
+}
+
+
+def _WriteFixed(datum, encoder):
+  encoder.write(datum)
+
+
+# ------------------------------------------------------------------------------
+# Columns
+
+
+# Column of a nullable field, ie. a field of type ["null", T] or [T, "null"]:
+#  - values: column of the values of the field, with 0, or None for strings
+#    and bytes, in place of nulls;
+#  - valid: column of booleans, false where the field is null.
+NullableColumn = collections.namedtuple('NullableColumn', ['values', 'valid'])
+
+# array.array type codes of the columns of numeric types:
+_COLUMN_TYPECODES = {
+  'boolean': 'B',
+  'int': 'i',
+  'long': 'q',
+  'float': 'f',
+  'double': 'd',
+}
+
+# Decoder methods reading the values of columns, by type of the field:
+_COLUMN_READ = {
+  'boolean': 'read_boolean',
+  'int': 'read_int',
+  'long': 'read_long',
+  'float': 'read_float',
+  'double': 'read_double',
+  'string': 'read_utf8',
+  'bytes': 'read_bytes',
+}
+
+if has_numpy:
+  # NumPy data types of the columns, by array.array type code:
+  _COLUMN_DTYPES = {
+    'B': numpy.bool_,
+    'i': numpy.int32,
+    'q': numpy.int64,
+    'f': numpy.float32,
+    'd': numpy.float64,
+  }
+
+
+class ColumnReader(object):
+  """Decodes blocks of records into per-field columns.
+
+  Fields of numeric or boolean types are decoded into arrays, as NumPy
+  arrays when NumPy is available, or as array.array otherwise. Fields of
+  type ["null", T] are decoded into NullableColumn. Other fields are decoded
+  into columns of Python objects: NumPy arrays of objects, or lists.
+  """
+
+  def __init__(self, writer_schema, fields=None, use_numpy=None):
+    """Initializes a new column reader.
+
+    Args:
+      writer_schema: Record schema the records are encoded with.
+      fields: Optional list of the names of the fields to decode.
+          Other fields are skipped. Defaults to all fields.
+      use_numpy: Whether to decode into NumPy arrays. Defaults to whether
+          NumPy is available.
+    """
+    if writer_schema.type not in ['record', 'error', 'request']:
+      raise schema.AvroException(
+          'Columns can only be decoded from records, not %s.'
+          % writer_schema.type)
+    if use_numpy is None:
+      use_numpy = has_numpy
+    elif use_numpy and not has_numpy:
+      raise schema.AvroException('NumPy is not available.')
+    if fields is not None:
+      fields = list(fields)
+      unknown = set(fields) - set(writer_schema.field_map)
+      if unknown:
+        raise schema.AvroException(
+            'Unknown fields: %s' % ', '.join(sorted(unknown)))
+    else:
+      fields = [field.name for field in writer_schema.fields]
+    self._writer_schema = writer_schema
+    self._fields = fields
+    self._use_numpy = use_numpy
+
+    # Per field in the writer's schema, (name, kind, read, typecode, null
+    # index), where kind is None for skipped fields and read decodes or
+    # skips the field value:
+    datum_reader = DatumReader()
+    selected = frozenset(fields)
+    self._field_plans = []
+    for field in writer_schema.fields:
+      if field.name not in selected:
+        plan = (None, None, datum_reader.compile_skip(field.type),
+                None, None)
+      else:
+        plan = (field.name,) + _CompileColumnRead(field.type, datum_reader)
+      self._field_plans.append(plan)
+
+  @property
+  def fields(self):
+    """Returns: the names of the fields decoded into columns."""
+    return self._fields
+
+  def read(self, decoder, count):
+    """Decodes a number of records into columns.
+
+    Args:
+      decoder: Decoder to read the records from.
+      count: Number of records to decode.
+    Returns:
+      A dictionary of the columns, by field name, in the order of fields.
+    """
+    # Per field, the functions appending to its columns:
+    columns = {}
+    readers = []
+    for name, kind, read, typecode, null_index in self._field_plans:
+      if kind is None:
+        readers.append((read, None, None, None))
+        continue
+      if typecode is not None:
+        values = array.array(typecode)
+      else:
+        values = []
+      if kind == 'nullable':
+        valid = array.array('B')
+        columns[name] = (values, valid)
+        null_value = None if typecode is None else 0
+        readers.append((read, values.append, valid.append,
+                        (null_index, null_value)))
+      else:
+        columns[name] = values
+        readers.append((read, values.append, None, None))
+
+    for _ in range(count):
+      for read, append, append_valid, nullable in readers:
+        if append is None:
+          read(decoder)
+        elif nullable is None:
+          append(read(decoder))
+        elif decoder.read_long() == nullable[0]:
+          append(nullable[1])
+          append_valid(0)
+        else:
+          append(read(decoder))
+          append_valid(1)
+
+    return {name: self._MakeColumn(columns[name]) for name in self._fields}
+
+  def _MakeColumn(self, column):
+    """Converts a decoded column into its final representation."""
+    if isinstance(column, tuple):
+      values, valid = column
+      return NullableColumn(
+          values=self._MakeColumn(values),
+          valid=self._MakeColumn(valid))
+    if not self._use_numpy:
+      return column
+    if isinstance(column, array.array):
+      # Shares the memory of the array, without copy:
+      return numpy.frombuffer(column, dtype=_COLUMN_DTYPES[column.typecode])
+    objects = numpy.empty(len(column), dtype=object)
+    for index, value in enumerate(column):
+      objects[index] = value
+    return objects
+
+  def concat(self, blocks):
+    """Concatenates the columns decoded from several blocks.
+
+    Args:
+      blocks: List of dictionaries of columns, as returned by read().
+    Returns:
+      A dictionary of the concatenated columns, by field name.
+    """
+    if not blocks:
+      return self.read(None, 0)
+    return {
+        name: _ConcatColumns([block[name] for block in blocks])
+        for name in self._fields}
+
+
+def _CompileColumnRead(field_schema, datum_reader):
+  """Compiles the decoding of a field into a column.
+
+  Args:
+    field_schema: Schema of the field.
+    datum_reader: DatumReader used to compile plans for fields of other types.
+  Returns:
+    A tuple (kind, read, typecode, null index) where kind is 'value' or
+    'nullable', read decodes a value of the field (or of its non-null branch),
+    typecode is the array.array type code of the values or None for objects,
+    and null index is the index of the null branch of nullable fields.
+  """
+  f_type = field_schema.type
+  if f_type in _COLUMN_READ:
+    return ('value', operator.methodcaller(_COLUMN_READ[f_type]),
+            _COLUMN_TYPECODES.get(f_type), None)
+  null_index, value_schema = _GetNullableBranches(field_schema)
+  if value_schema is not None and value_schema.type in _COLUMN_READ:
+    value_type = value_schema.type
+    return ('nullable', operator.methodcaller(_COLUMN_READ[value_type]),
+            _COLUMN_TYPECODES.get(value_type), null_index)
+  return ('value', datum_reader.compile_read(field_schema, field_schema),
+          None, None)
+
+
+def _GetNullableBranches(field_schema):
+  """Reports the branches of a ["null", T] or [T, "null"] union.
+
+  Args:
+    field_schema: Schema of a field.
+  Returns:
+    The index of the null branch and the schema of the other branch,
+    or (None, None) if the schema is not such a union.
+  """
+  if field_schema.type == 'union' and len(field_schema.schemas) == 2:
+    branch_types = [branch.type for branch in field_schema.schemas]
+    if branch_types.count('null') == 1:
+      null_index = branch_types.index('null')
+      return null_index, field_schema.schemas[1 - null_index]
+  return None, None
+
+
+def _ConcatColumns(columns):
+  """Concatenates columns of the same kind."""
+  first = columns[0]
+  if isinstance(first, NullableColumn):
+    return NullableColumn(
+        values=_ConcatColumns([column.values for column in columns]),
+        valid=_ConcatColumns([column.valid for column in columns]))
+  if has_numpy and isinstance(first, numpy.ndarray):
+    return numpy.concatenate(columns)
+  concat = first[:0]
+  for column in columns:
+    concat.extend(column)
+  return concat
+
+
+class ColumnWriter(object):
+  """Encodes per-field columns into records.
+
+  With NumPy, columns of numeric and boolean fields are encoded with
+  vectorized operations: zig-zag and variable-length encoding for integers,
+  bulk little-endian packing for floats and doubles. The encoded values of
+  all fields are then scattered into place, record by record, in a single
+  output buffer. Without NumPy, records are encoded one at a time.
+  """
+
+  def __init__(self, writer_schema, use_numpy=None):
+    """Initializes a new column writer.
+
+    Args:
+      writer_schema: Record schema to encode the records with.
+      use_numpy: Whether to encode with NumPy. Defaults to whether NumPy
+          is available.
+    """
+    if writer_schema.type not in ['record', 'error', 'request']:
+      raise schema.AvroException(
+          'Columns can only be encoded as records, not %s.'
+          % writer_schema.type)
+    if use_numpy is None:
+      use_numpy = has_numpy
+    elif use_numpy and not has_numpy:
+      raise schema.AvroException('NumPy is not available.')
+    self._writer_schema = writer_schema
+    self._use_numpy = use_numpy
+
+    # Validating encoding plans, per field:
+    datum_writer = DatumWriter()
+    self._field_plans = [
+        (field, datum_writer.compile_write(field.type, validate=True))
+        for field in writer_schema.fields]
+
+  def encode(self, columns):
+    """Encodes columns into records.
+
+    Args:
+      columns: Dictionary of the columns of every field of the schema, by
+          field name. Columns are sequences of the same length: NumPy arrays,
+          array.array or lists. Nullable fields may be given as NullableColumn,
+          or as sequences holding None for nulls.
+    Returns:
+      The encoded records, as a bytes-like object, and the sequence of the
+      positions of the end of each record in the encoded records.
+    Raises:
+      AvroTypeException: if a value does not match the type of its field.
+    """
+    missing = [field.name for field in self._writer_schema.fields
+               if field.name not in columns]
+    if missing:
+      raise schema.AvroException('Missing columns: %s' % ', '.join(missing))
+    lengths = {_ColumnLength(columns[name])
+               for name in self._writer_schema.field_map}
+    if len(lengths) > 1:
+      raise schema.AvroException('Columns have different lengths.')
+    count = lengths.pop() if lengths else 0
+
+    if self._use_numpy:
+      return self._EncodeVectorized(columns, count)
+    return self._EncodeRecords(columns, count)
+
+  def _EncodeRecords(self, columns, count):
+    """Encodes columns one record at a time."""
+    field_columns = []
+    for field, write in self._field_plans:
+      column = columns[field.name]
+      if isinstance(column, NullableColumn):
+        column = [value if valid else None
+                  for value, valid in zip(_ColumnValues(column.values),
+                                          _ColumnValues(column.valid))]
+      field_columns.append(_ColumnValues(column))
+
+    encoder = BufferEncoder()
+    row_ends = array.array('q')
+    writes = [write for field, write in self._field_plans]
+    for row, values in enumerate(zip(*field_columns)):
+      for field_index, write in enumerate(writes):
+        try:
+          write(values[field_index], encoder)
+        except _DatumTypeMismatch as exn:
+          raise _ColumnTypeException(
+              self._field_plans[field_index][0], row, exn)
+        except OverflowError:
+          # Eg. a float out of the range of 32-bit floats:
+          field = self._field_plans[field_index][0]
+          raise AvroTypeException(
+              field.type, values[field_index],
+              path='%s[%d]' % (field.name, row))
+      row_ends.append(encoder.tell())
+    return encoder.getvalue(), row_ends
+
+  def _EncodeVectorized(self, columns, count):
+    """Encodes columns with NumPy, one field at a time."""
+    # Per field, the encoded length of each record and a function writing
+    # the encoded values of the field at the given positions:
+    pieces = []
+    for field, write in self._field_plans:
+      column = columns[field.name]
+      null_index, value_schema = _GetNullableBranches(field.type)
+      if value_schema is not None:
+        pieces.append(_EncodeNullableColumn(
+            field, column, null_index, value_schema, write))
+      else:
+        pieces.append(_EncodeColumn(field, field.type, column, write))
+
+    lengths = numpy.zeros(count, dtype=numpy.int64)
+    for field_lengths, scatter in pieces:
+      lengths += field_lengths
+    row_ends = numpy.cumsum(lengths)
+    size = int(row_ends[-1]) if count > 0 else 0
+    data = numpy.empty(size, dtype=numpy.uint8)
+    starts = row_ends - lengths
+    for field_lengths, scatter in pieces:
+      scatter(data, starts)
+      starts += field_lengths
+    return data, row_ends
+
+
+def _ColumnTypeException(field, row, exn):
+  """Reports an invalid value in a column.
+
+  Args:
+    field: Field of the column.
+    row: Index of the invalid value in the column.
+    exn: _DatumTypeMismatch raised while encoding the value.
+  Returns:
+    The AvroTypeException to raise.
+  """
+  return AvroTypeException(
+      exn.expected_schema, exn.datum,
+      path='%s[%d]%s' % (field.name, row, ''.join(reversed(exn.path))))
+
+
+def _ColumnValues(column):
+  """Converts a NumPy column into a list of Python values.
+
+  Other columns are returned as is.
+  """
+  if has_numpy and isinstance(column, numpy.ndarray):
+    return column.tolist()
+  return column
+
+
+def _ColumnLength(column):
+  """Returns the number of values in a column."""
+  if isinstance(column, NullableColumn):
+    return len(column.values)
+  return len(column)
+
+
+def _EncodeNullableColumn(field, column, null_index, value_schema, write):
+  """Encodes the column of a ["null", T] field with NumPy.
+
+  Returns:
+    The encoded length of each record, and a function (data, starts) writing
+    the encoded values at the given positions.
+  """
+  if isinstance(column, NullableColumn):
+    valid = numpy.asarray(column.valid, dtype=bool)
+    values = column.values
+  else:
+    valid = numpy.fromiter(
+        (value is not None for value in column), dtype=bool,
+        count=len(column))
+    values = column
+  if isinstance(values, numpy.ndarray):
+    present = values[valid]
+  else:
+    present = [value for value, ok in zip(values, valid) if ok]
+
+  # Union branch indexes are small: their zig-zag encoding is a single byte.
+  branch_bytes = numpy.where(
+      valid, (1 - null_index) << 1, null_index << 1).astype(numpy.uint8)
+  value_lengths, value_scatter = _EncodeColumn(
+      field, value_schema, present, None, rows=numpy.flatnonzero(valid))
+  lengths = numpy.ones(len(valid), dtype=numpy.int64)
+  lengths[valid] += value_lengths
+
+  def Scatter(data, starts):
+    data[starts] = branch_bytes
+    value_scatter(data, starts[valid] + 1)
+  return lengths, Scatter
+
+
+def _EncodeColumn(field, value_schema, column, write, rows=None):
+  """Encodes a column of values with NumPy.
+
+  Args:
+    field: Field of the column.
+    value_schema: Schema of the values.
+    column: Sequence of the values.
+    write: Validating encoding plan for the values, or None to build one.
+    rows: Optional row numbers of the values, to report invalid values.
+  Returns:
+    The encoded length of each value, and a function (data, starts) writing
+    the encoded values at the given positions.
+  """
+  v_type = value_schema.type
+  def Fail(index):
+    row = index if rows is None else int(rows[index])
+    return AvroTypeException(
+        value_schema, column[index], path='%s[%d]' % (field.name, row))
+
+  def AsArray(kinds, is_valid, dtype):
+    """Converts the column into a NumPy array of one of the given kinds.
+
+    Columns of other kinds, eg. holding None or strings, are checked value
+    by value, to report the first invalid value.
+    """
+    values = numpy.asarray(column)
+    if len(values) == 0 or values.dtype.kind in kinds:
+      return values
+    for index, value in enumerate(column):
+      if not is_valid(value):
+        raise Fail(index)
+    return numpy.asarray(column, dtype=dtype)
+
+  if v_type in ['int', 'long']:
+    if v_type == 'int':
+      low, high = INT_MIN_VALUE, INT_MAX_VALUE
+    else:
+      low, high = LONG_MIN_VALUE, LONG_MAX_VALUE
+    values = AsArray(
+        'biu',
+        lambda value: (isinstance(value, (int, numpy.integer))
+                       and low <= value <= high),
+        numpy.int64)
+    if len(values) > 0:
+      out_of_range = (values < low) | (values > high)
+      if out_of_range.any():
+        raise Fail(int(numpy.argmax(out_of_range)))
+    return _EncodeVarints(values.astype(numpy.int64))
+
+  if v_type in ['float', 'double']:
+    values = AsArray(
+        'biuf',
+        lambda value: isinstance(
+            value, (int, float, numpy.integer, numpy.floating)),
+        numpy.float64)
+    if v_type == 'float':
+      dtype = numpy.dtype('<f4')
+    else:
+      dtype = numpy.dtype('<f8')
+    with numpy.errstate(over='ignore'):
+      cast = values.astype(dtype)
+    # Finite values out of the range of the type, as rejected by write_float():
+    overflow = numpy.isinf(cast) & ~numpy.isinf(values)
+    if overflow.any():
+      raise Fail(int(numpy.argmax(overflow)))
+    encoded = cast.view(numpy.uint8).reshape(-1, dtype.itemsize)
+    offsets = numpy.arange(dtype.itemsize)
+    def ScatterFloats(data, starts):
+      data[starts[:, numpy.newaxis] + offsets] = encoded
+    return numpy.full(len(values), dtype.itemsize, numpy.int64), ScatterFloats
+
+  if v_type == 'boolean':
+    values = AsArray(
+        'b', lambda value: isinstance(value, (bool, numpy.bool_)), bool)
+    encoded = values.astype(numpy.uint8)
+    def ScatterBooleans(data, starts):
+      data[starts] = encoded
+    return numpy.ones(len(values), dtype=numpy.int64), ScatterBooleans
+
+  # Other types are encoded value by value, then copied into place:
+  if v_type == 'string':
+    def Encode(index, value):
+      if not isinstance(value, str):
+        raise Fail(index)
+      return value.encode('utf-8')
+  elif v_type == 'bytes':
+    def Encode(index, value):
+      if not isinstance(value, bytes):
+        raise Fail(index)
+      return value
+  else:
+    if write is None:
+      write = DatumWriter().compile_write(value_schema, validate=True)
+    encoder = BufferEncoder()
+    def Encode(index, value):
+      encoder.truncate()
+      try:
+        write(value, encoder)
+      except _DatumTypeMismatch as exn:
+        row = index if rows is None else int(rows[index])
+        raise _ColumnTypeException(field, row, exn)
+      return encoder.getvalue()
+  blobs = [Encode(index, value) for index, value in enumerate(column)]
+  blob_lengths = numpy.fromiter(
+      map(len, blobs), dtype=numpy.int64, count=len(blobs))
+  blob = numpy.frombuffer(b''.join(blobs), dtype=numpy.uint8)
+  blob_starts = numpy.cumsum(blob_lengths) - blob_lengths
+
+  if v_type in ['string', 'bytes']:
+    # Values are prefixed with their length:
+    prefix_lengths, prefix_scatter = _EncodeVarints(blob_lengths)
+  else:
+    prefix_lengths, prefix_scatter = 0, None
+
+  def ScatterBlobs(data, starts):
+    if prefix_scatter is not None:
+      prefix_scatter(data, starts)
+    positions = numpy.repeat(
+        starts + prefix_lengths - blob_starts, blob_lengths)
+    positions += numpy.arange(len(blob))
+    data[positions] = blob
+  return prefix_lengths + blob_lengths, ScatterBlobs
+
+
+def _EncodeVarints(values):
+  """Encodes integers with zig-zag and variable-length encoding, with NumPy.
+
+  Args:
+    values: NumPy array of int64 values.
+  Returns:
+    The encoded length of each value, and a function (data, starts) writing
+    the encoded values at the given positions.
+  """
+  zigzag = ((values << 1) ^ (values >> 63)).view(numpy.uint64)
+  lengths = numpy.ones(len(values), dtype=numpy.int64)
+  for shift in range(7, 64, 7):
+    lengths += zigzag >= numpy.uint64(1 << shift)
+
+  def ScatterVarints(data, starts):
+    for index in range(10):
+      selected = lengths > index
+      if not selected.any():
+        break
+      groups = (zigzag[selected] >> numpy.uint64(7 * index)) & numpy.uint64(0x7f)
+      more = lengths[selected] > index + 1
+      data[starts[selected] + index] = groups | (more.astype(numpy.uint64) << 7)
+  return lengths, ScatterVarints
+
 
 if __name__ == '__main__':
   raise Exception('Not a standalone module')
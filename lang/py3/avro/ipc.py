@@ -109,6 +109,10 @@ class BaseRequestor(object, metaclass=abc.ABCMeta):
     self._remote_hash = None
     self._send_protocol = None
 
+    # Datum writers and readers of the messages, see _GetDatumWriter():
+    self._datum_writers = {}
+    self._datum_readers = {}
+
   @property
   def local_protocol(self):
     """Returns: the Avro Protocol describing the messages sent and received."""
@@ -142,13 +146,12 @@ class BaseRequestor(object, metaclass=abc.ABCMeta):
       The IPC response.
     """
     # build handshake and call request
-    buffer_writer = io.BytesIO()
-    buffer_encoder = avro_io.BinaryEncoder(buffer_writer)
+    buffer_encoder = avro_io.BufferEncoder()
     self._WriteHandshakeRequest(buffer_encoder)
     self._WriteCallRequest(message_name, request_datum, buffer_encoder)
 
     # send the handshake and call request; block until call response
-    call_request = buffer_writer.getvalue()
+    call_request = buffer_encoder.getvalue()
     return self._IssueRequest(call_request, message_name, request_datum)
 
   def _WriteHandshakeRequest(self, encoder):
@@ -200,7 +203,7 @@ class BaseRequestor(object, metaclass=abc.ABCMeta):
 
   def _WriteRequest(self, request_schema, request_datum, encoder):
     logging.info('writing request: %s', request_datum)
-    datum_writer = avro_io.DatumWriter(request_schema)
+    datum_writer = _GetDatumWriter(self._datum_writers, request_schema)
     datum_writer.write(request_datum, encoder)
 
   def _ReadHandshakeResponse(self, decoder):
@@ -282,12 +285,14 @@ class BaseRequestor(object, metaclass=abc.ABCMeta):
       raise self._ReadError(writer_schema, reader_schema, decoder)
 
   def _ReadResponse(self, writer_schema, reader_schema, decoder):
-    datum_reader = avro_io.DatumReader(writer_schema, reader_schema)
+    datum_reader = _GetDatumReader(
+        self._datum_readers, writer_schema, reader_schema)
     result = datum_reader.read(decoder)
     return result
 
   def _ReadError(self, writer_schema, reader_schema, decoder):
-    datum_reader = avro_io.DatumReader(writer_schema, reader_schema)
+    datum_reader = _GetDatumReader(
+        self._datum_readers, writer_schema, reader_schema)
     return AvroRemoteException(datum_reader.read(decoder))
 
 
@@ -298,7 +303,7 @@ class Requestor(BaseRequestor):
     call_response = self.transceiver.Transceive(call_request)
 
     # process the handshake and call response
-    buffer_decoder = avro_io.BinaryDecoder(io.BytesIO(call_response))
+    buffer_decoder = avro_io.BufferDecoder(call_response)
     call_response_exists = self._ReadHandshakeResponse(buffer_decoder)
     if call_response_exists:
       return self._ReadCallResponse(message_name, buffer_decoder)
@@ -319,6 +324,10 @@ class Responder(object, metaclass=abc.ABCMeta):
 
     self.set_protocol_cache(self._local_hash, self._local_protocol)
 
+    # Datum writers and readers of the messages, see _GetDatumWriter():
+    self._datum_writers = {}
+    self._datum_readers = {}
+
   @property
   def local_protocol(self):
     return self._local_protocol
@@ -340,8 +349,7 @@ class Responder(object, metaclass=abc.ABCMeta):
     Raises:
       ???
     """
-    buffer_reader = io.BytesIO(call_request)
-    buffer_decoder = avro_io.BinaryDecoder(buffer_reader)
+    buffer_decoder = avro_io.BufferDecoder(call_request)
     buffer_writer = io.BytesIO()
     buffer_encoder = avro_io.BinaryEncoder(buffer_writer)
     error = None
@@ -455,18 +463,60 @@ class Responder(object, metaclass=abc.ABCMeta):
     raise Error('abtract method')
 
   def _ReadRequest(self, writer_schema, reader_schema, decoder):
-    datum_reader = avro_io.DatumReader(writer_schema, reader_schema)
+    datum_reader = _GetDatumReader(
+        self._datum_readers, writer_schema, reader_schema)
     return datum_reader.read(decoder)
 
   def _WriteResponse(self, writer_schema, response_datum, encoder):
-    datum_writer = avro_io.DatumWriter(writer_schema)
+    datum_writer = _GetDatumWriter(self._datum_writers, writer_schema)
     datum_writer.write(response_datum, encoder)
 
   def _WriteError(self, writer_schema, error_exception, encoder):
-    datum_writer = avro_io.DatumWriter(writer_schema)
+    datum_writer = _GetDatumWriter(self._datum_writers, writer_schema)
     datum_writer.write(str(error_exception), encoder)
 
 
+def _GetDatumWriter(datum_writers, writer_schema):
+  """Reports the datum writer of a message schema, created on first use.
+
+  Messages are written with one datum writer per schema, so that the write
+  plan of each schema is compiled once. Entries hold on to their schemas,
+  so that the ids of the schemas are not reused while they are cached.
+
+  Args:
+    datum_writers: Map: id of the schema -> (schema, datum writer).
+    writer_schema: Schema to write messages with.
+  Returns:
+    The datum writer for the schema.
+  """
+  entry = datum_writers.get(id(writer_schema))
+  if entry is None:
+    entry = (writer_schema, avro_io.DatumWriter(writer_schema))
+    datum_writers[id(writer_schema)] = entry
+  return entry[1]
+
+
+def _GetDatumReader(datum_readers, writer_schema, reader_schema):
+  """Reports the datum reader of a pair of message schemas.
+
+  See _GetDatumWriter().
+
+  Args:
+    datum_readers: Map: ids of the schemas -> (schemas, datum reader).
+    writer_schema: Schema the messages are written with.
+    reader_schema: Schema to read messages with.
+  Returns:
+    The datum reader for the schemas.
+  """
+  key = (id(writer_schema), id(reader_schema))
+  entry = datum_readers.get(key)
+  if entry is None:
+    entry = ((writer_schema, reader_schema),
+             avro_io.DatumReader(writer_schema, reader_schema))
+    datum_readers[key] = entry
+  return entry[1]
+
+
 # ------------------------------------------------------------------------------
 # Framed message
 
@@ -528,8 +578,11 @@ class FramedWriter(object):
     Message is chunked into sequences of frames terminated by an empty frame.
 
     Args:
-      message: Message to write, as bytes.
+      message: Message to write, as bytes or any bytes-like object,
+          eg. the memoryview returned by avro.io.BufferEncoder.getbuffer().
+          Chunks are sliced out of the message without copy.
     """
+    message = memoryview(message)
     while len(message) > 0:
       chunk_size = max(BUFFER_SIZE, len(message))
       chunk = message[:chunk_size]
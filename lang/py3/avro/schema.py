@@ -129,6 +129,34 @@ VALID_FIELD_SORT_ORDERS = frozenset([
   'ignore',
 ])
 
+# Python types of the generic representation of data for each schema type
+# (see avro.io), used to select union branches:
+PYTHON_TYPES = {
+  NULL: (type(None),),
+  BOOLEAN: (bool,),
+  STRING: (str,),
+  BYTES: (bytes,),
+  INT: (int,),
+  LONG: (int,),
+  FLOAT: (float,),
+  DOUBLE: (float,),
+  FIXED: (bytes,),
+  ENUM: (str,),
+  ARRAY: (list,),
+  MAP: (dict,),
+  RECORD: (dict,),
+  ERROR: (dict,),
+  REQUEST: (dict,),
+}
+
+# Python types a schema type also accepts, as a last resort when selecting
+# union branches: a Python int is written with an int or long branch when
+# there is one, as float and double may not represent it exactly.
+PYTHON_FALLBACK_TYPES = {
+  FLOAT: (int,),
+  DOUBLE: (int,),
+}
+
 
 # ------------------------------------------------------------------------------
 # Exceptions
@@ -756,11 +784,25 @@ class EnumSchema(NamedSchema):
     if doc is not None:
       self._props['doc'] = doc
 
+    self._symbol_set = symbol_set
+    self._symbol_index = ImmutableDict(
+        (symbol, index) for index, symbol in enumerate(self.symbols))
+
   @property
   def symbols(self):
     """Returns: the symbols defined in this enum."""
     return self._props['symbols']
 
+  @property
+  def symbol_set(self):
+    """Returns: the symbols defined in this enum, as a frozen set."""
+    return self._symbol_set
+
+  @property
+  def symbol_index(self):
+    """Returns: a read-only map of the 0-based symbol positions by symbol."""
+    return self._symbol_index
+
   def to_json(self, names=None):
     if names is None:
       names = Names()
@@ -889,11 +931,55 @@ class UnionSchema(Schema):
           'Invalid union branches with duplicate type:%s'
           % ''.join(map(lambda schema: ('\n\t - %s' % schema), self._schemas)))
 
+    # Map: Python type -> indexes of the branches that may represent it.
+    self._branch_table = {}
+    for python_types in PYTHON_TYPES.values():
+      for python_type in python_types:
+        self.BranchesForType(python_type)
+
   @property
   def schemas(self):
     """Returns: the ordered list of schema branches in the union."""
     return self._schemas
 
+  def BranchesForType(self, python_type):
+    """Reports the branches that may represent values of a given Python type.
+
+    Branches whose generic Python representation is exactly python_type come
+    first, followed by branches that accept it as a subclass (eg. a bool
+    for an int branch, or an OrderedDict for a map branch), then by branches
+    that accept it as a fallback (an int for a float or double branch);
+    each group is in declaration order. Lookups for the built-in types are
+    precomputed, other types are resolved on first use and cached.
+
+    A value is written with the first of these branches it is valid for.
+    When there is only one, the value's type alone selects it; values need
+    to be validated only when several branches remain, eg. a dict when the
+    union has both record and map branches.
+
+    Args:
+      python_type: Python type of a value to write in this union.
+    Returns:
+      Tuple of the candidate branch indexes, in order of preference.
+    """
+    branches = self._branch_table.get(python_type)
+    if branches is None:
+      exact = []
+      inherited = []
+      fallback = []
+      for index, branch in enumerate(self._schemas):
+        branch_types = PYTHON_TYPES.get(branch.type, ())
+        if python_type in branch_types:
+          exact.append(index)
+        elif issubclass(python_type, branch_types):
+          inherited.append(index)
+        elif issubclass(
+            python_type, PYTHON_FALLBACK_TYPES.get(branch.type, ())):
+          fallback.append(index)
+      branches = tuple(exact + inherited + fallback)
+      self._branch_table[python_type] = branches
+    return branches
+
   def to_json(self, names=None):
     if names is None:
       names = Names()
@@ -1281,3 +1367,154 @@ def Parse(json_string):
 
   # construct the Avro Schema object
   return SchemaFromJSONData(json_data, names)
+
+
+# ------------------------------------------------------------------------------
+
+
+def Project(record_schema, field_paths):
+  """Derives a reader's schema that only keeps some fields of a record.
+
+  Field paths are dot-separated field names, eg. 'user.id'. Paths traverse
+  nested records, as well as arrays and maps of records and unions with
+  record branches. A path that ends on a field keeps the whole field.
+  Fields are kept in the order of the original schema.
+
+  Projected records keep their names, so that the projected schema resolves
+  against the original one. A named record used in several places is thus
+  projected once, and keeps every field requested through any of its uses,
+  or all its fields if any of its uses is requested whole.
+
+  Args:
+    record_schema: Record schema to project, typically a writer's schema.
+    field_paths: Collection of paths of the fields to keep.
+  Returns:
+    The projected record schema.
+  Raises:
+    SchemaParseException: if a path does not exist in the record schema.
+  """
+  # Tree of the fields to keep: field name -> sub-tree,
+  # or None to keep the field entirely.
+  tree = {}
+  for field_path in field_paths:
+    node = tree
+    names = field_path.split('.')
+    for name in names[:-1]:
+      if name in node and node[name] is None:
+        break
+      node = node.setdefault(name, {})
+    else:
+      node[names[-1]] = None
+
+  # Fields to keep in each named record, by full name: set of field names,
+  # or None to keep the record entirely.
+  kept_fields = {}
+  _CollectProjection(record_schema, tree, kept_fields, path='')
+  json_data = _ProjectToJSON(record_schema, kept_fields, Names())
+  return SchemaFromJSONData(json_data, Names())
+
+
+def _CollectProjection(schema, tree, kept_fields, path):
+  """Collects the fields to keep in each record reached by a projection.
+
+  Args:
+    schema: Schema to project.
+    tree: Fields to keep, or None to keep the schema entirely.
+    kept_fields: Fields to keep in each named record, updated in place.
+    path: Path of the schema in the projected record, for error reporting.
+  """
+  if tree is None:
+    _CollectWhole(schema, kept_fields)
+    return
+
+  if schema.type == ARRAY:
+    _CollectProjection(schema.items, tree, kept_fields, path)
+    return
+  elif schema.type == MAP:
+    _CollectProjection(schema.values, tree, kept_fields, path)
+    return
+  elif schema.type == UNION:
+    branches = [branch for branch in schema.schemas
+                if branch.type in [RECORD, ERROR, ARRAY, MAP]]
+    if not branches:
+      raise SchemaParseException(
+          'Cannot project fields %s of non-record field %r.'
+          % (sorted(tree), path))
+    for branch in branches:
+      _CollectProjection(branch, tree, kept_fields, path)
+    return
+  elif schema.type not in [RECORD, ERROR]:
+    raise SchemaParseException(
+        'Cannot project fields %s of non-record field %r.'
+        % (sorted(tree), path))
+
+  unknown = frozenset(tree).difference(schema.field_map)
+  if unknown:
+    raise SchemaParseException(
+        'Unknown fields %s in record %r projected at %r.'
+        % (sorted(unknown), schema.fullname, path))
+  if schema.fullname in kept_fields and kept_fields[schema.fullname] is None:
+    return
+  kept_fields.setdefault(schema.fullname, set()).update(tree)
+  for field_name, subtree in tree.items():
+    field_path = field_name if not path else '%s.%s' % (path, field_name)
+    _CollectProjection(
+        schema.field_map[field_name].type, subtree, kept_fields, field_path)
+
+
+def _CollectWhole(schema, kept_fields):
+  """Marks the records reached by a schema kept entirely as kept entirely."""
+  if schema.type in [RECORD, ERROR]:
+    if schema.fullname in kept_fields and kept_fields[schema.fullname] is None:
+      return
+    kept_fields[schema.fullname] = None
+    for field in schema.fields:
+      _CollectWhole(field.type, kept_fields)
+  elif schema.type == ARRAY:
+    _CollectWhole(schema.items, kept_fields)
+  elif schema.type == MAP:
+    _CollectWhole(schema.values, kept_fields)
+  elif schema.type == UNION:
+    for branch in schema.schemas:
+      _CollectWhole(branch, kept_fields)
+
+
+def _ProjectToJSON(schema, kept_fields, names):
+  """Renders the JSON descriptor of a projected schema.
+
+  Args:
+    schema: Schema to project.
+    kept_fields: Fields to keep in each named record, by full name.
+    names: Tracker of the named schemas already rendered.
+  Returns:
+    The JSON descriptor of the projected schema.
+  """
+  if schema.type == ARRAY:
+    to_dump = schema.props.copy()
+    to_dump['items'] = _ProjectToJSON(schema.items, kept_fields, names)
+    return to_dump
+  elif schema.type == MAP:
+    to_dump = schema.props.copy()
+    to_dump['values'] = _ProjectToJSON(schema.values, kept_fields, names)
+    return to_dump
+  elif schema.type == UNION:
+    return [_ProjectToJSON(branch, kept_fields, names)
+            for branch in schema.schemas]
+  elif (schema.type not in [RECORD, ERROR]
+        or kept_fields.get(schema.fullname) is None):
+    return schema.to_json(names)
+
+  if schema.fullname in names.names:
+    return schema.name_ref(names)
+  names.names[schema.fullname] = schema
+
+  kept = kept_fields[schema.fullname]
+  to_dump = names.prune_namespace(schema.props.copy())
+  to_dump['fields'] = []
+  for field in schema.fields:
+    if field.name in kept:
+      field_dump = field.props.copy()
+      field_dump['type'] = _ProjectToJSON(field.type, kept_fields, names)
+      to_dump['fields'].append(field_dump)
+  return to_dump
+
@@ -18,9 +18,12 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import array
 import logging
+import operator
 import os
 import tempfile
+import threading
 import unittest
 
 from avro import datafile
@@ -79,6 +82,15 @@ SCHEMAS_TO_VALIDATE = (
 
 CODECS_TO_VALIDATE = ('null', 'deflate')
 
+for codec in ('bzip2', 'xz', 'zstandard'):
+  if codec in datafile.VALID_CODECS:
+    CODECS_TO_VALIDATE += (codec,)
+  else:
+    logging.info('%s not present, will skip testing it.', codec)
+
+if io.has_numpy:
+  import numpy
+
 try:
   import snappy
   CODECS_TO_VALIDATE += ('snappy',)
@@ -270,6 +282,715 @@ class TestDataFile(unittest.TestCase):
           datums.append(datum)
       self.assertTrue(reader.closed)
 
+  def testProjection(self):
+    file_path = self.NewTempFile()
+    writer_schema = schema.Parse("""
+      {"type": "record", "name": "Test",
+       "fields": [{"name": "id", "type": "long"},
+                  {"name": "text", "type": "string"},
+                  {"name": "values", "type": {"type": "array", "items": "int"}}]}
+    """)
+    with open(file_path, 'wb') as writer:
+      with datafile.DataFileWriter(
+          writer, io.DatumWriter(), writer_schema, codec='deflate') as dfw:
+        for i in range(100):
+          dfw.append({'id': i, 'text': 'text%d' % i, 'values': [i] * i})
+
+    with open(file_path, 'rb') as reader:
+      with datafile.DataFileReader(
+          reader, io.DatumReader(), projection=['id']) as dfr:
+        self.assertEqual([{'id': i} for i in range(100)], list(dfr))
+
+  def testReaderSchema(self):
+    writer_schemas = [
+        schema.Parse("""
+          {"type": "record", "name": "Evolving",
+           "fields": [{"name": "id", "type": "int"}]}
+        """),
+        schema.Parse("""
+          {"type": "record", "name": "Evolving",
+           "fields": [{"name": "id", "type": "long"},
+                      {"name": "text", "type": "string"}]}
+        """),
+    ]
+    reader_schema = schema.Parse("""
+      {"type": "record", "name": "Evolving",
+       "fields": [{"name": "id", "type": "double"},
+                  {"name": "text", "type": "string", "default": ""}]}
+    """)
+    file_paths = []
+    for i in range(6):
+      file_path = self.NewTempFile()
+      with open(file_path, 'wb') as writer:
+        with datafile.DataFileWriter(
+            writer, io.DatumWriter(), writer_schemas[i % 2]) as dfw:
+          dfw.append({'id': i, 'text': 'text%d' % i})
+      file_paths.append(file_path)
+
+    compiled = []
+    class DatumReader(io.DatumReader):
+      def compile_read(self, writer_schema, reader_schema):
+        compiled.append((writer_schema, reader_schema))
+        return super().compile_read(writer_schema, reader_schema)
+
+    for i, file_path in enumerate(file_paths):
+      with open(file_path, 'rb') as reader:
+        with datafile.DataFileReader(
+            reader, DatumReader(), reader_schema=reader_schema) as dfr:
+          # Schemas are resolved when the file is opened:
+          self.assertEqual(min(i + 1, 2), len(compiled))
+          text = 'text%d' % i if i % 2 else ''
+          self.assertEqual([{'id': float(i), 'text': text}], list(dfr))
+    self.assertEqual(2, len(compiled))
+
+    with open(file_paths[0], 'rb') as reader:
+      self.assertRaises(
+          datafile.DataFileException, datafile.DataFileReader,
+          reader, io.DatumReader(), reader_schema=reader_schema,
+          projection=['id'])
+
+    # The reader schema replaces the projection of the datum reader:
+    with open(file_paths[0], 'rb') as reader:
+      with datafile.DataFileReader(
+          reader, io.DatumReader(projection=['text']),
+          reader_schema=reader_schema) as dfr:
+        self.assertIsNone(dfr.datum_reader.projection)
+        self.assertEqual([{'id': 0.0, 'text': ''}], list(dfr))
+
+  def testBatches(self):
+    file_path = self.NewTempFile()
+    writer_schema = schema.Parse('"long"')
+    with open(file_path, 'wb') as writer:
+      with datafile.DataFileWriter(
+          writer, io.DatumWriter(), writer_schema, block_records=40) as dfw:
+        for i in range(100):
+          dfw.append(i)
+
+    with open(file_path, 'rb') as reader:
+      with datafile.DataFileReader(reader, io.DatumReader()) as dfr:
+        self.assertEqual(
+            [list(range(0, 40)), list(range(40, 80)), list(range(80, 100))],
+            list(dfr.iter_batches()))
+        self.assertEqual([], list(dfr.iter_batches()))
+
+        dfr.seek(dfr.index[0].offset)
+        self.assertEqual(list(range(100)), dfr.read_all())
+
+        dfr.seek(dfr.index[0].offset)
+        self.assertEqual([0, 1], [next(dfr), next(dfr)])
+        batches = dfr.iter_batches()
+        self.assertEqual(list(range(2, 40)), next(batches))
+        self.assertEqual(list(range(40, 100)), dfr.read_all())
+
+    # Datum readers that override read() decode batches as iteration does:
+    class NegatingDatumReader(io.DatumReader):
+      def read(self, decoder):
+        return -super().read(decoder)
+    class NegatingDataReader(io.DatumReader):
+      def read_data(self, writer_schema, reader_schema, decoder):
+        datum = super().read_data(writer_schema, reader_schema, decoder)
+        return -datum if writer_schema.type == 'long' else datum
+    for datum_reader_class in [NegatingDatumReader, NegatingDataReader]:
+      for read in [list, lambda dfr: sum(dfr.iter_batches(), [])]:
+        with open(file_path, 'rb') as reader:
+          with datafile.DataFileReader(reader, datum_reader_class()) as dfr:
+            self.assertEqual([-i for i in range(100)], read(dfr))
+
+  def testColumns(self):
+    file_path = self.NewTempFile()
+    writer_schema = schema.Parse("""
+      {"type": "record", "name": "Test",
+       "fields": [{"name": "id", "type": "long"},
+                  {"name": "count", "type": "int"},
+                  {"name": "flag", "type": "boolean"},
+                  {"name": "value", "type": "double"},
+                  {"name": "ratio", "type": ["null", "float"]},
+                  {"name": "name", "type": "string"},
+                  {"name": "label", "type": ["string", "null"]},
+                  {"name": "tags", "type": {"type": "array", "items": "int"}}]}
+    """)
+    datums = [
+        {'id': i, 'count': -i, 'flag': i % 3 == 0, 'value': i / 4,
+         'ratio': None if i % 2 else i / 2, 'name': 'name%d' % i,
+         'label': None if i % 5 else 'label%d' % i, 'tags': [i] * (i % 3)}
+        for i in range(250)]
+    with open(file_path, 'wb') as writer:
+      with datafile.DataFileWriter(
+          writer, io.DatumWriter(), writer_schema, block_records=100) as dfw:
+        for datum in datums:
+          dfw.append(datum)
+
+    def AssertColumnsEqual(expected, column):
+      self.assertEqual(expected, list(column))
+
+    for use_numpy in [False, True] if io.has_numpy else [False]:
+      with open(file_path, 'rb') as reader:
+        with datafile.DataFileReader(reader, io.DatumReader()) as dfr:
+          blocks = list(dfr.iter_columns(use_numpy=use_numpy))
+          self.assertEqual([100, 100, 50], [len(b['id']) for b in blocks])
+
+          dfr.seek(dfr.index[0].offset)
+          columns = dfr.read_columns(use_numpy=use_numpy)
+          self.assertEqual(
+              [field.name for field in writer_schema.fields], list(columns))
+          for name in ['id', 'count', 'flag', 'value', 'name', 'tags']:
+            AssertColumnsEqual([d[name] for d in datums], columns[name])
+          for name in ['ratio', 'label']:
+            AssertColumnsEqual(
+                [d[name] is not None for d in datums], columns[name].valid)
+            AssertColumnsEqual(
+                [d[name] for d in datums if d[name] is not None],
+                [value for value, valid
+                 in zip(columns[name].values, columns[name].valid) if valid])
+          if use_numpy:
+            self.assertEqual(numpy.int64, columns['id'].dtype)
+            self.assertEqual(numpy.float32, columns['ratio'].values.dtype)
+          else:
+            self.assertIsInstance(columns['id'], array.array)
+            self.assertEqual('d', columns['value'].typecode)
+
+          dfr.seek(dfr.index[0].offset)
+          columns = dfr.read_columns(fields=['name', 'id'], use_numpy=use_numpy)
+          self.assertEqual(['name', 'id'], list(columns))
+          AssertColumnsEqual(list(range(250)), columns['id'])
+          self.assertEqual([], list(dfr.read_columns()['id']))
+
+  def testAppendColumns(self):
+    file_path = self.NewTempFile()
+    writer_schema = schema.Parse("""
+      {"type": "record", "name": "Test",
+       "fields": [{"name": "id", "type": "long"},
+                  {"name": "count", "type": "int"},
+                  {"name": "flag", "type": "boolean"},
+                  {"name": "value", "type": "double"},
+                  {"name": "ratio", "type": ["null", "float"]},
+                  {"name": "name", "type": "string"},
+                  {"name": "label", "type": ["bytes", "null"]},
+                  {"name": "tags", "type": {"type": "array", "items": "int"}},
+                  {"name": "kind", "type": {
+                    "type": "enum", "name": "Kind", "symbols": ["A", "B"]}}]}
+    """)
+    longs = [0, -1, 1, 63, -64, 64, 8191, 8192, -(1 << 40), (1 << 62),
+             io.LONG_MIN_VALUE, io.LONG_MAX_VALUE]
+    datums = [
+        {'id': longs[i % len(longs)] + (i // len(longs)),
+         'count': io.INT_MIN_VALUE if i == 7 else -i,
+         'flag': i % 3 == 0, 'value': i / 4,
+         'ratio': None if i % 2 else i / 2, 'name': 'name\u00e9%d' % i,
+         'label': None if i % 5 else b'label%d' % i, 'tags': [i] * (i % 3),
+         'kind': 'AB'[i % 2]}
+        for i in range(len(longs))]
+    datums += [dict(datum, id=i) for i, datum in enumerate(datums * 20)]
+    columns = {name: [datum[name] for datum in datums]
+               for name in writer_schema.field_map}
+
+    # NumPy columns are also encoded without NumPy:
+    column_sets = [(False, columns)]
+    if io.has_numpy:
+      numpy_columns = dict(
+          columns,
+          id=numpy.array(columns['id'], dtype=numpy.int64),
+          count=numpy.array(columns['count'], dtype=numpy.int32),
+          value=numpy.array(columns['value']),
+          flag=numpy.array(columns['flag']),
+          ratio=io.NullableColumn(
+              values=numpy.array([r or 0 for r in columns['ratio']]),
+              valid=numpy.array([r is not None for r in columns['ratio']])),
+      )
+      column_sets += [(False, numpy_columns), (True, numpy_columns)]
+    for use_numpy, columns in column_sets:
+      with open(file_path, 'wb') as writer:
+        with datafile.DataFileWriter(
+            writer, io.DatumWriter(), writer_schema, block_records=100) as dfw:
+          dfw.append(datums[0])
+          dfw.append_columns(columns, use_numpy=use_numpy)
+          dfw.append_columns(
+              {name: [] for name in columns}, use_numpy=use_numpy)
+          dfw.append(datums[1])
+
+      with open(file_path, 'rb') as reader:
+        with datafile.DataFileReader(reader, io.DatumReader()) as dfr:
+          self.assertEqual(datums[:1] + datums + datums[1:2], list(dfr))
+          self.assertEqual(
+              [100] * (len(datums) // 100) + [len(datums) % 100 + 2],
+              [entry.count for entry in dfr.BuildIndex()])
+
+      bad_columns = dict(columns, name=list(range(len(datums))))
+      with open(file_path, 'wb') as writer:
+        with datafile.DataFileWriter(
+            writer, io.DatumWriter(), writer_schema) as dfw:
+          with self.assertRaises(io.AvroTypeException) as context:
+            dfw.append_columns(bad_columns, use_numpy=use_numpy)
+          self.assertEqual('name[0]', context.exception.path)
+
+          bad_columns = {name: [datum[name] for datum in datums[:8]]
+                         for name in columns}
+          bad_columns['count'] = [0] * 3 + [1 << 31] * 5
+          with self.assertRaises(io.AvroTypeException) as context:
+            dfw.append_columns(bad_columns, use_numpy=use_numpy)
+          self.assertEqual('count[3]', context.exception.path)
+
+          # Invalid values are reported at their row, whatever their type:
+          for name, bad_value, row in [('id', None, 2), ('id', 'x', 5),
+                                       ('id', 1 << 70, 7), ('value', 'x', 4),
+                                       ('flag', None, 6), ('ratio', 'x', 2),
+                                       ('ratio', 1e39, 3)]:
+            column = [datum[name] for datum in datums[:8]]
+            column[row] = bad_value
+            with self.assertRaises(io.AvroTypeException) as context:
+              dfw.append_columns(
+                  dict(bad_columns, count=[0] * 8, **{name: column}),
+                  use_numpy=use_numpy)
+            self.assertEqual('%s[%d]' % (name, row), context.exception.path)
+
+  def testSeekAndSync(self):
+    file_path = self.NewTempFile()
+    writer_schema = schema.Parse('"long"')
+    positions = []
+    with open(file_path, 'wb') as writer:
+      with datafile.DataFileWriter(
+          writer, io.DatumWriter(), writer_schema, codec='deflate') as dfw:
+        for block in range(10):
+          positions.append(dfw.sync())
+          for i in range(100):
+            dfw.append(block * 100 + i)
+    file_length = os.path.getsize(file_path)
+
+    with open(file_path, 'rb') as reader:
+      with datafile.DataFileReader(reader, io.DatumReader()) as dfr:
+        dfr.seek(positions[3])
+        self.assertEqual(300, next(dfr))
+        self.assertEqual(301, next(dfr))
+        dfr.seek(positions[1])
+        self.assertEqual(list(range(100, 1000)), list(dfr))
+
+        # Syncing from a block position moves to the next block:
+        dfr.sync(positions[2])
+        self.assertEqual(300, next(dfr))
+        dfr.sync(positions[2] - datafile.SYNC_SIZE)
+        self.assertEqual(200, next(dfr))
+        dfr.sync(0)
+        self.assertEqual(0, next(dfr))
+        dfr.sync(positions[-1] + 1)
+        self.assertRaises(StopIteration, next, dfr)
+
+        # Splits read every datum exactly once:
+        for nsplits in [1, 2, 3, 7, 50]:
+          bounds = [file_length * n // nsplits for n in range(nsplits + 1)]
+          datums = []
+          for start, end in zip(bounds, bounds[1:]):
+            dfr.sync(start)
+            while not dfr.past_sync(end):
+              datums.append(next(dfr))
+          self.assertEqual(list(range(1000)), datums)
+
+  def testBlockIndex(self):
+    file_path = self.NewTempFile()
+    index_path = file_path + datafile.INDEX_FILE_SUFFIX
+    writer_schema = schema.Parse("""
+      {"type": "record", "name": "Test",
+       "fields": [{"name": "id", "type": "long"},
+                  {"name": "text", "type": "string"}]}
+    """)
+    for codec in CODECS_TO_VALIDATE:
+      with open(file_path, 'wb') as writer:
+        with datafile.DataFileWriter(
+            writer, io.DatumWriter(), writer_schema, codec=codec) as dfw:
+          for i in range(1000):
+            dfw.append({'id': i, 'text': 'text%d' % i})
+            if i % 70 == 69:
+              dfw.sync()
+
+      with open(file_path, 'rb') as reader:
+        dfr = datafile.DataFileReader(reader, io.DatumReader())
+        decompress = datafile.GetCodec(codec).decompress
+        block_sizes = [len(decompress(block.data)) for block in dfr.blocks()]
+        index = dfr.BuildIndex()
+        self.assertEqual(15, len(index))
+        self.assertEqual(0, index[0].first_record)
+        self.assertEqual(70, index[1].first_record)
+        self.assertEqual(1000, index[-1].first_record + index[-1].count)
+        if codec == 'null':
+          self.assertEqual(index[0].compressed_size,
+                           index[0].uncompressed_size)
+          self.assertEqual(
+              block_sizes, [entry.compressed_size for entry in index])
+        else:
+          self.assertIsNone(index[0].uncompressed_size)
+        self.assertEqual(
+            block_sizes,
+            [entry.uncompressed_size
+             for entry in dfr.BuildIndex(uncompressed_sizes=True)])
+        with open(index_path, 'wb') as writer:
+          datafile.WriteIndex(writer, index, dfr.sync_marker)
+
+      with open(file_path, 'rb') as reader, open(index_path, 'rb') as index:
+        with datafile.DataFileReader(
+            reader, io.DatumReader(), index=index) as dfr:
+          self.assertEqual(1000, dfr.count())
+          self.assertEqual({'id': 0, 'text': 'text0'}, dfr[0])
+          self.assertEqual({'id': 123, 'text': 'text123'}, dfr[123])
+          self.assertEqual({'id': 124, 'text': 'text124'}, next(dfr))
+          self.assertEqual({'id': 999, 'text': 'text999'}, dfr[-1])
+          self.assertRaises(IndexError, dfr.__getitem__, 1000)
+          self.assertEqual(
+              list(range(135, 285)),
+              [datum['id'] for datum in dfr.records(135, 285)])
+          self.assertEqual(
+              list(range(990, 1000)),
+              [datum['id'] for datum in dfr.records(990, 2000)])
+          self.assertEqual([], list(dfr.records(500, 500)))
+
+    # An index only applies to the data file it was built for:
+    with open(file_path, 'wb') as writer:
+      with datafile.DataFileWriter(
+          writer, io.DatumWriter(), writer_schema) as dfw:
+        dfw.append({'id': 0, 'text': 'text0'})
+    with open(file_path, 'rb') as reader, open(index_path, 'rb') as index:
+      self.assertRaises(
+          datafile.DataFileException,
+          datafile.DataFileReader, reader, io.DatumReader(), index=index)
+
+  def testCodecRegistry(self):
+    file_path = self.NewTempFile()
+    writer_schema = schema.Parse('"string"')
+    datums = ['datum%d' % i for i in range(100)]
+
+    calls = []
+    def Compress(data, suffix=b''):
+      calls.append(suffix)
+      return bytes(reversed(bytes(data))) + suffix
+    def Decompress(data):
+      return bytes(reversed(data[:-1]))
+    valid_codecs = datafile.VALID_CODECS
+    datafile.RegisterCodec('test-reversed', Compress, Decompress)
+    self.addCleanup(datafile.UnregisterCodec, 'test-reversed')
+    self.assertIn('test-reversed', valid_codecs)
+
+    with open(file_path, 'wb') as writer:
+      with datafile.DataFileWriter(
+          writer, io.DatumWriter(), writer_schema, codec='test-reversed',
+          codec_options={'suffix': b'!'}) as dfw:
+        for datum in datums:
+          dfw.append(datum)
+    self.assertEqual([b'!'], calls)
+
+    with open(file_path, 'rb') as reader:
+      with datafile.DataFileReader(reader, io.DatumReader()) as dfr:
+        self.assertEqual('test-reversed', dfr.codec)
+        self.assertEqual(datums, list(dfr))
+
+    # Codecs that take no options ignore them:
+    for codec in ['null', 'snappy', 'deflate', 'bzip2', 'xz', 'zstandard']:
+      if codec not in datafile.VALID_CODECS:
+        continue
+      with open(file_path, 'wb') as writer:
+        with datafile.DataFileWriter(
+            writer, io.DatumWriter(), writer_schema, codec=codec,
+            codec_options={'level': 1}) as dfw:
+          for datum in datums:
+            dfw.append(datum)
+      with open(file_path, 'rb') as reader:
+        with datafile.DataFileReader(reader, io.DatumReader()) as dfr:
+          self.assertEqual(datums, list(dfr))
+
+    with open(file_path, 'wb') as writer:
+      self.assertRaises(
+          datafile.DataFileException, datafile.DataFileWriter,
+          writer, io.DatumWriter(), writer_schema, codec='unknown')
+    self.assertRaises(
+        datafile.DataFileException, datafile.UnregisterCodec, 'unknown')
+
+  def testBlockSizing(self):
+    file_path = self.NewTempFile()
+    writer_schema = schema.Parse("""
+      {"type": "record", "name": "Test",
+       "fields": [{"name": "id", "type": "long"},
+                  {"name": "text", "type": "string"}]}
+    """)
+    datums = [{'id': i, 'text': 'text%d ' % i * 5} for i in range(5000)]
+
+    def WriteIndex(codec='null', **kwargs):
+      with open(file_path, 'wb') as writer:
+        with datafile.DataFileWriter(
+            writer, io.DatumWriter(), writer_schema, codec=codec,
+            **kwargs) as dfw:
+          for datum in datums:
+            dfw.append(datum)
+      with open(file_path, 'rb') as reader:
+        with datafile.DataFileReader(reader, io.DatumReader()) as dfr:
+          self.assertEqual(datums, list(dfr))
+          return dfr.BuildIndex()
+
+    index = WriteIndex(block_size=1000)
+    self.assertTrue(all(1000 <= entry.uncompressed_size < 1100
+                        for entry in index[:-1]))
+
+    index = WriteIndex(block_size=10 ** 9, block_records=300)
+    self.assertEqual([300] * 16 + [200], [entry.count for entry in index])
+
+    # The first blocks are written before the compression ratio is known:
+    index = WriteIndex(codec='deflate', compressed_block_size=4096)
+    self.assertLess(4, len(index))
+    self.assertTrue(all(2048 <= entry.compressed_size <= 8192
+                        for entry in index[2:-1]))
+
+    with open(file_path, 'wb') as writer:
+      self.assertRaises(
+          datafile.DataFileException, datafile.DataFileWriter,
+          writer, io.DatumWriter(), writer_schema, block_records=0)
+
+  def testRawBlocks(self):
+    writer_schema = schema.Parse('"long"')
+    paths = [self.NewTempFile() for _ in range(3)]
+    for n, path in enumerate(paths):
+      with open(path, 'wb') as writer:
+        with datafile.DataFileWriter(
+            writer, io.DatumWriter(), writer_schema, codec='deflate') as dfw:
+          for i in range(100):
+            dfw.append(n * 100 + i)
+            if i % 30 == 29:
+              dfw.sync()
+
+    concat_path = self.NewTempFile()
+    with open(concat_path, 'wb') as writer:
+      with datafile.DataFileWriter(
+          writer, io.DatumWriter(), writer_schema, codec='deflate') as dfw:
+        dfw.append(-1)
+        for path in paths:
+          with open(path, 'rb') as reader:
+            with datafile.DataFileReader(reader, io.DatumReader()) as dfr:
+              blocks = list(dfr.blocks())
+              self.assertEqual([30, 30, 30, 10],
+                               [block.count for block in blocks])
+              self.assertEqual(
+                  [entry.offset for entry in dfr.BuildIndex()],
+                  [block.offset for block in blocks])
+              for block in blocks:
+                dfw.append_block(block)
+        dfw.append(300)
+
+    with open(concat_path, 'rb') as reader:
+      with datafile.DataFileReader(reader, io.DatumReader()) as dfr:
+        self.assertEqual(list(range(-1, 301)), list(dfr))
+
+        dfr.seek(0)
+        dfr.sync(0)
+        self.assertEqual(-1, next(dfr))
+        self.assertEqual(
+            [30, 30, 30, 10] * 3 + [1], [block.count for block in dfr.blocks()])
+
+    with open(paths[0], 'rb') as reader:
+      with datafile.DataFileReader(reader, io.DatumReader()) as dfr:
+        block = next(dfr.blocks())
+    for other_schema, codec in [('"long"', 'null'), ('"int"', 'deflate')]:
+      with open(concat_path, 'wb') as writer:
+        with datafile.DataFileWriter(
+            writer, io.DatumWriter(), schema.Parse(other_schema),
+            codec=codec) as dfw:
+          self.assertRaises(
+              datafile.DataFileException, dfw.append_block, block)
+
+  def testCompressionThreads(self):
+    writer_schema = schema.Parse("""
+      {"type": "record", "name": "Test",
+       "fields": [{"name": "id", "type": "long"},
+                  {"name": "text", "type": "string"}]}
+    """)
+    # Enough data for more blocks than can be pending at once:
+    expected = [{'id': i, 'text': 'text%d ' % i * 20} for i in range(5000)]
+    for codec in CODECS_TO_VALIDATE:
+      file_path = self.NewTempFile()
+      with open(file_path, 'wb') as writer:
+        with datafile.DataFileWriter(
+            writer, io.DatumWriter(), writer_schema, codec=codec,
+            compression_threads=2) as dfw:
+          for datum in expected:
+            if datum['id'] == 2100:
+              position = dfw.sync()
+            dfw.append(datum)
+
+      with open(file_path, 'rb') as reader:
+        with datafile.DataFileReader(reader, io.DatumReader()) as dfr:
+          self.assertLess(20, len(dfr.index))
+          self.assertEqual(expected, list(dfr))
+          dfr.seek(position)
+          self.assertEqual(expected[2100], next(dfr))
+
+  def testPrefetch(self):
+    file_path = self.NewTempFile()
+    writer_schema = schema.Parse('"long"')
+    positions = []
+    with open(file_path, 'wb') as writer:
+      with datafile.DataFileWriter(
+          writer, io.DatumWriter(), writer_schema, codec='deflate') as dfw:
+        for i in range(1000):
+          if i % 50 == 0:
+            positions.append(dfw.sync())
+          dfw.append(i)
+
+    with open(file_path, 'rb') as reader:
+      with datafile.DataFileReader(
+          reader, io.DatumReader(), prefetch_blocks=3) as dfr:
+        self.assertEqual(list(range(1000)), list(dfr))
+        self.assertTrue(dfr.is_EOF())
+
+        dfr.seek(positions[2])
+        self.assertEqual(list(range(100, 175)), [next(dfr) for _ in range(75)])
+        self.assertEqual(20, len(dfr.BuildIndex()))
+        self.assertEqual(175, next(dfr))
+        self.assertEqual(160, dfr[160])
+        self.assertEqual(list(range(450, 520)), list(dfr.records(450, 520)))
+
+        datums = []
+        for start, end in [(0, positions[7]), (positions[7], None)]:
+          dfr.sync(start)
+          while end is None or not dfr.past_sync(end):
+            try:
+              datums.append(next(dfr))
+            except StopIteration:
+              break
+        self.assertEqual(list(range(1000)), datums)
+
+  def testStreaming(self):
+    file_path = self.NewTempFile()
+    writer_schema = schema.Parse("""
+      {"type": "record", "name": "Test",
+       "fields": [{"name": "id", "type": "long"},
+                  {"name": "text", "type": "string"}]}
+    """)
+    expected = [{'id': i, 'text': 'text%d ' % i * 10} for i in range(3000)]
+    for codec in CODECS_TO_VALIDATE:
+      with open(file_path, 'wb') as writer:
+        with datafile.DataFileWriter(
+            writer, io.DatumWriter(), writer_schema, codec=codec) as dfw:
+          for datum in expected:
+            dfw.append(datum)
+      with open(file_path, 'rb') as reader:
+        data = reader.read()
+        index = datafile.DataFileReader(reader, io.DatumReader()).index
+      self.assertLess(3, len(index))
+
+      for prefetch_blocks in [0, 2]:
+        read_fd, write_fd = os.pipe()
+        def WritePipe():
+          with open(write_fd, 'wb') as writer:
+            # Write in small pieces, for the reader to see short reads:
+            for start in range(0, len(data), 1000):
+              writer.write(data[start:start + 1000])
+              writer.flush()
+        thread = threading.Thread(target=WritePipe)
+        thread.start()
+        with open(read_fd, 'rb', buffering=0) as reader:
+          with datafile.DataFileReader(
+              reader, io.DatumReader(),
+              prefetch_blocks=prefetch_blocks) as dfr:
+            self.assertIsNone(dfr.file_length)
+            self.assertEqual(expected[:10], [next(dfr) for _ in range(10)])
+            # Resume with the block following the next sync marker, even
+            # though blocks were read ahead past it:
+            dfr.sync(index[1].offset)
+            read = [next(dfr)]
+            self.assertEqual(expected[index[2].first_record], read[0])
+            while read[-1] != expected[-1]:
+              read.append(next(dfr))
+            self.assertEqual(expected[-len(read):], read)
+            self.assertTrue(dfr.is_EOF())
+            self.assertEqual([], list(dfr))
+        thread.join()
+
+    # Positions are reported as the number of bytes consumed:
+    with open(file_path, 'rb') as reader:
+      with datafile.DataFileReader(reader, io.DatumReader()) as dfr:
+        offsets = [entry.offset for entry in dfr.BuildIndex()]
+    with open(file_path, 'rb') as reader:
+      with datafile.DataFileReader(
+          reader, io.DatumReader(), streaming=True) as dfr:
+        self.assertEqual(offsets, [block.offset for block in dfr.blocks()])
+        self.assertEqual(len(data), dfr.reader.tell())
+        self.assertRaises(OSError, dfr.seek, offsets[0])
+        for operation in [dfr.BuildIndex, dfr.count, lambda: dfr[0],
+                          lambda: list(dfr.records(0, 1)),
+                          lambda: dfr.index]:
+          self.assertRaises(datafile.DataFileException, operation)
+
+    # Inputs that do not report whether they are seekable are read with
+    # seek() and tell():
+    class Reader(object):
+      def __init__(self, reader):
+        self.read = reader.read
+        self.seek = reader.seek
+        self.tell = reader.tell
+    with open(file_path, 'rb') as reader:
+      dfr = datafile.DataFileReader(Reader(reader), io.DatumReader())
+      self.assertEqual(len(data), dfr.file_length)
+      self.assertEqual(offsets, [entry.offset for entry in dfr.index])
+
+  def testParallelScan(self):
+    file_path = self.NewTempFile()
+    writer_schema = schema.Parse("""
+      {"type": "record", "name": "Test",
+       "fields": [{"name": "id", "type": "long"},
+                  {"name": "text", "type": "string"}]}
+    """)
+    with open(file_path, 'wb') as writer:
+      with datafile.DataFileWriter(
+          writer, io.DatumWriter(), writer_schema, codec='deflate') as dfw:
+        for i in range(1000):
+          dfw.append({'id': i, 'text': 'text%d' % i})
+          if i % 30 == 29:
+            dfw.sync()
+    expected = [{'id': i, 'text': 'text%d' % i} for i in range(1000)]
+
+    for split_size in [100, 1000, 1000000]:
+      self.assertEqual(expected, list(datafile.ParallelScan(
+          file_path, processes=3, split_size=split_size)))
+
+    ids = datafile.ParallelScan(
+        file_path, function=operator.itemgetter('id'), ordered=False,
+        processes=3, split_size=500)
+    self.assertEqual(list(range(1000)), sorted(ids))
+
+    # Tight bounds on the buffered results do not stall the scan:
+    for ordered in (True, False):
+      ids = datafile.ParallelScan(
+          file_path, function=operator.itemgetter('id'), ordered=ordered,
+          processes=3, split_size=100, max_splits=1, queue_size=1)
+      self.assertEqual(list(range(1000)), sorted(ids))
+
+    # Nor does shutting the pool down while workers wait on a full queue,
+    # after an error or when the consumer stops early:
+    for _ in range(20):
+      for ordered in (True, False):
+        ids = datafile.ParallelScan(
+            file_path, function=operator.itemgetter('id'), ordered=ordered,
+            processes=3, split_size=100, queue_size=1)
+        self.assertEqual(list(range(1000)), sorted(ids))
+        ids = datafile.ParallelScan(
+            file_path, function=operator.itemgetter('id'), ordered=ordered,
+            processes=3, split_size=100, queue_size=1)
+        self.assertEqual(3, len([next(ids) for _ in range(3)]))
+        ids.close()
+        with self.assertRaises(KeyError):
+          list(datafile.ParallelScan(
+              file_path, function=operator.itemgetter('missing'),
+              ordered=ordered, processes=3, split_size=100, queue_size=1))
+
+    block_sizes = datafile.ParallelScan(
+        file_path, function=len, per_block=True, processes=2, split_size=500)
+    self.assertEqual([30] * 33 + [10], list(block_sizes))
+
+    self.assertEqual(
+        [{'id': i} for i in range(1000)],
+        list(datafile.ParallelScan(
+            file_path, processes=2, projection=['id'], split_size=700)))
+
+    # Errors of the worker processes are raised:
+    with self.assertRaises(KeyError):
+      list(datafile.ParallelScan(
+          file_path, function=operator.itemgetter('missing'), processes=2,
+          split_size=500))
+
 
 # ------------------------------------------------------------------------------
 
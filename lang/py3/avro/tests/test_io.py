@@ -18,15 +18,21 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import array
 import binascii
+import gc
 import io
 import logging
 import sys
 import unittest
+import weakref
 
 from avro import io as avro_io
 from avro import schema
 
+if avro_io.has_numpy:
+  import numpy
+
 
 SCHEMAS_TO_VALIDATE = (
   ('"null"', None),
@@ -204,6 +210,13 @@ class TestIO(unittest.TestCase):
       if validated: passed += 1
     self.assertEqual(passed, len(SCHEMAS_TO_VALIDATE))
 
+  def testCompileValidator(self):
+    for example_schema, datum in SCHEMAS_TO_VALIDATE:
+      logging.debug('Schema: %r', example_schema)
+      validator = avro_io.CompileValidator(schema.Parse(example_schema))
+      self.assertTrue(validator(datum))
+      self.assertFalse(validator(object()))
+
   def testRoundTrip(self):
     correct = 0
     for example_schema, datum in SCHEMAS_TO_VALIDATE:
@@ -218,6 +231,59 @@ class TestIO(unittest.TestCase):
       if datum == round_trip_datum: correct += 1
     self.assertEqual(correct, len(SCHEMAS_TO_VALIDATE))
 
+  def testBufferDecoderRoundTrip(self):
+    for example_schema, datum in SCHEMAS_TO_VALIDATE:
+      logging.debug('Schema: %s', example_schema)
+      writer_schema = schema.Parse(example_schema)
+      writer, encoder, datum_writer = write_datum(datum, writer_schema)
+      datum_writer.write(datum, encoder)
+
+      # Decode from a memoryview, starting after some leading padding:
+      buffer = memoryview(b'\xff\xff' + writer.getvalue())
+      decoder = avro_io.BufferDecoder(buffer, offset=2)
+      datum_reader = avro_io.DatumReader(writer_schema)
+      self.assertEqual(datum, datum_reader.read(decoder))
+      self.assertEqual(datum, datum_reader.read(decoder))
+      self.assertEqual(0, decoder.remaining)
+      self.assertEqual(len(buffer), decoder.tell())
+
+  def testBufferDecoderSkip(self):
+    writer_schema = LONG_RECORD_SCHEMA
+    writer, encoder, datum_writer = write_datum(LONG_RECORD_DATUM, writer_schema)
+    encoder.write_utf8('skipped')
+    encoder.write_double(1.5)
+    encoder.write_long(-8193)
+
+    decoder = avro_io.BufferDecoder(writer.getvalue())
+    avro_io.DatumReader(writer_schema).skip_data(writer_schema, decoder)
+    decoder.skip_utf8()
+    decoder.skip_double()
+    self.assertEqual(-8193, decoder.read_long())
+    self.assertEqual(0, decoder.remaining)
+
+  def testBufferEncoder(self):
+    for example_schema, datum in SCHEMAS_TO_VALIDATE:
+      logging.debug('Schema: %s', example_schema)
+      writer_schema = schema.Parse(example_schema)
+      writer, encoder, datum_writer = write_datum(datum, writer_schema)
+
+      buffer_encoder = avro_io.BufferEncoder()
+      datum_writer.write(datum, buffer_encoder)
+      self.assertEqual(writer.getvalue(), buffer_encoder.getvalue())
+      with buffer_encoder.getbuffer() as view:
+        self.assertEqual(writer.getvalue(), view)
+      buffer_encoder.truncate()
+      self.assertEqual(0, len(buffer_encoder))
+
+    buffer_encoder = avro_io.BufferEncoder()
+    for value in (0.0, -1.5, 0.25):
+      buffer_encoder.write_float(value)
+      buffer_encoder.write_double(value)
+    decoder = avro_io.BinaryDecoder(io.BytesIO(buffer_encoder.getvalue()))
+    for value in (0.0, -1.5, 0.25):
+      self.assertEqual(value, decoder.read_float())
+      self.assertEqual(value, decoder.read_double())
+
   #
   # BINARY ENCODING OF INT AND LONG
   #
@@ -275,6 +341,19 @@ class TestIO(unittest.TestCase):
     datum_reader = avro_io.DatumReader(writer_schema, reader_schema)
     self.assertRaises(avro_io.SchemaResolutionException, datum_reader.read, decoder)
 
+  def testEnumResolution(self):
+    writer_schema = schema.Parse("""\
+      {"type": "enum", "name": "Test",
+       "symbols": ["FOO", "BAR", "BAZ"]}""")
+    reader_schema = schema.Parse("""\
+      {"type": "enum", "name": "Test",
+       "symbols": ["BAR", "BAZ", "QUX"]}""")
+    datum_reader = avro_io.DatumReader(writer_schema, reader_schema)
+    for symbol in ('BAR', 'BAZ'):
+      writer, encoder, datum_writer = write_datum(symbol, writer_schema)
+      decoder = avro_io.BufferDecoder(writer.getvalue())
+      self.assertEqual(symbol, datum_reader.read(decoder))
+
   def testDefaultValue(self):
     writer_schema = LONG_RECORD_SCHEMA
     datum_to_write = LONG_RECORD_DATUM
@@ -293,6 +372,32 @@ class TestIO(unittest.TestCase):
       if datum_to_read == datum_read: correct += 1
     self.assertEqual(correct, len(DEFAULT_VALUE_EXAMPLES))
 
+  def testDefaultValuesAreNotShared(self):
+    writer_schema = LONG_RECORD_SCHEMA
+    reader_schema = schema.Parse("""\
+      {"type": "record", "name": "Test",
+       "fields": [
+         {"name": "A", "type": "int"},
+         {"name": "H", "type": "string", "default": "h"},
+         {"name": "I", "type": {"type": "array", "items": "int"},
+          "default": [1, 2]},
+         {"name": "J", "type": {"type": "map", "values": {
+           "type": "array", "items": "int"}}, "default": {"a": [3]}}]}""")
+    writer, encoder, datum_writer = write_datum(LONG_RECORD_DATUM, writer_schema)
+    datum_writer.write(LONG_RECORD_DATUM, encoder)
+
+    decoder = avro_io.BufferDecoder(writer.getvalue())
+    datum_reader = avro_io.DatumReader(writer_schema, reader_schema)
+    first = datum_reader.read(decoder)
+    second = datum_reader.read(decoder)
+    expected = {'A': 1, 'H': 'h', 'I': [1, 2], 'J': {'a': [3]}}
+    self.assertEqual(expected, first)
+    self.assertEqual(expected, second)
+
+    first['I'].append(3)
+    first['J']['a'].append(4)
+    self.assertEqual(expected, second)
+
   def testNoDefaultValue(self):
     writer_schema = LONG_RECORD_SCHEMA
     datum_to_write = LONG_RECORD_DATUM
@@ -322,6 +427,32 @@ class TestIO(unittest.TestCase):
     logging.debug('Datum Read: %s', datum_read)
     self.assertEqual(datum_to_read, datum_read)
 
+  def testProjectionSkipsFields(self):
+    writer_schema = schema.Parse("""\
+      {"type": "record", "name": "Test",
+       "fields": [
+         {"name": "A", "type": "int"},
+         {"name": "B", "type": "double"},
+         {"name": "C", "type": {"type": "fixed", "name": "F", "size": 3}},
+         {"name": "D", "type": {"type": "array", "items": "double"}},
+         {"name": "E", "type": {"type": "record", "name": "P", "fields": [
+           {"name": "x", "type": "float"}, {"name": "y", "type": "string"}]}},
+         {"name": "G", "type": "string"}]}""")
+    datum = {
+        'A': 1, 'B': 2.5, 'C': b'abc', 'D': [1.0, 2.0, 3.0],
+        'E': {'x': 0.5, 'y': 'why'}, 'G': 'gee',
+    }
+    writer, encoder, datum_writer = write_datum(datum, writer_schema)
+    datum_writer.write(datum, encoder)
+
+    datum_reader = avro_io.DatumReader(projection=['E.y', 'A', 'G'])
+    datum_reader.writer_schema = writer_schema
+    decoder = avro_io.BufferDecoder(writer.getvalue())
+    expected = {'A': 1, 'E': {'y': 'why'}, 'G': 'gee'}
+    self.assertEqual(expected, datum_reader.read(decoder))
+    self.assertEqual(expected, datum_reader.read(decoder))
+    self.assertEqual(0, decoder.remaining)
+
   def testFieldOrder(self):
     writer_schema = LONG_RECORD_SCHEMA
     datum_to_write = LONG_RECORD_DATUM
@@ -337,6 +468,162 @@ class TestIO(unittest.TestCase):
     logging.debug('Datum Read: %s', datum_read)
     self.assertEqual(datum_to_read, datum_read)
 
+  def testReadPlanCache(self):
+    writer_schema = LONG_RECORD_SCHEMA
+    reader_schema = schema.Parse("""\
+      {"type": "record", "name": "Test",
+       "fields": [{"name": "E", "type": "long"},
+                  {"name": "H", "type": "double", "default": 1.5}]}""")
+    writer, encoder, datum_writer = write_datum(LONG_RECORD_DATUM, writer_schema)
+    datum_writer.write(LONG_RECORD_DATUM, encoder)
+
+    decoder = avro_io.BinaryDecoder(io.BytesIO(writer.getvalue()))
+    datum_reader = avro_io.DatumReader(writer_schema, reader_schema)
+    plan = datum_reader.read_plan
+    self.assertEqual({'E': 5, 'H': 1.5}, datum_reader.read(decoder))
+    self.assertEqual({'E': 5, 'H': 1.5}, datum_reader.read(decoder))
+    self.assertIs(plan, datum_reader.read_plan)
+
+    # Changing either schema invalidates the plan:
+    datum_reader.reader_schema = writer_schema
+    self.assertIsNot(plan, datum_reader.read_plan)
+
+  def testReadPlanPromotesToFloat(self):
+    writer_schema = schema.Parse('"int"')
+    reader_schema = schema.Parse('["null", "double"]')
+    writer, encoder, datum_writer = write_datum(219, writer_schema)
+    datum_read = read_datum(writer, writer_schema, reader_schema)
+    self.assertEqual(219.0, datum_read)
+    self.assertIsInstance(datum_read, float)
+
+    # read_data() promotes as the read plans do:
+    for ws, rs in [('"int"', '"float"'), ('"int"', '"double"'),
+                   ('"long"', '"float"'), ('"long"', '"double"'),
+                   ('"int"', '["null", "double"]')]:
+      writer_schema = schema.Parse(ws)
+      reader_schema = schema.Parse(rs)
+      writer, encoder, datum_writer = write_datum(219, writer_schema)
+      datum_reader = avro_io.DatumReader(writer_schema, reader_schema)
+      for datum_read in [
+          datum_reader.read(avro_io.BufferDecoder(writer.getvalue())),
+          datum_reader.read_data(
+              writer_schema, reader_schema,
+              avro_io.BufferDecoder(writer.getvalue()))]:
+        self.assertEqual(219.0, datum_read)
+        self.assertIsInstance(datum_read, float)
+
+  def testReadPlanDoesNotKeepReader(self):
+    writer_schema = schema.Parse("""\
+      {"type": "record", "name": "Node",
+       "fields": [{"name": "A", "type": "int"},
+                  {"name": "B", "type": {"type": "array", "items": "Node"}}]}""")
+    reader_schema = schema.Parse("""\
+      {"type": "record", "name": "Node",
+       "fields": [{"name": "B", "type": {"type": "array", "items": "Node"}},
+                  {"name": "C", "type": "double", "default": 1.5}]}""")
+    writer, encoder, datum_writer = write_datum(
+        {'A': 1, 'B': [{'A': 2, 'B': []}]}, writer_schema)
+    datum_reader = avro_io.DatumReader(writer_schema, reader_schema)
+    self.assertEqual(
+        {'B': [{'B': [], 'C': 1.5}], 'C': 1.5},
+        datum_reader.read(avro_io.BufferDecoder(writer.getvalue())))
+
+    # The plan is still cached, but no longer refers to the reader:
+    reader_ref = weakref.ref(datum_reader)
+    del datum_reader
+    gc.collect()
+    self.assertIsNone(reader_ref())
+
+  def testReadPlanHonorsOverrides(self):
+    writer_schema = schema.Parse("""\
+      {"type": "record", "name": "Test",
+       "fields": [{"name": "A", "type": "int"},
+                  {"name": "B", "type": {"type": "array", "items": "Test"}}]}""")
+    class TaggingDatumReader(avro_io.DatumReader):
+      def read_record(self, writer_schema, reader_schema, decoder):
+        record = super().read_record(writer_schema, reader_schema, decoder)
+        record['tag'] = writer_schema.name
+        return record
+    writer, encoder, datum_writer = write_datum(
+        {'A': 1, 'B': [{'A': 2, 'B': []}]}, writer_schema)
+    datum_reader = TaggingDatumReader(writer_schema)
+    self.assertFalse(datum_reader.uses_read_plan)
+    self.assertEqual(
+        {'A': 1, 'B': [{'A': 2, 'B': [], 'tag': 'Test'}], 'tag': 'Test'},
+        datum_reader.read(avro_io.BufferDecoder(writer.getvalue())))
+    self.assertTrue(avro_io.DatumReader(writer_schema).uses_read_plan)
+
+  def testReadPlanDefersResolutionErrors(self):
+    writer_schema = schema.Parse('["null", "string"]')
+    reader_schema = schema.Parse('"string"')
+    datum_reader = avro_io.DatumReader(writer_schema, reader_schema)
+
+    writer, encoder, datum_writer = write_datum('foo', writer_schema)
+    decoder = avro_io.BinaryDecoder(io.BytesIO(writer.getvalue()))
+    self.assertEqual('foo', datum_reader.read(decoder))
+
+    writer, encoder, datum_writer = write_datum(None, writer_schema)
+    decoder = avro_io.BinaryDecoder(io.BytesIO(writer.getvalue()))
+    self.assertRaises(
+        avro_io.SchemaResolutionException, datum_reader.read, decoder)
+
+  def testReadPlanDefersDefaultValueErrors(self):
+    writer_schema = schema.Parse("""\
+      ["null", {"type": "record", "name": "Test",
+                "fields": [{"name": "A", "type": "int"}]}]""")
+    reader_schema = schema.Parse("""\
+      ["null", {"type": "record", "name": "Test",
+                "fields": [{"name": "A", "type": "int"},
+                           {"name": "B", "type": "int", "default": "x"}]}]""")
+    datum_reader = avro_io.DatumReader(writer_schema, reader_schema)
+    self.assertIsNotNone(datum_reader.read_plan)
+
+    writer, encoder, datum_writer = write_datum(None, writer_schema)
+    decoder = avro_io.BinaryDecoder(io.BytesIO(writer.getvalue()))
+    self.assertIsNone(datum_reader.read(decoder))
+
+    writer, encoder, datum_writer = write_datum({'A': 1}, writer_schema)
+    decoder = avro_io.BinaryDecoder(io.BytesIO(writer.getvalue()))
+    self.assertRaises(ValueError, datum_reader.read, decoder)
+
+  def testWritePlanCache(self):
+    writer_schema = LONG_RECORD_SCHEMA
+    datum_writer = avro_io.DatumWriter(writer_schema)
+    plan = datum_writer.write_plan
+    writer = io.BytesIO()
+    encoder = avro_io.BinaryEncoder(writer)
+    datum_writer.write(LONG_RECORD_DATUM, encoder)
+    datum_writer.write(LONG_RECORD_DATUM, encoder)
+    self.assertIs(plan, datum_writer.write_plan)
+
+    decoder = avro_io.BinaryDecoder(io.BytesIO(writer.getvalue()))
+    datum_reader = avro_io.DatumReader(writer_schema)
+    self.assertEqual(LONG_RECORD_DATUM, datum_reader.read(decoder))
+    self.assertEqual(LONG_RECORD_DATUM, datum_reader.read(decoder))
+
+    datum_writer.writer_schema = schema.Parse('"int"')
+    self.assertIsNot(plan, datum_writer.write_plan)
+
+  def testWritePlanHonorsOverrides(self):
+    writer_schema = LONG_RECORD_SCHEMA
+    class DoublingDatumWriter(avro_io.DatumWriter):
+      def write_record(self, writer_schema, datum, encoder):
+        super().write_record(
+            writer_schema, {name: 2 * value for name, value in datum.items()},
+            encoder)
+    for validate_inline in (False, True):
+      datum_writer = DoublingDatumWriter(
+          writer_schema, validate_inline=validate_inline)
+      encoder = avro_io.BufferEncoder()
+      datum_writer.write(LONG_RECORD_DATUM, encoder)
+      datum_reader = avro_io.DatumReader(writer_schema)
+      self.assertEqual(
+          {name: 2 * value for name, value in LONG_RECORD_DATUM.items()},
+          datum_reader.read(avro_io.BufferDecoder(encoder.getvalue())))
+      self.assertRaises(
+          avro_io.AvroTypeException,
+          datum_writer.write, {'A': 'x'}, avro_io.BufferEncoder())
+
   def testTypeException(self):
     writer_schema = schema.Parse("""\
       {"type": "record", "name": "Test",
@@ -346,6 +633,226 @@ class TestIO(unittest.TestCase):
     self.assertRaises(
         avro_io.AvroTypeException, write_datum, datum_to_write, writer_schema)
 
+  def testUnionFirstMatch(self):
+    writer_schema = schema.Parse("""
+      ["null", "int", "long", "boolean", "float", "double",
+       {"type": "record", "name": "R", "fields": [{"name": "a", "type": "int"}]},
+       {"type": "map", "values": "string"}]
+    """)
+    examples = (
+      (None, 0),
+      (1, 1),
+      (1 << 40, 2),
+      (True, 3),
+      (1.5, 4),
+      ({'a': 1}, 6),
+      ({'a': 'x'}, 7),
+    )
+    for validate_inline in (False, True):
+      datum_writer = avro_io.DatumWriter(
+          writer_schema, validate_inline=validate_inline)
+      for datum, index_of_schema in examples:
+        self.assertEqual(
+            index_of_schema,
+            avro_io.SelectUnionBranch(writer_schema, datum))
+        encoder = avro_io.BufferEncoder()
+        datum_writer.write(datum, encoder)
+        decoder = avro_io.BufferDecoder(encoder.getvalue())
+        self.assertEqual(index_of_schema, decoder.read_long())
+      self.assertRaises(
+          avro_io.AvroTypeException,
+          datum_writer.write, 'foo', avro_io.BufferEncoder())
+
+    # Python ints are written with int or long branches, ahead of float and
+    # double branches that would not represent them exactly:
+    examples = (
+      ('["double", "long"]', (1 << 60) + 1, 1, int),
+      ('["null", "float", "int"]', 123456789, 2, int),
+      ('["null", "float", "int"]', 1 << 40, 1, float),
+    )
+    for schema_json, datum, index_of_schema, read_type in examples:
+      writer_schema = schema.Parse(schema_json)
+      self.assertEqual(
+          index_of_schema, avro_io.SelectUnionBranch(writer_schema, datum))
+      for validate_inline in (False, True):
+        datum_writer = avro_io.DatumWriter(
+            writer_schema, validate_inline=validate_inline)
+        encoder = avro_io.BufferEncoder()
+        datum_writer.write(datum, encoder)
+        decoder = avro_io.BufferDecoder(encoder.getvalue())
+        read = avro_io.DatumReader(writer_schema).read(decoder)
+        self.assertEqual(datum, read)
+        self.assertIsInstance(read, read_type)
+
+    # A single candidate branch is still validated:
+    writer_schema = schema.Parse('["null", "int"]')
+    self.assertEqual(-1, avro_io.SelectUnionBranch(writer_schema, 1 << 40))
+    self.assertRaises(
+        avro_io.AvroTypeException, avro_io.DatumWriter().write_data,
+        writer_schema, 1 << 40, avro_io.BufferEncoder())
+    for validate_inline in (False, True):
+      datum_writer = avro_io.DatumWriter(
+          writer_schema, validate_inline=validate_inline)
+      self.assertRaises(
+          avro_io.AvroTypeException,
+          datum_writer.write, 1 << 40, avro_io.BufferEncoder())
+
+  def testValidateInline(self):
+    for example_schema, datum in SCHEMAS_TO_VALIDATE:
+      logging.debug('Schema: %s', example_schema)
+      writer_schema = schema.Parse(example_schema)
+      writer, encoder, datum_writer = write_datum(datum, writer_schema)
+
+      inline_writer = io.BytesIO()
+      inline_datum_writer = avro_io.DatumWriter(
+          writer_schema, validate_inline=True)
+      inline_datum_writer.write(datum, avro_io.BinaryEncoder(inline_writer))
+      self.assertEqual(writer.getvalue(), inline_writer.getvalue())
+
+  def testValidateInlineTypeException(self):
+    writer_schema = schema.Parse("""\
+      {"type": "record", "name": "Test",
+       "fields": [
+         {"name": "id", "type": "long"},
+         {"name": "events", "type": {"type": "array", "items": {
+           "type": "record", "name": "Event",
+           "fields": [{"name": "tags", "type": {
+             "type": "map", "values": ["null", "int"]}}]}}}]}""")
+    datum_writer = avro_io.DatumWriter(writer_schema, validate_inline=True)
+    encoder = avro_io.BufferEncoder()
+    datum_writer.write({'id': 1, 'events': []}, encoder)
+    encoded = encoder.getvalue()
+
+    bad_datum = {
+        'id': 2,
+        'events': [{'tags': {'a': 1}}, {'tags': {'b': None, 'c': 'Bad'}}],
+    }
+    with self.assertRaises(avro_io.AvroTypeException) as context:
+      datum_writer.write(bad_datum, encoder)
+    self.assertEqual("events[1].tags['c']", context.exception.path)
+    self.assertEqual(encoded, encoder.getvalue())
+
+    writer = io.BytesIO()
+    self.assertRaises(
+        avro_io.AvroTypeException,
+        datum_writer.write, bad_datum, avro_io.BinaryEncoder(writer))
+    self.assertEqual(b'', writer.getvalue())
+
+  def testSizedBlocks(self):
+    writer_schema = schema.Parse("""\
+      {"type": "record", "name": "Test",
+       "fields": [
+         {"name": "items", "type": {"type": "array", "items": "string"}},
+         {"name": "tags", "type": {"type": "map", "values": "long"}},
+         {"name": "id", "type": "long"}]}""")
+    datum = {
+        'items': ['item%d' % i for i in range(7)],
+        'tags': {'tag%d' % i: i for i in range(5)},
+        'id': 42,
+    }
+    for validate_inline in [False, True]:
+      datum_writer = avro_io.DatumWriter(
+          writer_schema, validate_inline=validate_inline, max_block_items=3)
+      encoder = avro_io.BufferEncoder()
+      datum_writer.write(datum, encoder)
+
+      decoder = avro_io.BufferDecoder(encoder.getvalue())
+      self.assertEqual(-3, decoder.read_long())
+      block_size = decoder.read_long()
+      self.assertEqual(3 * len(b'\x0aitem0'), block_size)
+
+      datum_reader = avro_io.DatumReader(writer_schema)
+      decoder = avro_io.BufferDecoder(encoder.getvalue())
+      self.assertEqual(datum, datum_reader.read(decoder))
+      self.assertEqual(0, decoder.remaining)
+
+      datum_reader = avro_io.DatumReader(writer_schema, projection=['id'])
+      decoder = avro_io.BufferDecoder(encoder.getvalue())
+      self.assertEqual({'id': 42}, datum_reader.read(decoder))
+      self.assertEqual(0, decoder.remaining)
+
+    datum_writer = avro_io.DatumWriter(
+        writer_schema, validate_inline=True, max_block_items=3)
+    datum['items'][4] = 4
+    with self.assertRaises(avro_io.AvroTypeException) as context:
+      datum_writer.write(datum, avro_io.BufferEncoder())
+    self.assertEqual('items[4]', context.exception.path)
+
+    self.assertRaises(
+        schema.AvroException, avro_io.DatumWriter, writer_schema,
+        max_block_items=0)
+
+  def testNumericArrays(self):
+    writer_schema = schema.Parse("""\
+      {"type": "record", "name": "Test",
+       "fields": [
+         {"name": "doubles", "type": {"type": "array", "items": "double"}},
+         {"name": "floats", "type": {"type": "array", "items": "float"}},
+         {"name": "ints", "type": {"type": "array", "items": "int"}},
+         {"name": "longs", "type": {"type": "array", "items": "long"}},
+         {"name": "empty", "type": {"type": "array", "items": "long"}},
+         {"name": "names", "type": {"type": "array", "items": "string"}}]}""")
+    reader_schema = schema.Parse("""\
+      {"type": "record", "name": "Test",
+       "fields": [
+         {"name": "longs", "type": {"type": "array", "items": "long"}},
+         {"name": "names", "type": {"type": "array", "items": "string"}}]}""")
+    longs = [0, -1, 1, 63, -64, 64, 8191, -8193, 1 << 40,
+             avro_io.LONG_MIN_VALUE, avro_io.LONG_MAX_VALUE]
+    datum = {
+        'doubles': [i / 3 for i in range(100)],
+        'floats': [i / 4 for i in range(10)],
+        'ints': [avro_io.INT_MIN_VALUE, avro_io.INT_MAX_VALUE, 0, -7],
+        'longs': longs * 3,
+        'empty': [],
+        'names': ['a', 'b'],
+    }
+    modes = ['array', 'numpy'] if avro_io.has_numpy else ['array']
+
+    for max_block_items in [None, 4]:
+      encoder = avro_io.BufferEncoder()
+      avro_io.DatumWriter(writer_schema, max_block_items=max_block_items)\
+          .write(datum, encoder)
+      for mode in modes:
+        datum_reader = avro_io.DatumReader(
+            writer_schema, numeric_arrays=mode)
+        for decoder in [avro_io.BufferDecoder(encoder.getvalue()),
+                        avro_io.BinaryDecoder(io.BytesIO(encoder.getvalue()))]:
+          read = datum_reader.read(decoder)
+          self.assertEqual(datum, {key: list(value)
+                                   for key, value in read.items()})
+          if mode == 'array':
+            self.assertEqual('d', read['doubles'].typecode)
+            self.assertEqual('i', read['ints'].typecode)
+            self.assertEqual('q', read['empty'].typecode)
+          else:
+            self.assertEqual(numpy.float32, read['floats'].dtype)
+            self.assertEqual(numpy.int64, read['longs'].dtype)
+            self.assertTrue(read['longs'].flags.writeable)
+          self.assertIsInstance(read['names'], list)
+        self.assertEqual(b'', decoder.reader.read(1))
+
+        # Arrays of numbers skipped by the reader's schema:
+        datum_reader = avro_io.DatumReader(
+            writer_schema, reader_schema, numeric_arrays=mode)
+        decoder = avro_io.BufferDecoder(encoder.getvalue())
+        read = datum_reader.read(decoder)
+        self.assertEqual(datum['longs'], list(read['longs']))
+        self.assertEqual(datum['names'], read['names'])
+        self.assertEqual(0, decoder.remaining)
+
+    # Read plans are only shared by readers decoding arrays the same way:
+    read = avro_io.DatumReader(writer_schema).read(
+        avro_io.BufferDecoder(encoder.getvalue()))
+    self.assertEqual(datum, read)
+    read = avro_io.DatumReader(writer_schema, numeric_arrays='array').read(
+        avro_io.BufferDecoder(encoder.getvalue()))
+    self.assertIsInstance(read['longs'], array.array)
+
+    self.assertRaises(
+        schema.AvroException, avro_io.DatumReader, writer_schema,
+        numeric_arrays='list')
+
 
 if __name__ == '__main__':
   raise Exception('Use run_tests.py')
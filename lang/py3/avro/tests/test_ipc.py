@@ -148,6 +148,10 @@ class TestIPC(unittest.TestCase):
       )
       logging.info('Received echo response: %s', response)
 
+      # Messages reuse the datum writer and reader of their schemas:
+      self.assertEqual(1, len(requestor._datum_writers))
+      self.assertEqual(1, len(requestor._datum_readers))
+
       transceiver.Close()
 
     finally:
@@ -21,6 +21,7 @@
 Test the schema parsing logic.
 """
 
+import collections
 import logging
 import traceback
 import unittest
@@ -622,6 +623,99 @@ class TestSchema(unittest.TestCase):
         self.assertEqual(type(v), list)
     self.assertEqual(correct,len(OTHER_PROP_EXAMPLES))
 
+  def testEnumSymbolIndex(self):
+    enum = schema.Parse("""
+      {"type": "enum", "name": "Test", "symbols": ["A", "B", "C"]}
+    """)
+    self.assertEqual(frozenset(['A', 'B', 'C']), enum.symbol_set)
+    for index, symbol in enumerate(enum.symbols):
+      self.assertEqual(index, enum.symbol_index[symbol])
+    self.assertNotIn('D', enum.symbol_index)
+
+  def testProject(self):
+    record = schema.Parse("""
+      {"type": "record", "name": "Event", "namespace": "test",
+       "fields": [
+         {"name": "ts", "type": "long"},
+         {"name": "payload", "type": "bytes"},
+         {"name": "user", "type": ["null", {
+           "type": "record", "name": "User",
+           "fields": [{"name": "id", "type": "long"},
+                      {"name": "name", "type": "string"}]}]},
+         {"name": "tags", "type": {"type": "array", "items": {
+           "type": "record", "name": "Tag",
+           "fields": [{"name": "key", "type": "string"},
+                      {"name": "value", "type": "string"}]}}}]}
+    """)
+    projected = schema.Project(record, ['user.id', 'ts', 'tags.key'])
+    self.assertEqual('test.Event', projected.fullname)
+    self.assertEqual(['ts', 'user', 'tags'],
+                     [field.name for field in projected.fields])
+    user = projected.field_map['user'].type.schemas[1]
+    self.assertEqual(['id'], [field.name for field in user.fields])
+    tag = projected.field_map['tags'].type.items
+    self.assertEqual(['key'], [field.name for field in tag.fields])
+
+    # Whole fields take precedence over their sub-fields:
+    projected = schema.Project(record, ['user.id', 'user'])
+    user = projected.field_map['user'].type.schemas[1]
+    self.assertEqual(['id', 'name'], [field.name for field in user.fields])
+
+    self.assertRaises(
+        schema.SchemaParseException, schema.Project, record, ['user.age'])
+    self.assertRaises(
+        schema.SchemaParseException, schema.Project, record, ['ts.value'])
+
+  def testProjectReusedNamedType(self):
+    record = schema.Parse("""
+      {"type": "record", "name": "Person",
+       "fields": [
+         {"name": "home", "type": {
+           "type": "record", "name": "Addr",
+           "fields": [{"name": "city", "type": "string"},
+                      {"name": "zip", "type": "string"}]}},
+         {"name": "work", "type": "Addr"},
+         {"name": "next", "type": ["null", "Person"]}]}
+    """)
+    def GetAddrFields(projected):
+      return [[field.name for field in projected.field_map[name].type.fields]
+              for name in ['home', 'work']]
+
+    # The whole record is kept wherever it is used:
+    for field_paths in [['home.city', 'work'], ['work', 'home.city']]:
+      projected = schema.Project(record, field_paths)
+      self.assertEqual([['city', 'zip'], ['city', 'zip']],
+                       GetAddrFields(projected))
+
+    # Fields requested through any use are kept in every use:
+    projected = schema.Project(record, ['work.zip', 'home.city'])
+    self.assertEqual([['city', 'zip'], ['city', 'zip']],
+                     GetAddrFields(projected))
+    projected = schema.Project(record, ['work.zip', 'home.zip'])
+    self.assertEqual([['zip'], ['zip']], GetAddrFields(projected))
+
+    # Recursive records:
+    projected = schema.Project(record, ['home.city', 'next.next.work.zip'])
+    self.assertEqual(
+        ['home', 'work', 'next'], [field.name for field in projected.fields])
+    self.assertEqual([['city', 'zip'], ['city', 'zip']],
+                     GetAddrFields(projected))
+    self.assertIs(projected, projected.field_map['next'].type.schemas[1])
+
+  def testUnionBranchesForType(self):
+    union = schema.Parse("""
+      ["null", "int", "boolean", "double",
+       {"type": "map", "values": "int"},
+       {"type": "record", "name": "R", "fields": []}]
+    """)
+    self.assertEqual((0,), union.BranchesForType(type(None)))
+    self.assertEqual((1, 3), union.BranchesForType(int))
+    self.assertEqual((2, 1, 3), union.BranchesForType(bool))
+    self.assertEqual((3,), union.BranchesForType(float))
+    self.assertEqual((4, 5), union.BranchesForType(dict))
+    self.assertEqual((4, 5), union.BranchesForType(collections.OrderedDict))
+    self.assertEqual((), union.BranchesForType(str))
+
 
 # ------------------------------------------------------------------------------
 
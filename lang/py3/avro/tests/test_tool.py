@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# -*- mode: python -*-
+# -*- coding: utf-8 -*-
+
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+import os
+import tempfile
+import unittest
+
+from avro import datafile
+from avro import io
+from avro import schema
+from avro import tool
+
+
+# ------------------------------------------------------------------------------
+
+
+SCHEMA = schema.Parse("""
+  {"type": "record", "name": "Test",
+   "fields": [{"name": "id", "type": "long"},
+              {"name": "text", "type": "string"}]}
+""")
+
+EVOLVED_SCHEMA = schema.Parse("""
+  {"type": "record", "name": "Test",
+   "fields": [{"name": "id", "type": "int"},
+              {"name": "text", "type": "string"},
+              {"name": "extra", "type": "boolean"}]}
+""")
+
+
+class TestTool(unittest.TestCase):
+
+  def setUp(self):
+    self._temp_dir = (
+        tempfile.TemporaryDirectory(prefix=self.__class__.__name__))
+    logging.debug('Created temporary directory: %s', self._temp_dir.name)
+
+  def tearDown(self):
+    self._temp_dir.cleanup()
+
+  def WriteFile(self, name, ids, writer_schema=SCHEMA, codec='null'):
+    """Writes a data file with one block per record.
+
+    Returns:
+      The path of the data file.
+    """
+    path = os.path.join(self._temp_dir.name, name)
+    with open(path, 'wb') as writer:
+      with datafile.DataFileWriter(
+          writer, io.DatumWriter(), writer_schema, codec=codec) as dfw:
+        for i in ids:
+          dfw.append({'id': i, 'text': 'text%d' % i, 'extra': True})
+          dfw.sync()
+    return path
+
+  def ReadFile(self, path):
+    """Returns: the datums of a data file, and the counts of its blocks."""
+    with open(path, 'rb') as reader:
+      with datafile.DataFileReader(reader, io.DatumReader()) as dfr:
+        datums = list(dfr)
+        return datums, [entry.count for entry in dfr.BuildIndex()]
+
+  def testConcat(self):
+    input_paths = [
+        self.WriteFile('a.avro', range(0, 3), codec='deflate'),
+        self.WriteFile('b.avro', range(3, 5), codec='deflate'),
+        self.WriteFile('c.avro', range(5, 7), codec='null'),
+        self.WriteFile('d.avro', range(7, 8), writer_schema=EVOLVED_SCHEMA),
+    ]
+    output_path = os.path.join(self._temp_dir.name, 'out.avro')
+    self.assertEqual(
+        0, tool.main(['avro', 'concat', output_path] + input_paths))
+
+    datums, block_counts = self.ReadFile(output_path)
+    self.assertEqual(
+        [{'id': i, 'text': 'text%d' % i} for i in range(8)], datums)
+    # Blocks with the same codec are copied, others are merged:
+    self.assertEqual([1, 1, 1, 1, 1, 3], block_counts)
+
+  def testCompact(self):
+    input_paths = [
+        self.WriteFile('a.avro', range(0, 3), codec='deflate'),
+        self.WriteFile('b.avro', range(3, 5), codec='deflate'),
+    ]
+    output_path = os.path.join(self._temp_dir.name, 'out.avro')
+    self.assertEqual(
+        0, tool.main(['avro', 'compact', output_path] + input_paths))
+
+    datums, block_counts = self.ReadFile(output_path)
+    self.assertEqual(
+        [{'id': i, 'text': 'text%d' % i} for i in range(5)], datums)
+    self.assertEqual([5], block_counts)
+
+  def testIndex(self):
+    input_path = self.WriteFile('a.avro', range(0, 3), codec='deflate')
+    index_path = os.path.join(self._temp_dir.name, 'a.index')
+    self.assertEqual(0, tool.main(['avro', 'index', input_path]))
+    self.assertEqual(0, tool.main(['avro', 'index', input_path, index_path]))
+
+    with open(input_path, 'rb') as reader:
+      with datafile.DataFileReader(reader, io.DatumReader()) as dfr:
+        sync_marker = dfr.sync_marker
+        expected = dfr.BuildIndex(uncompressed_sizes=True)
+    self.assertEqual([1, 1, 1], [entry.count for entry in expected])
+    for path in [input_path + datafile.INDEX_FILE_SUFFIX, index_path]:
+      with open(path, 'rb') as reader:
+        index = datafile.ReadIndex(reader, sync_marker=sync_marker)
+      self.assertEqual(expected, index)
+      self.assertTrue(all(entry.uncompressed_size for entry in index))
+
+
+if __name__ == '__main__':
+  raise Exception('Use run_tests.py')
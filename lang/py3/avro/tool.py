@@ -26,7 +26,7 @@ NOTE: The API for the command-line tool is experimental.
 import sys
 import urllib
 
-from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+from http.server import HTTPServer, BaseHTTPRequestHandler
 
 from avro import io
 from avro import datafile
@@ -101,6 +101,58 @@ def send_message(uri, proto, msg, datum):
   requestor = ipc.Requestor(protocol.Parse(proto_json), client)
   print(requestor.request(msg, datum))
 
+# Target size of the uncompressed blocks written by compact, in bytes:
+COMPACT_BLOCK_SIZE = 1024 * 1024
+
+def concat_files(input_paths, output_path, compact=False,
+                 block_size=COMPACT_BLOCK_SIZE):
+  """Concatenates data files into a new data file.
+
+  The output file has the schema and codec of the first input file.
+  Blocks of input files with the same schema and codec are copied as is.
+  Blocks with a different codec are re-compressed, and the datums of files
+  with a different schema are decoded and re-encoded.
+
+  Args:
+    input_paths: Paths of the data files to concatenate.
+    output_path: Path of the data file to write.
+    compact: When set, blocks smaller than block_size are merged into blocks
+        of block_size uncompressed bytes, without decoding their datums.
+    block_size: Target size of the uncompressed blocks, when compacting.
+        Otherwise, datums that need to be re-encoded are written in blocks
+        of the default size.
+  """
+  with open(input_paths[0], 'rb') as reader:
+    dfr = datafile.DataFileReader(reader, io.DatumReader())
+    writer_schema = dfr.datum_reader.writer_schema
+    codec_name = dfr.codec
+
+  if not compact:
+    block_size = datafile.SYNC_INTERVAL
+  with open(output_path, 'wb') as writer:
+    with datafile.DataFileWriter(
+        writer, io.DatumWriter(), writer_schema, codec=codec_name,
+        block_size=block_size) as dfw:
+      for input_path in input_paths:
+        with open(input_path, 'rb') as reader:
+          dfr = datafile.DataFileReader(
+              reader, io.DatumReader(reader_schema=writer_schema))
+          if dfr.datum_reader.writer_schema != writer_schema:
+            for datum in dfr:
+              dfw.append(datum)
+            continue
+          for block in dfr.blocks():
+            # Blocks of the output codec are copied as is, unless they are
+            # to be merged: blocks whose stored size already reaches
+            # block_size are copied without decompressing them.
+            if block.codec == codec_name and (
+                not compact
+                or (len(block.data) >= block_size and dfw.block_count == 0)):
+              dfw.append_block(block)
+              continue
+            data = datafile.GetCodec(block.codec).decompress(block.data)
+            dfw.append_encoded(block.count, data)
+
 def file_or_stdin(f):
   if f == "-":
     return sys.stdin
@@ -109,7 +161,8 @@ def file_or_stdin(f):
 
 def main(args=sys.argv):
   if len(args) == 1:
-    print("Usage: %s [dump|rpcreceive|rpcsend]" % args[0])
+    print("Usage: %s [dump|index|concat|compact|rpcreceive|rpcsend]"
+          % args[0])
     return 1
 
   if args[1] == "dump":
@@ -118,6 +171,25 @@ def main(args=sys.argv):
       return 1
     for d in datafile.DataFileReader(file_or_stdin(args[2]), io.DatumReader()):
       print(repr(d))
+  elif args[1] == "index":
+    if len(args) not in [3, 4]:
+      print("Usage: %s index input_file [index_file]" % args[0])
+      return 1
+    input_path = args[2]
+    if len(args) > 3:
+      index_path = args[3]
+    else:
+      index_path = input_path + datafile.INDEX_FILE_SUFFIX
+    with open(input_path, 'rb') as reader:
+      dfr = datafile.DataFileReader(reader, io.DatumReader())
+      index = dfr.BuildIndex(uncompressed_sizes=True)
+    with open(index_path, 'wb') as writer:
+      datafile.WriteIndex(writer, index, dfr.sync_marker)
+  elif args[1] in ["concat", "compact"]:
+    if len(args) < 4:
+      print("Usage: %s %s output_file input_file..." % (args[0], args[1]))
+      return 1
+    concat_files(args[3:], args[2], compact=(args[1] == "compact"))
   elif args[1] == "rpcreceive":
     usage_str = "Usage: %s rpcreceive uri protocol_file " % args[0]
     usage_str += "message_name (-data d | -file f)"